@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Scaling micro-benchmarks for the FlixPatrol parsers and the Trakt title matchers.
+
+Usage:
+    python benchmark_scaling.py [--sizes 10 50 100 200 400] [--max-exponent 1.2]
+    python benchmark_scaling.py --parse-processes 4 [--pages 200] [--chunk-size 4]
+
+Synthetic ranking pages and search results of growing size are generated and
+the cost per row / per candidate is measured. The script exits with status 1
+when the fitted time-vs-size exponent of any benchmark exceeds --max-exponent,
+i.e. when a parser or matcher change makes it scale superlinearly.
+
+With --parse-processes, the page parse throughput of the process pool used by
+PARSE_PROCESSES is compared with in-process parsing instead.
+"""
+
+import argparse
+import logging
+import math
+import sys
+import time
+import timeit
+
+from top_pt_stream_services import (
+    RANK_TD_CLASS,
+    PageParser,
+    Top10StreamParser,
+    match_search_result,
+    match_search_result_by_type,
+    parse_top10,
+)
+
+SECTION = "TOP 10 Movies"
+
+
+def synthetic_page(rows):
+    """Build a FlixPatrol-like page with a ranking table of the given size plus a second, unrelated card."""
+    body = "".join(
+        f'<tr class="table-group"><td class="{RANK_TD_CLASS}">{rank}.</td>'
+        f'<td class="table-td"><a href="/title/synthetic-movie-{rank}/" class="hover:underline">'
+        f"Synthetic Movie {rank}</a></td>"
+        f'<td class="table-td w-12 text-right">{1000 - rank}</td></tr>'
+        for rank in range(1, rows + 1)
+    )
+    other = "".join(
+        f'<tr><td>{rank}.</td><td><a href="/title/other-{rank}/">Other {rank}</a></td></tr>' for rank in range(10)
+    )
+    return (
+        "<html><head><title>TOP 10</title></head><body><main>"
+        f'<div class="card"><div class="card-header"><h3>{SECTION}</h3></div><table><tbody>{body}</tbody></table></div>'
+        f'<div class="card"><h3>TOP 10 TV Shows</h3><table><tbody>{other}</tbody></table></div>'
+        "</main></body></html>"
+    )
+
+
+def synthetic_results(candidates, type="movie"):
+    """Build Trakt search results where only the last candidate matches the searched title."""
+    results = [
+        {
+            "type": type,
+            "score": 100 - i,
+            type: {"title": f"Unrelated {i}", "year": 2000 + i % 25, "ids": {"trakt": i, "slug": f"unrelated-{i}"}},
+        }
+        for i in range(candidates - 1)
+    ]
+    results.append(
+        {
+            "type": type,
+            "score": 1,
+            type: {"title": "Target Title", "year": 2024, "ids": {"trakt": 999999, "slug": "target-title-2024"}},
+        }
+    )
+    return results
+
+
+def stream_parse(page):
+    parser = Top10StreamParser([SECTION])
+    parser.feed(page)
+    parser.close()
+    return parser.rows
+
+
+BENCHMARKS = [
+    ("parse_top10 (DOM)", "row", synthetic_page, lambda page: parse_top10(page, SECTION)),
+    ("Top10StreamParser", "row", synthetic_page, stream_parse),
+    (
+        "match_search_result_by_type",
+        "candidate",
+        synthetic_results,
+        lambda results: match_search_result_by_type(results, "Target Title", "target-title", "movie"),
+    ),
+    (
+        "match_search_result",
+        "candidate",
+        synthetic_results,
+        lambda results: match_search_result(results, "Target Title", "target-title"),
+    ),
+]
+
+
+def calibrate(func, data):
+    """Number of calls per measurement so that each one takes at least ~20ms."""
+    number = 1
+    while number < 10000 and timeit.timeit(lambda: func(data), number=number) < 0.02:
+        number *= 4
+    return number
+
+
+def measure(func, inputs, repeat):
+    """Best wall time per call of func on each input, in seconds.
+
+    Sizes are measured in interleaved rounds so that machine noise affects all of them alike.
+    """
+    numbers = [calibrate(func, data) for data in inputs]
+    best = [float("inf")] * len(inputs)
+    for _ in range(repeat):
+        for i, (data, number) in enumerate(zip(inputs, numbers)):
+            best[i] = min(best[i], timeit.timeit(lambda: func(data), number=number) / number)
+    return best
+
+
+def scaling_exponent(sizes, times):
+    """Least-squares slope of log(time) vs log(size) over the larger half of the sizes.
+
+    The smaller sizes are left out so that fixed per-call overhead does not hide superlinear growth.
+    """
+    points = list(zip(sizes, times))[len(sizes) // 2 - 1 :] if len(sizes) > 2 else list(zip(sizes, times))
+    xs = [math.log(size) for size, _ in points]
+    ys = [math.log(elapsed) for _, elapsed in points]
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sum((x - mean_x) ** 2 for x in xs)
+
+
+def run(sizes, max_exponent, repeat):
+    failed = False
+    for name, unit, build, func in BENCHMARKS:
+        times = measure(func, [build(size) for size in sizes], repeat)
+        exponent = scaling_exponent(sizes, times)
+        status = "OK" if exponent <= max_exponent else "SUPERLINEAR"
+        failed = failed or status != "OK"
+
+        print(f"\n{name}  (exponent {exponent:.2f}, limit {max_exponent:.2f}) {status}")
+        for size, elapsed in zip(sizes, times):
+            print(f"  {size:>6} {unit}s  {elapsed * 1000:10.3f} ms  {elapsed / size * 1e6:8.2f} µs/{unit}")
+    return 1 if failed else 0
+
+
+def parse_throughput(processes, pages, chunk_size):
+    """Pages parsed per second by a PageParser with the given number of processes (0 for in-process)."""
+    jobs = [(synthetic_page(10).encode(), [SECTION], f"page-{i}") for i in range(pages)]
+    parser = PageParser(processes, chunk_size)
+    try:
+        parser.parse_many(jobs[: max(1, processes)])  # start the workers before timing
+        started = time.perf_counter()
+        parser.parse_many(jobs)
+        return pages / (time.perf_counter() - started)
+    finally:
+        parser.close()
+
+
+def run_throughput(processes, pages, chunk_size):
+    baseline = parse_throughput(0, pages, chunk_size)
+    print(f"\nin-process        {baseline:8.1f} pages/s")
+    for workers in sorted({1, processes}):
+        throughput = parse_throughput(workers, pages, chunk_size)
+        print(f"{workers:>2} process(es)    {throughput:8.1f} pages/s  ({throughput / baseline:.2f}x)")
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scaling micro-benchmarks for parsing and title matching.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 25, 50, 100, 200, 400])
+    parser.add_argument("--max-exponent", type=float, default=1.2, help="fail above this time-vs-size exponent")
+    parser.add_argument("--repeat", type=int, default=5, help="measurements per size (best is kept)")
+    parser.add_argument("--parse-processes", type=int, help="measure parse throughput with this many processes")
+    parser.add_argument("--pages", type=int, default=200, help="pages parsed per throughput measurement")
+    parser.add_argument("--chunk-size", type=int, default=4, help="pages sent to a parser process at once")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    if args.parse_processes:
+        sys.exit(run_throughput(args.parse_processes, args.pages, args.chunk_size))
+    sys.exit(run(sorted(args.sizes), args.max_exponent, args.repeat))
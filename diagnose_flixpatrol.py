@@ -4,146 +4,193 @@ Diagnostic script to check the current FlixPatrol HTML structure
 and test the scraping functionality.
 
 Usage:
-    python diagnose_flixpatrol.py
+    python diagnose_flixpatrol.py [--services netflix prime] [--save-snapshots DIR]
+    python diagnose_flixpatrol.py --snapshot-dir DIR [--offline]
+
+Each configured service page is fetched once (or loaded from a saved snapshot)
+and every section the tracker scrapes from it is diagnosed and parsed from the
+same bytes, so results are repeatable offline.
 
 This will help identify what changes FlixPatrol made to their website
 and verify that the scraper can handle them correctly.
 """
+
+import argparse
 import logging
+import os
+import sys
+import timeit
 
 import requests
 from bs4 import BeautifulSoup
 
-from top_pt_stream_services import scrape_top10
+from top_pt_stream_services import (
+    FLIXPATROL_HEADERS,
+    HEADING_STRATEGIES,
+    HEADING_TAGS,
+    RANK_TD_STRATEGIES,
+    config,
+    find_card_div,
+    parse_top10,
+)
 
 # Configure logging to show detailed information
-logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s", force=True)
 
+# Number of runs used to time each parse strategy
+TIMING_REPEAT = 5
 
-def diagnose_page(url, section_title):
-    """Diagnose the structure of a FlixPatrol page."""
-    print(f"\n{'='*80}")
-    print(f"Diagnosing: {url}")
-    print(f"Expected section: {section_title}")
-    print("=" * 80)
 
-    headers = {
-        "Content-Type": "application/json",
-        "User-Agent": (
-            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/130.0.0.0 Safari/537.36"
-        ),
-        "Cookie": "_nss=1",
-    }
+def load_page(service, url, snapshot_dir=None, save_dir=None, offline=False):
+    """Return the raw bytes of a service page, from a snapshot file if available, otherwise fetched once."""
+    snapshot_path = os.path.join(snapshot_dir, f"{service}.html") if snapshot_dir else None
+    if snapshot_path and os.path.exists(snapshot_path):
+        print(f"Loading {service} from snapshot {snapshot_path}")
+        with open(snapshot_path, "rb") as f:
+            return f.read()
+    if offline:
+        print(f"❌ No snapshot for {service} in {snapshot_dir}")
+        return None
 
+    print(f"Fetching {url}")
     try:
-        response = requests.get(url, headers=headers, timeout=30)
-        print(f"\nStatus code: {response.status_code}")
-
-        if response.status_code != 200:
-            print("ERROR: Failed to retrieve page")
-            return
-
-        soup = BeautifulSoup(response.content, "html.parser")
-
-        # Check for various heading tags
-        print("\n--- HEADING TAGS FOUND ---")
-        for tag in ["h1", "h2", "h3", "h4", "h5", "h6"]:
-            tags = soup.find_all(tag)
-            if tags:
-                print(f"\n{tag.upper()} tags ({len(tags)} found):")
-                for i, t in enumerate(tags[:15]):  # Show first 15
-                    text = t.get_text(strip=True)
-                    if text:
-                        print(f"  {i+1}. {text}")
-
-        # Look for the expected section
-        print(f"\n--- LOOKING FOR: '{section_title}' ---")
-        section_header = None
-
-        # Try different heading tags
-        for heading_tag in ["h2", "h3", "h4"]:
-            # Exact match
-            section_header = soup.find(heading_tag, string=section_title)
-            if section_header:
-                print(f"✅ Found with {heading_tag} exact match")
-                break
-
-            # Case-insensitive match
-            section_header = soup.find(heading_tag, string=lambda s: s and s.strip().lower() == section_title.lower())
-            if section_header:
-                print(f"✅ Found with {heading_tag} case-insensitive match: '{section_header.get_text(strip=True)}'")
-                break
+        response = requests.get(url, headers=FLIXPATROL_HEADERS, timeout=30)
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Request failed: {e}")
+        return None
+    print(f"Status code: {response.status_code}")
+    if response.status_code != 200:
+        print("ERROR: Failed to retrieve page")
+        return None
+
+    if save_dir:
+        os.makedirs(save_dir, exist_ok=True)
+        with open(os.path.join(save_dir, f"{service}.html"), "wb") as f:
+            f.write(response.content)
+        print(f"Saved snapshot to {os.path.join(save_dir, f'{service}.html')}")
+    return response.content
+
+
+def print_headings(soup):
+    """Print the heading tags found on the page."""
+    print("\n--- HEADING TAGS FOUND ---")
+    for tag in ["h1", "h2", "h3", "h4", "h5", "h6"]:
+        tags = soup.find_all(tag)
+        if tags:
+            print(f"\n{tag.upper()} tags ({len(tags)} found):")
+            for i, t in enumerate(tags[:15]):  # Show first 15
+                text = t.get_text(strip=True)
+                if text:
+                    print(f"  {i+1}. {text}")
+
+
+def diagnose_page(soup, section_title):
+    """Diagnose the structure of a section in an already parsed FlixPatrol page."""
+    print(f"\n--- LOOKING FOR: '{section_title}' ---")
+    section_header = None
+
+    # Try different heading tags
+    for heading_tag in HEADING_TAGS:
+        # Exact match
+        section_header = soup.find(heading_tag, string=section_title)
+        if section_header:
+            print(f"✅ Found with {heading_tag} exact match")
+            break
 
+        # Case-insensitive match
+        section_header = soup.find(heading_tag, string=lambda s: s and s.strip().lower() == section_title.lower())
         if section_header:
-            print("\n--- ANALYZING STRUCTURE AFTER HEADER ---")
-            print(f"Header tag: {section_header.name}")
-            print(f"Header text: {section_header.get_text(strip=True)}")
-
-            # Look at siblings and children
-            next_div = section_header.find_next("div")
-            print(f"\nNext div exists: {next_div is not None}")
-            if next_div:
-                print(f"Next div classes: {next_div.get('class', [])}")
-
-                # Look for table structures
-                table = next_div.find("table")
-                tbody = next_div.find("tbody")
-                print(f"Contains table: {table is not None}")
-                print(f"Contains tbody: {tbody is not None}")
-
-                if tbody:
-                    rows = tbody.find_all("tr")
-                    print(f"Number of rows: {len(rows)}")
-
-                    if rows:
-                        print("\n--- FIRST ROW STRUCTURE ---")
-                        first_row = rows[0]
-                        tds = first_row.find_all("td")
-                        print(f"Number of td elements: {len(tds)}")
-
-                        for i, td in enumerate(tds[:5]):  # Show first 5 TDs
-                            print(f"\nTD {i+1}:")
-                            print(f"  Classes: {td.get('class', [])}")
-                            print(f"  Text: {td.get_text(strip=True)[:50]}")
-                            a_tag = td.find("a")
-                            if a_tag:
-                                print(f"  Contains link: {a_tag.get('href', 'no href')}")
-
-        else:
-            print("\n❌ Section header not found with any common method")
-            print("\nListing all text content that might be section headers:")
-            # Look for any element containing "Movies" or "Shows" or "TOP 10"
-            keywords = ["Movies", "Shows", "TOP 10", "TV Shows"]
-            for keyword in keywords:
-                elements = soup.find_all(string=lambda text: text and keyword in text)
-                if elements:
-                    print(f"\nElements containing '{keyword}':")
-                    for elem in list(elements)[:10]:
-                        parent = elem.parent
-                        print(f"  - Tag: {parent.name}, Text: {elem.strip()[:100]}")
-
-    except Exception as e:
-        print(f"\n❌ Error: {e}")
-        import traceback
-
-        traceback.print_exc()
-
-
-def test_scraper(url, section_title):
-    """Test the actual scraper with the URL."""
+            print(f"✅ Found with {heading_tag} case-insensitive match: '{section_header.get_text(strip=True)}'")
+            break
+
+    if section_header:
+        print("\n--- ANALYZING STRUCTURE AFTER HEADER ---")
+        print(f"Header tag: {section_header.name}")
+        print(f"Header text: {section_header.get_text(strip=True)}")
+
+        card_div = find_card_div(section_header)
+        print(f"\nParent card div exists: {card_div is not None}")
+        if card_div:
+            print(f"Card div classes: {card_div.get('class', [])}")
+
+            # Look for table structures
+            table = card_div.find("table")
+            tbody = card_div.find("tbody")
+            print(f"Contains table: {table is not None}")
+            print(f"Contains tbody: {tbody is not None}")
+
+            if tbody:
+                rows = tbody.find_all("tr")
+                print(f"Number of rows: {len(rows)}")
+
+                if rows:
+                    print("\n--- FIRST ROW STRUCTURE ---")
+                    first_row = rows[0]
+                    tds = first_row.find_all("td")
+                    print(f"Number of td elements: {len(tds)}")
+
+                    for i, td in enumerate(tds[:5]):  # Show first 5 TDs
+                        print(f"\nTD {i+1}:")
+                        print(f"  Classes: {td.get('class', [])}")
+                        print(f"  Text: {td.get_text(strip=True)[:50]}")
+                        a_tag = td.find("a")
+                        if a_tag:
+                            print(f"  Contains link: {a_tag.get('href', 'no href')}")
+
+    else:
+        print("\n❌ Section header not found with any common method")
+        print("\nListing all text content that might be section headers:")
+        # Look for any element containing "Movies" or "Shows" or "TOP 10"
+        keywords = ["Movies", "Shows", "TOP 10", "TV Shows"]
+        for keyword in keywords:
+            elements = soup.find_all(string=lambda text: text and keyword in text)
+            if elements:
+                print(f"\nElements containing '{keyword}':")
+                for elem in list(elements)[:10]:
+                    parent = elem.parent
+                    print(f"  - Tag: {parent.name}, Text: {elem.strip()[:100]}")
+
+
+def time_strategies(soup, section_title):
+    """Time each parse strategy of the scraper on the section, in milliseconds (best of TIMING_REPEAT)."""
+
+    def best(func):
+        return min(timeit.repeat(func, number=1, repeat=TIMING_REPEAT)) * 1000
+
+    timings = {}
+    headings = soup.find_all(HEADING_TAGS)
+    texts = [heading.get_text(strip=True) for heading in headings]
+    section_header = None
+    for name, matches in HEADING_STRATEGIES:
+        timings[name] = best(
+            lambda: [h for h in soup.find_all(HEADING_TAGS) if matches(h.get_text(strip=True), section_title)]
+        )
+        section_header = section_header or next(
+            (heading for heading, text in zip(headings, texts) if matches(text, section_title)), None
+        )
+
+    if section_header is None:
+        return timings
+    timings["card lookup"] = best(lambda: find_card_div(section_header))
+
+    card_div = find_card_div(section_header)
+    tbody = card_div.find("tbody") if card_div else None
+    rows = tbody.find_all("tr") if tbody else []
+    for name, find_rank_td in RANK_TD_STRATEGIES:
+        timings[f"rank td ({name})"] = best(lambda: [find_rank_td(row) for row in rows])
+    return timings
+
+
+def test_scraper(content, section_title):
+    """Test the actual scraper parse on the page bytes."""
     print(f"\n{'='*80}")
     print("TESTING SCRAPER")
-    print(f"URL: {url}")
     print(f"Section: {section_title}")
     print("=" * 80)
 
-    result = scrape_top10(url, section_title)
+    result = parse_top10(content, section_title)
 
-    if result is None:
-        print("❌ Scraper returned None - Check logs above for details")
-    elif len(result) == 0:
+    if len(result) == 0:
         print("⚠️  Scraper returned empty list - Section might not be found")
     else:
         print(f"✅ Scraper found {len(result)} items:")
@@ -151,22 +198,56 @@ def test_scraper(url, section_title):
             print(f"   {rank}. {title} ({slug})")
 
 
+def diagnose_service(service, content):
+    """Diagnose and parse every section the tracker scrapes from a service page."""
+    sections = [
+        config.sections[section] for _, task_service, section in config.scraping_tasks if task_service == service
+    ]
+    soup = BeautifulSoup(content, "html.parser")
+    print_headings(soup)
+
+    for section_title in sections:
+        print(f"\n\n### {service}: {section_title} ###")
+        diagnose_page(soup, section_title)
+        test_scraper(content, section_title)
+
+        print("\n--- PARSE TIMINGS PER STRATEGY ---")
+        for name, elapsed in time_strategies(soup, section_title).items():
+            print(f"  {name:<24} {elapsed:8.3f} ms")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Diagnose the FlixPatrol pages used by the tracker.")
+    parser.add_argument(
+        "--services", nargs="+", choices=sorted(config.urls), help="services to diagnose (default: all)"
+    )
+    parser.add_argument("--snapshot-dir", help="load pages from <dir>/<service>.html when present")
+    parser.add_argument("--save-snapshots", metavar="DIR", help="save fetched pages to <dir>/<service>.html")
+    parser.add_argument("--offline", action="store_true", help="never fetch, only use snapshots")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
+    args = parse_args()
+
     print("=" * 80)
     print("FlixPatrol Diagnostic Tool")
     print("=" * 80)
 
-    # Test Netflix India page
-    url = "https://flixpatrol.com/top10/netflix/India/"
-
-    print("\n\n### Testing Movies Section ###")
-    diagnose_page(url, "TOP 10 Movies")
-    test_scraper(url, "TOP 10 Movies")
+    exit_code = 0
+    for service in args.services or list(config.urls):
+        url = config.urls[service]
+        print(f"\n{'='*80}")
+        print(f"Diagnosing: {service} ({url})")
+        print("=" * 80)
 
-    print("\n\n### Testing TV Shows Section ###")
-    diagnose_page(url, "TOP 10 TV Shows")
-    test_scraper(url, "TOP 10 TV Shows")
+        content = load_page(service, url, args.snapshot_dir, args.save_snapshots, args.offline)
+        if content is None:
+            exit_code = 1
+            continue
+        diagnose_service(service, content)
 
     print("\n\n" + "=" * 80)
     print("Diagnostic complete!")
     print("=" * 80)
+    sys.exit(exit_code)
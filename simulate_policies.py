@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Deterministic simulation of the tracker's request layer on a virtual clock.
+
+Usage:
+    python simulate_policies.py [--scenarios healthy 429-storm] [--policy retries=5,backoff=1.5,deadline=900]
+
+Every FlixPatrol page is fetched and every Trakt list is updated through the
+real request code (fetch_page, update_list with retry_request, the run
+deadline and the per-account rate limiter), against a scripted server. No
+request leaves the process and every sleep advances a virtual clock instead,
+so a scenario that would take an hour of backoff runs in milliseconds and
+always gives the same result.
+
+For each scenario and retry policy the simulated run duration, the number of
+requests and the pages and lists that succeeded are reported. Hedging and
+worker concurrency depend on real threads racing and are not simulated.
+"""
+
+import argparse
+import logging
+import sys
+from contextlib import contextmanager
+
+import requests
+
+import top_pt_stream_services as tracker
+
+FLIXPATROL = "flixpatrol.com"
+PAYLOAD = {"movies": [{"ids": {"trakt": trakt_id}} for trakt_id in range(10)]}
+
+
+class VirtualClock:
+    """Clock that only moves when something sleeps or a simulated request takes time."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+
+
+class ScriptedResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.content = b"<html></html>"
+
+    def json(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class ScriptedServer:
+    """Answers requests from a scenario, taking the scripted latency on the virtual clock.
+
+    A request slower than its read timeout costs the timeout and raises ReadTimeout, like requests does.
+    """
+
+    def __init__(self, scenario, clock):
+        self.scenario = scenario
+        self.clock = clock
+        self.requests = 0
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.requests += 1
+        status, latency = self.scenario(self.requests, self.clock.now, FLIXPATROL in url)
+        read_timeout = timeout[1] if isinstance(timeout, tuple) else timeout
+        if read_timeout is not None and latency > read_timeout:
+            self.clock.sleep(read_timeout)
+            raise requests.exceptions.ReadTimeout(f"{method} {url} timed out after {read_timeout:.0f}s")
+        self.clock.sleep(latency)
+        return ScriptedResponse(status)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+
+# Scenarios: (request number, virtual time, FlixPatrol request?) -> (status code, latency in seconds)
+SCENARIOS = {
+    "healthy": lambda n, now, flixpatrol: (200, 0.5 if flixpatrol else 0.2),
+    "429-storm": lambda n, now, flixpatrol: (200, 0.5) if flixpatrol else (429 if now < 300 else 200, 0.2),
+    "5xx-burst": lambda n, now, flixpatrol: (200, 0.5) if flixpatrol else (503 if 10 <= n < 40 else 200, 0.2),
+    "slow-pages": lambda n, now, flixpatrol: (200, 45.0 if flixpatrol and n % 2 else 0.5) if flixpatrol else (200, 0.2),
+    "token-expiry": lambda n, now, flixpatrol: (200, 0.5) if flixpatrol else (401 if n > 12 else 200, 0.2),
+}
+
+DEFAULT_POLICIES = [
+    "retries=10,backoff=2,deadline=3600,interval=0.3",
+    "retries=5,backoff=2,deadline=3600,interval=0.3",
+    "retries=6,backoff=1.5,deadline=900,interval=0.3",
+    "retries=10,backoff=2,deadline=0,interval=1",
+]
+
+
+def parse_policy(text):
+    """Parse "retries=5,backoff=1.5,deadline=900,interval=0.3" into a policy dict (missing keys: config)."""
+    policy = {
+        "retries": tracker.config.MAX_RETRIES,
+        "backoff": tracker.config.BACKOFF_FACTOR,
+        "deadline": tracker.config.RUN_DEADLINE,
+        "interval": tracker.config.TRAKT_MIN_INTERVAL,
+    }
+    for item in filter(None, text.split(",")):
+        key, _, value = item.partition("=")
+        if key not in policy:
+            raise ValueError(f"Unknown policy setting {key!r}, expected one of {', '.join(policy)}")
+        policy[key] = int(value) if key == "retries" else float(value)
+    return policy
+
+
+@contextmanager
+def patched(policy, server):
+    """Route the request layer to the scripted server and apply the retry policy."""
+    saved = (requests.get, requests.request, tracker.MAX_RETRIES, tracker.BACKOFF_FACTOR, tracker.config.RUN_DEADLINE)
+    requests.get, requests.request = server.get, server.request
+    tracker.MAX_RETRIES, tracker.BACKOFF_FACTOR = policy["retries"], policy["backoff"]
+    tracker.config.RUN_DEADLINE = policy["deadline"]
+    try:
+        yield
+    finally:
+        requests.get, requests.request, tracker.MAX_RETRIES, tracker.BACKOFF_FACTOR, tracker.config.RUN_DEADLINE = saved
+
+
+def simulate(scenario, policy):
+    """Run one simulated tracker run, returning its duration, request count and outcome."""
+    clock = VirtualClock()
+    server = ScriptedServer(SCENARIOS[scenario], clock)
+    slugs = [slug for _, slug, _, _ in tracker.list_jobs(tracker.config)]
+    account = tracker.TraktAccount("SIMULATED", slugs, "client", "secret", "token", "refresh", workers=1)
+    account.limiter = tracker.PolitenessLimiter(policy["interval"], clock.monotonic, clock.sleep)
+    result = {"pages": 0, "lists": 0, "errors": 0}
+    with patched(policy, server):
+        budget = tracker.start_run_budget(tracker.config, clock=clock.monotonic, sleeper=clock.sleep)
+        try:
+            for url in tracker.config.urls.values():
+                try:
+                    result["pages"] += tracker.fetch_page(url).status_code == 200
+                except requests.exceptions.RequestException:
+                    pass
+            for slug in slugs:
+                try:
+                    response = account.submit(tracker.update_list, slug, PAYLOAD, *account.credentials).result()
+                except requests.exceptions.RequestException:
+                    result["errors"] += 1  # Not retried: this would fail the whole run
+                    continue
+                result["lists"] += response is not None
+        finally:
+            account.close()
+            tracker.start_run_budget(tracker.config)
+    result.update(duration=clock.now, requests=server.requests, deadline_hit=budget.expired())
+    return result
+
+
+def run(scenarios, policies):
+    pages, lists = len(tracker.config.urls), len(tracker.list_jobs(tracker.config))
+    for scenario in scenarios:
+        print(f"\n{scenario}")
+        for text in policies:
+            policy = parse_policy(text)
+            result = simulate(scenario, policy)
+            outcome = "deadline" if result["deadline_hit"] else ("errors" if result["errors"] else "done")
+            print(
+                f"  {text:<48} {result['duration']:9.1f} s  {result['requests']:5d} requests  "
+                f"pages {result['pages']}/{pages}  lists {result['lists']}/{lists}  {outcome}"
+            )
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate retry and rate limit policies on a virtual clock.")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument(
+        "--policy",
+        action="append",
+        help="retries=N,backoff=F,deadline=SECONDS,interval=SECONDS (repeatable, default: a comparison set)",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logging.getLogger().setLevel(logging.CRITICAL)
+    sys.exit(run(args.scenarios, args.policy or DEFAULT_POLICIES))
@@ -4,14 +4,57 @@ Simple test to verify the refactored code structure works correctly.
 This is a basic smoke test - no external dependencies required.
 """
 
+import io
+import json
 import sys
 import os
+import pstats
+import tempfile
+import time
+import urllib.error
+import urllib.request
 
 # Add the current directory to the path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+# Keep the runs of the tests from appending to a change feed in the working directory
+os.environ["CHANGE_FEED"] = ""
+
 try:
-    from top_pt_stream_services import Config, StreamingServiceTracker, main
+    import top_pt_stream_services as tracker_module
+    from top_pt_stream_services import (
+        Config,
+        HedgedFetcher,
+        PageParser,
+        RunBudget,
+        RunCheckpoint,
+        RankingStore,
+        RunProfiler,
+        TraktAccount,
+        SnapshotArchive,
+        StreamingServiceTracker,
+        Top10StreamParser,
+        main,
+        parse_top10,
+    )
+
+    # Keep tests from learning parse strategies or caching results into the working directory's state
+    tracker_module.config.STRATEGY_CACHE = ""
+    tracker_module.config.TRACKER_CACHE = ""
+    tracker_module.config.CANDIDATE_CORPUS = ""
+
+    def sample_page(sections=("TOP 10 Movies", "TOP 10 TV Shows"), rows=10, trailer=""):
+        """Build a small FlixPatrol-like page with one ranking card per section."""
+        cards = []
+        for section in sections:
+            slug_prefix = section.lower().replace(" ", "-")
+            body = "".join(
+                f'<tr><td class="table-td w-12 font-semibold text-right text-gray-500 table-hover:text-gray-400">'
+                f'{rank}.</td><td><a href="/title/{slug_prefix}-{rank}/">Title &amp; {rank}</a></td></tr>'
+                for rank in range(1, rows + 1)
+            )
+            cards.append(f'<div class="card"><div><h3>{section}</h3></div><table><tbody>{body}</tbody></table></div>')
+        return f"<html><body><div>{''.join(cards)}</div>{trailer}</body></html>"
 
     def test_config_initialization():
         """Test that Config class can be initialized."""
@@ -34,12 +77,1202 @@ try:
         assert callable(main)
         print("✓ Main function accessibility test passed")
 
+    def test_streaming_parser_matches_dom_parser():
+        """Test that the streaming tokenizer yields the same rows as the DOM parser, even in tiny chunks."""
+        page = sample_page()
+        parser = Top10StreamParser(["TOP 10 Movies", "top 10 tv shows"])
+        for i in range(0, len(page), 7):
+            parser.feed(page[i : i + 7])
+        streamed = {}
+        for section, row in parser.rows:
+            streamed.setdefault(section, []).append(row)
+        assert parser.done
+        assert streamed["TOP 10 Movies"] == parse_top10(page, "TOP 10 Movies")
+        assert streamed["top 10 tv shows"] == parse_top10(page, "TOP 10 TV Shows")
+        assert streamed["TOP 10 Movies"][0] == (1, "Title & 1", "top-10-movies-1")
+
+        # Non-ASCII titles of a page served without a charset are decoded as utf-8, like the DOM parser does
+        page = sample_page().replace("Title &amp; 3</a>", "Amélie — Kaho Naa… Pyaar Hai</a>").encode()
+
+        def fetch_without_charset(url, stream=False, headers=None):
+            response = tracker_module.requests.Response()
+            response.status_code, response.raw = 200, io.BytesIO(page)
+            response.headers["Content-Type"] = "text/html"
+            response.encoding = tracker_module.requests.utils.get_encoding_from_headers(response.headers)
+            return response
+
+        original_fetch_page = tracker_module.fetch_page
+        tracker_module.fetch_page = fetch_without_charset
+        try:
+            streamed = list(tracker_module.iter_top10_rows("https://flixpatrol.com/", ["TOP 10 Movies"], chunk_size=5))
+        finally:
+            tracker_module.fetch_page = original_fetch_page
+        assert [row for _, row in streamed] == parse_top10(page, "TOP 10 Movies")
+        assert streamed[2][1][1] == "Amélie — Kaho Naa… Pyaar Hai"
+        print("✓ Streaming parser test passed")
+
+    def test_streaming_parser_stops_after_requested_sections():
+        """Test that the streaming parser reports completion before the rest of the page is fed."""
+        page = sample_page(sections=("TOP 10 Movies",), trailer="<div>" + "x" * 1000 + "</div>")
+        parser = Top10StreamParser(["TOP 10 Movies"])
+        parser.feed(page[: page.index("</tbody>") + len("</tbody>")])
+        assert parser.done
+        assert len(parser.rows) == 10
+        print("✓ Streaming parser early stop test passed")
+
+    def test_run_profiler():
+        """Test that the profiler writes per-phase reports only when enabled."""
+        with tempfile.TemporaryDirectory() as tmp:
+            disabled = RunProfiler(False, tmp, "run")
+            with disabled.phase("scrape"):
+                pass
+            assert not os.path.exists(disabled.run_dir)
+
+            profiler = RunProfiler(True, tmp, "run", memory=True)
+            account = TraktAccount("A", [], workers=1)
+            try:
+                with profiler.phase("scrape"):
+                    account.submit(parse_top10, sample_page(), "TOP 10 Movies").result()
+            finally:
+                account.close()
+            files = sorted(os.listdir(profiler.run_dir))
+            assert files == ["01_scrape.alloc.txt", "01_scrape.prof", "phases.txt"]
+            # Work done on a worker thread during the phase is part of its profile
+            profiled = pstats.Stats(os.path.join(profiler.run_dir, "01_scrape.prof")).stats
+            assert any(function == "parse_top10" for _, _, function in profiled)
+        print("✓ Run profiler test passed")
+
+    def test_resume_only_redoes_failed_lists():
+        """Test that resuming a checkpointed run only syncs the lists that failed."""
+        originals = {
+            name: getattr(tracker_module, name)
+            for name in (
+                "update_list",
+                "create_type_trakt_list_payload",
+                "create_mixed_trakt_list_payload",
+                "prioritized_titles",
+            )
+        }
+        synced = []
+        failing = {"top-india-zee5-overall"}
+
+        def fake_update_list(slug, payload, client_id=None, access_token=None):
+            synced.append(slug)
+            return None if slug in failing else 304
+
+        with tempfile.TemporaryDirectory() as tmp:
+            config = Config()
+            config.CHECKPOINT_DIR = tmp
+            tracker = StreamingServiceTracker(config)
+            tracker._scrape_all_services = lambda only=None: {key: [] for key, _, _ in config.scraping_tasks}
+            tracker._validate_trakt_setup = lambda: True
+            tracker_module.update_list = fake_update_list
+            tracker_module.create_type_trakt_list_payload = lambda top_list, type, **credentials: {f"{type}s": []}
+            tracker_module.create_mixed_trakt_list_payload = lambda top_list, **credentials: {"movies": [], "shows": []}
+            try:
+                assert tracker.run() == 0
+                assert len(synced) == 6
+                checkpoint = RunCheckpoint.latest(tmp)
+                assert checkpoint.load("sync")["top-india-zee5-overall"] == "failed"
+
+                synced.clear()
+                failing.clear()
+                assert tracker.run(resume=True) == 0
+                assert synced == ["top-india-zee5-overall"]
+                assert set(checkpoint.load("sync").values()) == {"ok"}
+
+                # Lists that lost ranks to the deadline are synced, then completed by resume
+                config.CHECKPOINT_DIR = os.path.join(tmp, "partial")
+                tracker = StreamingServiceTracker(config)
+                tracker._validate_trakt_setup = lambda: True
+                tracker._scrape_all_services = lambda only=None: {
+                    key: [("1", "Dune", "dune")] for key, _, _ in config.scraping_tasks
+                }
+                tracker_module.prioritized_titles = lambda top_list: []
+                synced.clear()
+                assert tracker.run() == 0
+                checkpoint = RunCheckpoint.latest(config.CHECKPOINT_DIR)
+                assert len(synced) == 6 and len(checkpoint.load("partial")) == 6
+                assert set(checkpoint.load("sync").values()) == {"partial"}
+                tracker_module.prioritized_titles = originals["prioritized_titles"]
+                synced.clear()
+                assert tracker.run(resume=True) == 0
+                assert len(synced) == 6 and checkpoint.load("partial") == []
+                assert set(checkpoint.load("sync").values()) == {"ok"}
+
+                # A network error while resolving or syncing one list fails that list, not the run
+                def unreachable(*args, **kwargs):
+                    raise tracker_module.requests.exceptions.ConnectionError("connection reset")
+
+                def fake_update_list(slug, payload, client_id=None, access_token=None):
+                    synced.append(slug)
+                    if slug == "top-india-netflix-movies":
+                        raise tracker_module.requests.exceptions.ReadTimeout("read timed out")
+                    return 304
+
+                config.CHECKPOINT_DIR = os.path.join(tmp, "errors")
+                tracker = StreamingServiceTracker(config)
+                tracker._validate_trakt_setup = lambda: True
+                tracker._scrape_all_services = lambda only=None: {key: [] for key, _, _ in config.scraping_tasks}
+                tracker_module.update_list = fake_update_list
+                tracker_module.create_mixed_trakt_list_payload = unreachable
+                synced.clear()
+                assert tracker.run() == 0
+                checkpoint = RunCheckpoint.latest(config.CHECKPOINT_DIR)
+                assert "top-india-zee5-overall" not in checkpoint.load("resolve")
+                assert checkpoint.load("sync")["top-india-netflix-movies"] == "failed"
+                assert len(synced) == 4
+                tracker_module.create_mixed_trakt_list_payload = lambda top_list, **credentials: {"movies": []}
+                tracker_module.update_list = lambda slug, payload, client_id=None, access_token=None: 304
+                assert tracker.run(resume=True) == 0
+                assert set(checkpoint.load("sync").values()) == {"ok"} and len(checkpoint.load("sync")) == 6
+            finally:
+                for name, value in originals.items():
+                    setattr(tracker_module, name, value)
+        print("✓ Checkpoint resume test passed")
+
+    def test_hedged_fetcher():
+        """Test that a slow request is hedged, the fastest response wins and hedges are capped per host and run."""
+
+        class FakeResponse:
+            def __init__(self, name):
+                self.name = name
+
+            def close(self):
+                pass
+
+        calls = []
+
+        def slow_then_fast(url, **kwargs):
+            calls.append(url)
+            if len(calls) == 1:
+                time.sleep(0.5)
+                return FakeResponse("slow")
+            return FakeResponse("fast")
+
+        fetcher = HedgedFetcher(0.95, 5, initial_delay=0.05, max_per_host=1, getter=slow_then_fast)
+        assert fetcher.get("https://flixpatrol.com/top10/netflix/india/").name == "fast"
+        assert fetcher.hedges_issued["flixpatrol.com"] == 1
+        assert fetcher.hedges_won["flixpatrol.com"] == 1
+
+        calls.clear()
+        assert fetcher.get("https://flixpatrol.com/top10/zee5/india/").name == "slow"  # Hedge budget spent
+        assert len(calls) == 1
+
+        # The pool holds a primary and a hedge for every page fetched in parallel
+        config = Config()
+        config.FETCH_WORKERS, config.BACKFILL_CONCURRENCY = 4, 12
+        pooled = HedgedFetcher.from_config(config)
+        assert pooled._executor._max_workers == 24
+        pooled._executor.shutdown()
+
+        # A new run gets the full hedge budget again
+        fetcher.start_run()
+        assert fetcher.hedges_issued["flixpatrol.com"] == 0
+        calls.clear()
+        assert fetcher.get("https://flixpatrol.com/top10/zee5/india/").name == "fast"
+        assert fetcher.hedges_issued["flixpatrol.com"] == 1
+        print("✓ Hedged fetcher test passed")
+
+    def test_snapshot_archive_and_replay():
+        """Test that snapshots are deduplicated by hash and replayed instead of fetched."""
+        url = "https://flixpatrol.com/top10/netflix/india/"
+        page = sample_page().encode()
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = SnapshotArchive(tmp)
+            digest = archive.store(url, page, fetched_at="2024-01-01T00:00:00+00:00")
+            assert archive.store(url, page, fetched_at="2024-01-02T00:00:00+00:00") == digest
+            archive.store(url, b"<html></html>", fetched_at="2024-01-03T00:00:00+00:00")
+            assert len(os.listdir(os.path.join(tmp, "objects", digest[:2]))) >= 1
+            assert len(archive.entries(url)) == 3
+            assert archive.latest(url, at="2024-01-02T12:00:00+00:00")["sha256"] == digest
+            assert len(list(archive.iter_snapshots(url))) == 3
+
+            # The index is kept in memory; another writer's appends are read without rereading the file
+            other = SnapshotArchive(tmp)
+            assert len(other.entries(url)) == 3
+            archive.store(url, page, fetched_at="2024-01-04T00:00:00+00:00")
+            assert len(other.entries(url)) == 4 and other.entries()[-1]["fetched_at"].startswith("2024-01-04")
+            assert other._index_offset == os.path.getsize(os.path.join(tmp, SnapshotArchive.INDEX_FILE))
+            assert other.read(digest) == page
+
+            saved = (tracker_module.config.SNAPSHOT_ARCHIVE, tracker_module.config.SNAPSHOT_REPLAY)
+            saved_at = tracker_module.config.SNAPSHOT_REPLAY_AT
+            tracker_module.config.SNAPSHOT_ARCHIVE, tracker_module.config.SNAPSHOT_REPLAY = tmp, True
+            tracker_module.config.SNAPSHOT_REPLAY_AT = "2024-01-02T12:00:00+00:00"
+            try:
+                assert len(tracker_module.scrape_top10(url, "TOP 10 Movies")) == 10
+                assert len(tracker_module.scrape_top10_streaming(url, ["TOP 10 TV Shows"])["TOP 10 TV Shows"]) == 10
+                assert tracker_module.scrape_top10("https://flixpatrol.com/unknown/", "TOP 10 Movies") is None
+            finally:
+                tracker_module.config.SNAPSHOT_ARCHIVE, tracker_module.config.SNAPSHOT_REPLAY = saved
+                tracker_module.config.SNAPSHOT_REPLAY_AT = saved_at
+        print("✓ Snapshot archive test passed")
+
+    def test_event_log_sampling():
+        """Test that events are written as JSON lines by the background writer and sampled per event."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "events.jsonl")
+            tracker_module.configure_event_log(path, {"search.compare": 0.25})
+            try:
+                for i in range(8):
+                    tracker_module.log_event("search.compare", title="Dune", candidate=i)
+                tracker_module.log_event("search.results", title="Dune", count=8)
+            finally:
+                tracker_module.stop_event_log()
+            with open(path, encoding="utf-8") as f:
+                events = [json.loads(line) for line in f]
+        assert [event["event"] for event in events] == ["search.compare"] * 2 + ["search.results"]
+        assert events[1]["candidate"] == 4
+        print("✓ Event log test passed")
+
+    def test_backfill_skips_stored_dates():
+        """Test that the backfill stores each dated chart once and resumes without refetching."""
+        fetched = []
+
+        def fake_iter_top10_rows(url, section_titles, chunk_size=None):
+            fetched.append(url)
+            page = sample_page(sections=section_titles, rows=3)
+            parser = Top10StreamParser(section_titles)
+            parser.feed(page)
+            yield from parser.rows
+
+        original = tracker_module.iter_top10_rows
+        tracker_module.iter_top10_rows = fake_iter_top10_rows
+        with tempfile.TemporaryDirectory() as tmp:
+            config = Config()
+            config.BACKFILL_MIN_INTERVAL = 0
+            store = RankingStore(os.path.join(tmp, "rankings.sqlite3"))
+            charts = [("netflix", "movies"), ("netflix", "kids_movies"), ("zee5", "overall")]
+            try:
+                counts = tracker_module.backfill(store, config, "2024-01-01", "2024-01-03", charts)
+                assert counts == {"pages": 6, "charts": 9, "missing": 0, "failed": 0}
+                assert "https://flixpatrol.com/top10/netflix/india/2024-01-02/" in fetched
+                assert store.chart("netflix", "kids_movies", "2024-01-02")[0] == (
+                    1,
+                    "Title & 1",
+                    "top-10-kids-movies-1",
+                )
+
+                fetched.clear()
+                counts = tracker_module.backfill(store, config, "2023-12-31", "2024-01-03", charts)
+                assert counts["pages"] == 2 and len(fetched) == 2
+
+                # A page without one of its charts leaves that chart to be fetched again
+                page_sections = ["TOP 10 Movies"]
+                fake_rows = fake_iter_top10_rows
+                tracker_module.iter_top10_rows = lambda url, titles, chunk_size=None: fake_rows(
+                    url, [title for title in titles if title in page_sections]
+                )
+                counts = tracker_module.backfill(store, config, "2023-12-30", "2023-12-30", charts)
+                assert counts == {"pages": 2, "charts": 1, "missing": 2, "failed": 0}
+                assert "2023-12-30" not in store.stored_dates("netflix", "kids_movies")
+                page_sections = [config.sections["kids_movies"], config.sections["overall"]]
+                counts = tracker_module.backfill(store, config, "2023-12-30", "2023-12-30", charts)
+                assert counts == {"pages": 2, "charts": 2, "missing": 0, "failed": 0}
+            finally:
+                tracker_module.iter_top10_rows = original
+                store.close()
+        print("✓ Backfill test passed")
+
+    def test_search_result_matching():
+        """Test that the title matchers pick the candidate whose slug matches the FlixPatrol slug."""
+
+        def result(type, title, slug, trakt_id):
+            return {"type": type, type: {"title": title, "ids": {"slug": slug, "trakt": trakt_id}}}
+
+        results = [result("movie", "Dune Drift", "dune-drift-2021", 1), result("movie", "Dune", "dune-2021", 2)]
+        assert (
+            tracker_module.match_search_result_by_type(results, "Dune", "dune-2021", "movie")["movie"]["ids"]["trakt"]
+            == 2
+        )
+        assert tracker_module.match_search_result_by_type(results, "Dune", "unrelated", "movie") is None
+
+        mixed = [result("show", "Dune: Prophecy", "dune-prophecy", 3), result("movie", "Dune", "dune-2021", 2)]
+        assert tracker_module.match_search_result(mixed, "Dune Prophecy", "dune-prophecy")["type"] == "show"
+        print("✓ Search result matching test passed")
+
+    def test_process_pool_parsing_matches_in_process():
+        """Test that parsing in a process pool returns the same rows as parsing in-process."""
+        sections = ["TOP 10 Movies", "TOP 10 TV Shows"]
+        jobs = [(sample_page(rows=rows).encode(), sections, f"page-{rows}") for rows in range(3, 11)]
+
+        in_process = PageParser(processes=0)
+        pool = PageParser(processes=2, chunk_size=3)
+        try:
+            expected = in_process.parse_many(jobs)
+            assert pool.parse_many(jobs) == expected
+            assert pool.parse(*jobs[0]) == expected[0]
+        finally:
+            pool.close()
+        assert expected[-1]["TOP 10 TV Shows"] == parse_top10(jobs[-1][0], "TOP 10 TV Shows")
+
+        # The tracker only fetches bytes and hands parsing to the pool; failed pages mark their lists as failed
+        config = Config()
+        config.PARSE_PROCESSES, config.STREAMING_PARSER = 2, False
+        page = sample_page(["TOP 10 Movies", "TOP 10 TV Shows", "TOP 10 Overall"]).encode()
+        original_fetch_pages = tracker_module.fetch_pages
+        response = tracker_module.requests.Response()
+        response.status_code, response._content = 200, page
+        tracker_module.fetch_pages = lambda urls, workers, headers=None: {
+            url: None if url == config.urls["prime"] else response for url in urls
+        }
+        try:
+            tracker = StreamingServiceTracker(config)
+            data = tracker._scrape_all_services()
+        finally:
+            tracker_module.fetch_pages = original_fetch_pages
+        assert data["netflix_movies"] == parse_top10(page, "TOP 10 Movies")
+        assert data["prime_movies"] == [] and "prime_movies" in tracker._failed_services
+        assert "netflix_shows" not in tracker._failed_services
+        print("✓ Process pool parsing test passed")
+
+    def test_run_budget_caps_timeouts_and_drops_low_priority_work():
+        """Test that request timeouts shrink with the remaining budget and the last ranks are dropped first."""
+        now = [0.0]
+        budget = RunBudget(100, connect_timeout=5, read_timeout=30, reserve=20, clock=lambda: now[0])
+        assert budget.timeout() == (5, 30)
+        now[0] = 90
+        assert budget.timeout() == (5, 10)
+        assert not budget.sleep(16)  # Retry backoff would pass the deadline
+
+        top_list = [(str(rank), f"Title {rank}", f"title-{rank}") for rank in range(1, 11)]
+        original = tracker_module._run_budget
+        tracker_module._run_budget = budget
+        try:
+            assert [row[0] for row in tracker_module.prioritized_titles(top_list)] == [str(r) for r in range(1, 9)]
+            assert budget.dropped["search"] == 2
+
+            now[0] = 100
+            assert budget.expired()
+            try:
+                budget.timeout()
+                assert False, "expected DeadlineExceeded"
+            except tracker_module.DeadlineExceeded:
+                pass
+            assert tracker_module.update_list("some-list", {"movies": [{"ids": {"trakt": 1}}]}) is None
+
+            # Once the list is emptied, the deadline does not stop it from being filled again
+            class FakeResponse:
+                status_code = 201
+
+                def json(self):
+                    return []
+
+            def fake_request(method, url, **kwargs):
+                requests_made.append(url.rsplit("/", 1)[-1])
+                if url.endswith("/remove"):
+                    now[0] = 100
+                return FakeResponse()
+
+            requests_made = []
+            now[0] = 95
+            original_request = tracker_module.trakt_request
+            tracker_module.trakt_request = fake_request
+            try:
+                assert tracker_module.update_list("some-list", {"movies": [{"ids": {"trakt": 1}}]}).status_code == 201
+            finally:
+                tracker_module.trakt_request = original_request
+            assert requests_made == ["items", "remove", "items"]
+        finally:
+            tracker_module._run_budget = original
+
+        assert RunBudget(0, 5, 30).timeout() == (5, 30)  # No deadline
+        print("✓ Run budget test passed")
+
+    def test_account_registry_runs_accounts_in_parallel():
+        """Test that lists are assigned to accounts declaratively and each account has its own rate limit."""
+        accounts = tracker_module.parse_account_lists("netflix=list-a, list-b;EXTRA=list-c")
+        assert accounts == {"NETFLIX": ["list-a", "list-b"], "EXTRA": ["list-c"]}
+        assert Config().list_account("top-india-zee5-overall") == "OTHERS"
+        config = Config()
+        config.TRAKT_ACCOUNTS = {"NETFLIX": ["top-india-netflix-movies"]}
+        tracker = StreamingServiceTracker(config)  # Its own lists, not those of the module configuration
+        assert tracker.list_jobs == [("netflix_movies", "top-india-netflix-movies", "movie", "NETFLIX")]
+        assert list(tracker.accounts) == ["NETFLIX"]
+
+        started = []
+        original = tracker_module.requests.request
+
+        def fake_request(method, url, **kwargs):
+            started.append(time.monotonic())
+
+        def sync_lists(count):
+            for _ in range(count):
+                tracker_module.trakt_request("POST", "https://api.trakt.tv/users/me/lists/x/items")
+
+        registry = [TraktAccount(name, [], workers=1, min_interval=0.1) for name in ("A", "B", "C")]
+        tracker_module.requests.request = fake_request
+        try:
+            begin = time.monotonic()
+            for future in [account.submit(sync_lists, 4) for account in registry]:
+                future.result()
+            elapsed = time.monotonic() - begin
+        finally:
+            tracker_module.requests.request = original
+            for account in registry:
+                account.close()
+        # 4 requests per account take 0.3s at 0.1s intervals; 12 requests on one account would take 1.1s
+        assert len(started) == 12
+        assert 0.3 <= elapsed < 0.8
+
+        # A list that cannot be created is reported, not crashed on: retry_request gives up with None
+        class InstantBudget(RunBudget):
+            def sleep(self, seconds):
+                return True
+
+        originals = (tracker_module.trakt_request, tracker_module.get_lists, tracker_module._run_budget)
+        tracker_module.trakt_request = lambda method, url, **kwargs: None
+        tracker_module.get_lists = lambda client_id=None, access_token=None: []
+        tracker_module._run_budget = InstantBudget(0, 5, 30)
+        config = Config()
+        accounts = TraktAccount.all_from_config(config)
+        try:
+            assert tracker_module.check_lists(config, accounts) is True
+        finally:
+            tracker_module.trakt_request, tracker_module.get_lists, tracker_module._run_budget = originals
+            for account in accounts.values():
+                account.close()
+
+        # An account without credentials fails validation by itself, without borrowing another account's token
+        requested = []
+        tracker_module.trakt_request = lambda method, url, **kwargs: requested.append(url)
+        try:
+            assert TraktAccount("MAIN", [], "client", None, "token", None).validate() is False
+            assert requested == []
+
+            # Deleting a list is paced, timed and traced like every other Trakt call
+            class Deleted:
+                status_code = 204
+
+            tracker_module.trakt_request = lambda method, url, **kwargs: requested.append((method, url)) or Deleted
+            assert tracker_module.delete_list("old-list") == 204
+            assert requested == [("DELETE", "https://api.trakt.tv/users/me/lists/old-list")]
+        finally:
+            tracker_module.trakt_request = originals[0]
+        print("✓ Account registry test passed")
+
+    def test_trace_export():
+        """Test that spans are written in Chrome trace-event format with retries and cross-thread parents."""
+
+        class InstantBudget(RunBudget):
+            def sleep(self, seconds):
+                return True
+
+        attempts = []
+
+        @tracker_module.traced("sync", detail=lambda slug: {"list": slug})
+        @tracker_module.retry_request
+        def flaky_update(slug):
+            attempts.append(slug)
+            return 304 if len(attempts) > 1 else None
+
+        original_budget = tracker_module._run_budget
+        tracker_module._run_budget = InstantBudget(0, 5, 30)
+        account = TraktAccount("A", [], workers=1)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            tracker_module.start_trace(path)
+            try:
+                with tracker_module.trace_span("sync", "phase"):
+                    account.submit(flaky_update, "some-list").result()
+            finally:
+                tracker_module.stop_trace()
+                tracker_module._run_budget = original_budget
+                account.close()
+            with open(path, encoding="utf-8") as f:
+                events = json.load(f)["traceEvents"]
+
+        spans = {event["name"]: event for event in events if event["ph"] == "X"}
+        assert [event["name"] for event in events if event["ph"] == "X"].count("flaky_update attempt") == 2
+        assert spans["retry sleep"]["cat"] == "sleep"
+        assert spans["flaky_update"]["args"] == {
+            "id": spans["flaky_update"]["args"]["id"],
+            "parent": 1,
+            "list": "some-list",
+        }
+        assert spans["flaky_update"]["tid"] != spans["sync"]["tid"]
+        assert spans["retry sleep"]["args"]["parent"] == spans["flaky_update"]["args"]["id"]
+        assert any(event["ph"] == "M" and event["args"]["name"].startswith("trakt-A") for event in events)
+        assert tracker_module.trace_span("idle", "phase") is tracker_module._NULL_CONTEXT
+        print("✓ Trace export test passed")
+
+    def test_strategy_cache_learns_and_detects_drift():
+        """Test that the working parse strategies are persisted per service and section and drift is logged."""
+        url = "https://flixpatrol.com/top10/netflix/india/2024-01-02/"
+        page = sample_page(rows=3)
+        drifted_page = page.replace("<h3>TOP 10 Movies</h3>", "<h3>Top 10 movies</h3>").replace(
+            "table-td w-12 font-semibold text-right text-gray-500 table-hover:text-gray-400", "rank-cell"
+        )
+        drifts = []
+        original_drift = tracker_module.log_layout_drift
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "parse_strategies.json")
+            tracker_module.config.STRATEGY_CACHE = path
+            tracker_module.log_layout_drift = lambda url, section, kind, strategy: drifts.append((kind, strategy))
+            try:
+                expected = parse_top10(page, "TOP 10 Movies", url)
+                with open(path, encoding="utf-8") as f:
+                    assert json.load(f) == {"netflix|TOP 10 Movies": {"heading": "exact match", "rank": "rank class"}}
+                assert parse_top10(page, "TOP 10 Movies", url) == expected and drifts == []
+
+                assert parse_top10(drifted_page, "TOP 10 Movies", url) == expected
+                assert drifts == [("heading", "exact match"), ("rank", "rank class")]
+                cache = tracker_module.StrategyCache(path)  # Reloaded from disk
+                assert cache.get(url, "TOP 10 Movies") == {"heading": "case-insensitive", "rank": "first td"}
+
+                # Parser processes send what they learn back to the parent, the only writer of the file
+                os.remove(path)
+                tracker_module._strategy_cache = None
+                urls = [url.replace("netflix", service) for service in ("netflix", "prime", "zee5", "hbo")]
+                pool = PageParser(processes=2)
+                try:
+                    pool.parse_many(
+                        [(page.encode(), ["TOP 10 Movies", "TOP 10 TV Shows"], page_url) for page_url in urls]
+                    )
+                finally:
+                    pool.close()
+                with open(path, encoding="utf-8") as f:
+                    assert len(json.load(f)) == 8
+                assert os.listdir(tmp) == ["parse_strategies.json"]  # No temporary file left behind
+
+                # A cache that cannot be written does not fail the parse
+                tracker_module.config.STRATEGY_CACHE = os.path.join(path, "not-a-directory.json")
+                assert parse_top10(page, "TOP 10 Movies", url) == expected
+            finally:
+                tracker_module.config.STRATEGY_CACHE = ""
+                tracker_module.log_layout_drift = original_drift
+        print("✓ Strategy cache test passed")
+
+    def test_query_service_serves_materialized_views():
+        """Test that run charts are recorded and served from precomputed views with ETags."""
+        with tempfile.TemporaryDirectory() as tmp:
+            config = Config()
+            config.RANKINGS_DB = os.path.join(tmp, "rankings.sqlite3")
+            tracker = StreamingServiceTracker(config)
+            rows = [("1", "Dune", "dune-2021"), ("2", "Heat", "heat")]
+            tracker._record_rankings({"netflix_movies": rows, "prime_movies": rows[::-1], "zee5_overall": []})
+
+            store = RankingStore(config.RANKINGS_DB)
+            store.write_chart("netflix", "movies", "2024-01-01", [("1", "Heat", "heat")])
+            tracker_module.materialize_views(store)
+            service = tracker_module.RankingQueryService(store, cache_size=4)
+            server = tracker_module.ThreadingHTTPServer(("127.0.0.1", 0), tracker_module.make_query_handler(service))
+            thread = tracker_module.threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            base = f"http://127.0.0.1:{server.server_port}"
+            try:
+                status, body, etag = service.get("/latest/netflix", {})
+                assert status == 200 and json.loads(body)["movies"]["rows"][0]["slug"] == "dune-2021"
+                assert service.get("/latest/netflix/", {}) is service.get("/latest/netflix", {})  # LRU cache hit
+
+                history = json.loads(service.get("/history/netflix/movies", {"to": "2024-06-01"})[1])
+                assert [chart["date"] for chart in history] == ["2024-01-01"]
+                heat = json.loads(service.get("/titles/heat", {})[1])
+                assert {appearance["service"] for appearance in heat["appearances"]} == {"netflix", "prime"}
+                assert json.loads(service.get("/titles", {"q": "dun"})[1]) == [{"slug": "dune-2021", "title": "Dune"}]
+                assert service.get("/history/netflix/movies", {"from": "yesterday"})[0] == 400
+                assert service.get("/latest/hulu", {})[0] == 404
+
+                with urllib.request.urlopen(f"{base}/latest/netflix") as response:
+                    assert response.headers["ETag"] == etag
+                request = urllib.request.Request(f"{base}/latest/netflix", headers={"If-None-Match": etag})
+                try:
+                    urllib.request.urlopen(request)
+                    assert False, "expected 304"
+                except urllib.error.HTTPError as e:
+                    assert e.code == 304
+            finally:
+                server.shutdown()
+                server.server_close()
+                store.close()
+        print("✓ Query service test passed")
+
+    def test_state_bundle_round_trip_and_merge():
+        """Test that a state bundle carries caches and rankings to a fresh runner, merges and detects tampering."""
+
+        def runner_config(state_dir):
+            config = Config()
+            config.TRACKER_CACHE = os.path.join(state_dir, "cache.json")
+            config.STRATEGY_CACHE = os.path.join(state_dir, "parse_strategies.json")
+            config.RANKINGS_DB = os.path.join(state_dir, "rankings.sqlite3")
+            return config
+
+        with tempfile.TemporaryDirectory() as tmp:
+            bundle_path = os.path.join(tmp, "bundle", "state.zip")
+            first, second = runner_config(os.path.join(tmp, "a")), runner_config(os.path.join(tmp, "b"))
+            original_config = tracker_module.config
+            tracker_module.config = first
+            try:
+                cache = tracker_module.get_tracker_cache()
+                cache.put("titles", "movie|dune-2021", type="movie", trakt=1)
+                url = "https://flixpatrol.com/top10/netflix/india/2024-01-02/"
+                page = sample_page(rows=3).encode()
+                parses = []
+
+                def parse():
+                    parses.append(url)
+                    return {"TOP 10 Movies": parse_top10(page, "TOP 10 Movies")}
+
+                rows = tracker_module.parse_sections_cached(url, page, ["TOP 10 Movies"], parse)
+                assert tracker_module.parse_sections_cached(url, page, ["TOP 10 Movies"], parse) == rows
+                assert len(parses) == 1  # Identical bytes are not parsed again
+                cache.save()
+                tracker_module.StrategyCache(first.STRATEGY_CACHE).record(
+                    url, "TOP 10 Movies", {"heading": "exact match"}
+                )
+                store = RankingStore(first.RANKINGS_DB)
+                store.write_chart("netflix", "movies", "2024-01-01", [("1", "Dune", "dune-2021")])
+                store.close()
+                tracker_module.export_bundle(first, bundle_path)
+
+                # A second runner with its own state merges the bundle and exports the union
+                tracker_module.config = second
+                tracker_module.get_tracker_cache().put("titles", "show|dark", type="show", trakt=2)
+                tracker_module.get_tracker_cache().save()
+                store = RankingStore(second.RANKINGS_DB)
+                store.write_chart("netflix", "movies", "2024-01-02", [("1", "Heat", "heat")])
+                store.close()
+                tracker_module.export_bundle(second, bundle_path)
+                assert not os.path.exists(bundle_path + ".tmp")
+
+                reloaded = tracker_module.TrackerCache(second.TRACKER_CACHE)
+                assert reloaded.get("titles", "movie|dune-2021")["trakt"] == 1
+                assert reloaded.get("titles", "show|dark")["trakt"] == 2
+                assert reloaded.get("pages", url)["sections"]["TOP 10 Movies"] == [
+                    list(row) for row in rows["TOP 10 Movies"]
+                ]
+                assert tracker_module.StrategyCache(second.STRATEGY_CACHE).get(url, "TOP 10 Movies")
+                store = RankingStore(second.RANKINGS_DB)
+                assert store.stored_dates("netflix", "movies") == {"2024-01-01", "2024-01-02"}
+                store.close()
+
+                # A bundle whose member does not match the manifest is refused
+                tampered_path = os.path.join(tmp, "tampered.zip")
+                with (
+                    tracker_module.zipfile.ZipFile(bundle_path) as bundle,
+                    tracker_module.zipfile.ZipFile(tampered_path, "w") as tampered,
+                ):
+                    for name in bundle.namelist():
+                        content = bundle.read(name)
+                        tampered.writestr(name, content + b" " if name == "cache.json" else content)
+                assert tracker_module.import_bundle(first, tampered_path) is False
+                assert tracker_module.import_bundle(first, bundle_path) is True
+            finally:
+                tracker_module.config = original_config
+                tracker_module._tracker_cache = None
+                tracker_module._strategy_cache = None
+        print("✓ State bundle test passed")
+
+    def test_work_queue_leases_and_distributed_run():
+        """Test that expired leases are requeued and that workers produce the same run as a single process."""
+        with tempfile.TemporaryDirectory() as tmp:
+            now = [0.0]
+            work_queue = tracker_module.WorkQueue(os.path.join(tmp, "leases.sqlite3"), 10, 2, clock=lambda: now[0])
+            work_queue.enqueue("run", "scrape", "netflix_movies", {"url": "u", "section": "s"})
+            crashed = work_queue.claim("w1")
+            now[0] = 11  # w1 stopped heartbeating
+            retried = work_queue.claim("w2")
+            assert retried["name"] == "netflix_movies" and retried["attempt"] == 2
+            assert not work_queue.complete(crashed, "w1", [])  # w1 lost the lease
+            now[0] = 22
+            assert work_queue.claim("w3") is None  # Out of attempts
+            assert work_queue.results("run", "scrape")["netflix_movies"] == ("failed", "lease expired")
+            work_queue.close()
+
+            # Only the latest run is worked on, and a run that stops waiting cancels what is left
+            work_queue = tracker_module.WorkQueue(os.path.join(tmp, "runs.sqlite3"), 10, 2, clock=lambda: now[0])
+            work_queue.enqueue("20240101-000000", "sync", "old-list", {})
+            work_queue.enqueue("20240102-000000", "sync", "new-list", {})
+            work_queue.enqueue("20240102-000000", "sync", "other-list", {})
+            assert work_queue.claim("w1")["name"] == "new-list"
+            assert work_queue.results("20240101-000000", "sync")["old-list"] == (
+                "cancelled",
+                "superseded by a newer run",
+            )
+            assert work_queue.cancel("20240102-000000", "sync", "run deadline reached") == 2
+            assert work_queue.claim("w2") is None and not work_queue.pending()
+            work_queue.close()
+
+            original_budget = tracker_module._run_budget
+            try:
+                budget = tracker_module.start_task_budget(Config(), time.time() + 100)
+                assert 99 < budget.remaining() <= 100  # The coordinator's deadline, not RUN_DEADLINE from now
+                assert tracker_module.start_task_budget(Config(), None).seconds == Config().RUN_DEADLINE
+            finally:
+                tracker_module._run_budget = original_budget
+
+            config = Config()
+            config.CHECKPOINT_DIR = os.path.join(tmp, "checkpoints")
+            config.WORK_QUEUE = os.path.join(tmp, "queue.sqlite3")
+            config.WORK_POLL_INTERVAL = 0.01
+            config.WORK_IDLE_EXIT = 0.5
+            config.WORK_MAX_ATTEMPTS = 2
+            config.RECORD_RANKINGS = False
+            rows = {url: [["1", f"Top of {url}", "top"]] for url in config.urls.values()}
+            originals = {
+                name: getattr(tracker_module, name)
+                for name in (
+                    "scrape_top10",
+                    "update_list",
+                    "create_type_trakt_list_payload",
+                    "create_mixed_trakt_list_payload",
+                )
+            }
+            original_validate = tracker_module.TraktAccount.validate
+            synced = []
+            tracker_module.scrape_top10 = lambda url, section: None if "zee5" in url else rows[url]
+            tracker_module.update_list = lambda slug, payload, client_id=None, access_token=None: synced.append(slug)
+            tracker_module.create_type_trakt_list_payload = lambda top_list, type, **credentials: {f"{type}s": []}
+            tracker_module.create_mixed_trakt_list_payload = lambda top_list, **credentials: {"movies": [], "shows": []}
+            tracker_module.TraktAccount.validate = lambda self: True
+            tracker = StreamingServiceTracker(config)
+            tracker._validate_trakt_setup = lambda: True
+            tracker.work_queue = tracker_module.WorkQueue.from_config(config)
+            workers = [
+                tracker_module.threading.Thread(target=tracker_module.run_worker, args=(config, f"worker-{i}"))
+                for i in range(2)
+            ]
+            try:
+                for worker in workers:
+                    worker.start()
+                assert tracker.run() == 0
+                scraped = RunCheckpoint.latest(config.CHECKPOINT_DIR).load("scrape")
+                assert scraped["failed"] == ["zee5_overall"]
+                assert scraped["data"]["netflix_movies"] == rows[config.urls["netflix"]]
+                assert scraped["data"]["zee5_overall"] == []
+                assert sorted(synced) == sorted(slug for _, slug, _, _ in tracker.list_jobs)
+            finally:
+                for worker in workers:
+                    worker.join()
+                tracker.work_queue.close()
+                for name, value in originals.items():
+                    setattr(tracker_module, name, value)
+                tracker_module.TraktAccount.validate = original_validate
+        print("✓ Work queue test passed")
+
+    def test_change_feed_deltas_and_offsets():
+        """Test that chart movements are appended per run and can be read from a saved offset."""
+        delta = tracker_module.chart_delta(
+            [("1", "Dune", "dune"), ("2", "Heat", "heat"), ("3", "Up", "up")],
+            [("1", "Heat", "heat"), ("2", "Dune", "dune"), ("3", "Alien", "alien")],
+        )
+        assert delta["entered"] == [{"rank": 3, "title": "Alien", "slug": "alien"}]
+        assert delta["exited"] == [{"rank": 3, "title": "Up", "slug": "up"}]
+        assert [(m["slug"], m["from"], m["to"]) for m in delta["moved"]] == [("heat", 2, 1), ("dune", 1, 2)]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            original_config = tracker_module.config
+            tracker_module.config = Config()
+            tracker_module.config.TRACKER_CACHE = os.path.join(tmp, "cache.json")
+            tracker_module._tracker_cache = None
+            config = Config()
+            config.CHANGE_FEED = os.path.join(tmp, "changes.jsonl")
+            tracker = StreamingServiceTracker(config)
+            feed = tracker_module.ChangeFeed(config.CHANGE_FEED)
+            try:
+                tracker._publish_changes({"netflix_movies": [("1", "Dune", "dune")], "prime_movies": []})
+                first = list(feed.read())
+                assert [event["key"] for _, event in first] == ["netflix_movies"]
+                saved_offset = first[-1][0]
+
+                tracker._failed_services = {"netflix_shows"}
+                tracker._publish_changes(
+                    {"netflix_movies": [("1", "Heat", "heat"), ("2", "Dune", "dune")], "netflix_shows": []}
+                )
+                tracker._publish_changes({"netflix_movies": [("1", "Heat", "heat"), ("2", "Dune", "dune")]})
+                with open(config.CHANGE_FEED, "ab") as f:
+                    f.write(b'{"partial":')  # An append in progress is not read
+                ((next_offset, event),) = feed.read(saved_offset)
+                assert event["entered"][0]["slug"] == "heat" and event["moved"][0]["to"] == 2
+                assert next_offset == feed.size() - len(b'{"partial":')
+                try:
+                    list(feed.read(saved_offset + 1))
+                    assert False, "expected an invalid offset"
+                except ValueError:
+                    pass
+                assert list(feed.read(next_offset)) == [] and list(feed.read(feed.size() + 100)) == []
+
+                # Merging a bundled feed keeps its offsets and appends the events only this runner has
+                def content(feed):
+                    with open(feed.path, "rb") as f:
+                        return f.read()
+
+                runner = tracker_module.ChangeFeed(os.path.join(tmp, "runner", "changes.jsonl"))
+                assert runner.merge(content(feed)) == 2  # A fresh runner gets the whole history
+                assert [offset for offset, _ in runner.read()] == [offset for offset, _ in feed.read()]
+                own = {"run_id": "runner", "key": "zee5_overall", "entered": [], "exited": [], "moved": []}
+                runner.append([own])
+                assert feed.merge(content(runner)) == 1  # The bundle is ahead of the local feed
+                other = {**own, "run_id": "other"}
+                runner.append([other])
+                feed.append([{**own, "run_id": "local"}])
+                assert runner.merge(content(feed)) == 1  # Diverged
+                merged = [(offset, event["run_id"]) for offset, event in runner.read()]
+                assert merged[:4] == [(offset, event["run_id"]) for offset, event in feed.read()]
+                assert merged[4][1] == "other"
+            finally:
+                tracker_module.config = original_config
+                tracker_module._tracker_cache = None
+        print("✓ Change feed test passed")
+
+    def test_candidate_corpus_resolves_known_titles_locally():
+        """Test that search candidates are kept and recurring titles are resolved without calling Trakt."""
+
+        def result(type, title, slug, trakt_id, year=2024):
+            return {"type": type, type: {"title": title, "year": year, "ids": {"slug": slug, "trakt": trakt_id}}}
+
+        candidates = [
+            result("movie", "Dune Drift", "dune-drift-2021", 1),
+            result("movie", "Dune: Part Two", "dune-part-two-2024", 2),
+            result("show", "Dune: Prophecy", "dune-prophecy", 3),
+        ]
+        closest, confidence = tracker_module.best_search_result(candidates, "Dune Part 2", "dune-part-2")
+        assert closest["movie"]["ids"]["trakt"] == 2 and confidence < 0.85
+        assert tracker_module.best_search_result([], "Dune Part 2", "dune-part-2") is None
+
+        searches = []
+
+        class FakeResponse:
+            status_code = 200
+
+            def json(self):
+                return candidates
+
+        original_request = tracker_module.trakt_request
+        tracker_module.trakt_request = lambda method, url, **kwargs: searches.append(url) or FakeResponse()
+        with tempfile.TemporaryDirectory() as tmp:
+            tracker_module.config.CANDIDATE_CORPUS = os.path.join(tmp, "candidates.sqlite3")
+            try:
+                assert tracker_module.search_title(("Dune: Prophecy", "dune-prophecy", "1")) == [("show", 3, "1")]
+                assert len(searches) == 1
+                # Another service lists the same titles: resolved from the corpus, with a confidence score
+                assert tracker_module.search_title_by_type(("Dune: Part Two", "dune-part-two"), "movie") == [2]
+                assert tracker_module.search_title(("Dune Prophecy", "dune-prophecy", "4")) == [("show", 3, "4")]
+                assert len(searches) == 1
+                corpus = tracker_module.get_candidate_corpus()
+                assert corpus.resolve("Dune Prophecy", "dune-prophecy", ("movie",))[1] != 3
+                assert tracker_module.resolve_locally("Heat", "heat", ("movie", "show")) is None
+                tracker_module.search_title(("Heat", "heat", "5"))
+                assert len(searches) == 2  # Low local confidence goes to Trakt
+
+                # Equally good candidates are told apart by the year in the slug, or left to Trakt
+                corpus.add([result("movie", "Heat", "heat", 20, 1995), result("movie", "Heat", "heat-2023", 21, 2023)])
+                assert corpus.resolve("Heat", "heat-2023", ("movie",))[1] == 21
+                assert corpus.resolve("Heat", "heat", ("movie",)) is None
+
+                candidates.clear()  # Trakt finds nothing
+                assert tracker_module.search_title(("Nothing", "nothing", "6")) == []
+                assert tracker_module.search_title_by_type(("Nothing", "nothing"), "movie") == []
+            finally:
+                tracker_module.trakt_request = original_request
+                tracker_module.get_candidate_corpus().close()
+                tracker_module.config.CANDIDATE_CORPUS = ""
+                tracker_module._candidate_corpus = None
+        print("✓ Candidate corpus test passed")
+
+    def test_publish_windows_and_change_check():
+        """Test that chart changes are timed per service and turned into a schedule and a cheap, conditional check."""
+        day = 86400 * 20000
+        minutes = [23 * 60 + 50, 0 * 60 + 10, 23 * 60 + 55, 0 * 60 + 5]  # Around midnight UTC
+        center, half_width = tracker_module.publish_window([day + minute * 60 for minute in minutes])
+        assert center == 0 and half_width == 15
+
+        with tempfile.TemporaryDirectory() as tmp:
+            original_config = tracker_module.config
+            tracker_module.config = Config()
+            tracker_module.config.TRACKER_CACHE = os.path.join(tmp, "cache.json")
+            tracker_module.config.PUBLISH_DELAY = 20
+            tracker_module._tracker_cache = None
+            config = Config()
+            config.CHANGE_FEED = ""
+            config.RECORD_RANKINGS = False
+            tracker = StreamingServiceTracker(config)
+            try:
+                cache = tracker_module.get_tracker_cache()
+                url = "https://flixpatrol.com/top10/netflix/india/"
+                cache.record_page(url, "a", {"TOP 10 Movies": [("1", "Dune", "dune")]})
+                cache.record_page(url, "b", {"TOP 10 Movies": [("1", "Dune", "dune")]})  # Only the markup changed
+                assert cache.get("publish", "netflix") is None
+                cache.put("pages", url, **{**cache.get("pages", url), "checked_at": time.time() - 3600})
+                cache.record_page(url, "c", {"TOP 10 Movies": [("1", "Heat", "heat")]})
+                published = cache.get("publish", "netflix")["times"]
+                assert len(published) == 1
+                assert time.time() - 1900 < published[0] < time.time() - 1700  # Between the two observations
+
+                cache.put("publish", "prime", times=[day + minute * 60 for minute in minutes])
+                windows = tracker_module.predicted_windows(cache)
+                assert windows["prime"]["fetch_at"] == 35  # 00:00 + 15 min spread + 20 min delay
+                assert "35 0 * * *" in tracker_module.cron_schedule(windows)
+
+                charts = {key: [("1", "Dune", "dune")] for key, _, _ in config.scraping_tasks}
+                tracker._scrape_all_services = lambda only=None: dict(charts)
+                assert tracker_module.charts_changed(tracker)  # Never scraped by a run
+                tracker._publish_changes(charts)
+                assert not tracker_module.charts_changed(tracker)
+                charts["prime_movies"] = [("1", "Heat", "heat")]
+                assert tracker_module.charts_changed(tracker)
+                assert tracker._prescraped["data"]["prime_movies"] == [("1", "Heat", "heat")]
+                tracker._scrape_all_services = None  # The run reuses the pages the check fetched
+                state = tracker._run_scrape_phase(tracker_module.RunCheckpoint(tmp, tracker.run_id), None)
+                assert state["data"] == charts and tracker._prescraped is None
+
+                tracker._scrape_all_services = lambda only=None: dict(charts)
+                tracker._publish_changes(charts)
+                tracker._record_run(complete=False)  # Scraped, but some list was not synced
+                assert tracker_module.charts_changed(tracker)
+                tracker._record_run(complete=True)
+                assert not tracker_module.charts_changed(tracker)
+
+                # Pages with cached rows are fetched conditionally; a 304 reuses the rows without a body
+                sent = []
+
+                def conditional_get(url, headers=None, **kwargs):
+                    sent.append(headers)
+                    response = tracker_module.requests.Response()
+                    if "If-None-Match" in headers:
+                        response.status_code = 304
+                    else:
+                        response.status_code, response._content = 200, sample_page().encode()
+                        response.headers["ETag"] = '"v1"'
+                    return response
+
+                original_get = tracker_module.requests.get
+                tracker_module.requests.get = conditional_get
+                try:
+                    page_url = "https://flixpatrol.com/top10/disney/india/"
+                    rows = tracker_module.scrape_top10(page_url, "TOP 10 Movies")
+                    assert len(rows) == 10 and "If-None-Match" not in sent[0]
+                    assert tracker_module.scrape_top10(page_url, "TOP 10 Movies") == rows
+                    assert sent[1]["If-None-Match"] == '"v1"'
+                    tracker_module.scrape_top10(page_url, "TOP 10 TV Shows")  # Not cached yet: unconditional
+                    assert "If-None-Match" not in sent[2]
+                finally:
+                    tracker_module.requests.get = original_get
+            finally:
+                tracker_module.config = original_config
+                tracker_module._tracker_cache = None
+        print("✓ Publish schedule test passed")
+
+    def test_policy_simulation_is_deterministic():
+        """Test that the policy simulator runs the retry layer on a virtual clock, repeatably."""
+        import simulate_policies
+
+        policy = simulate_policies.parse_policy("retries=10,backoff=2,deadline=600")
+        started = time.perf_counter()
+        first = simulate_policies.simulate("5xx-burst", policy)
+        assert simulate_policies.simulate("5xx-burst", policy) == first
+        assert first["lists"] == len(tracker_module.list_jobs(tracker_module.config)) - 1
+        assert first["duration"] < 600  # The last backoff would pass the deadline, so the list is given up
+        unbounded = simulate_policies.simulate("5xx-burst", simulate_policies.parse_policy("deadline=0"))
+        assert unbounded["duration"] > 1000
+        assert time.perf_counter() - started < 5  # Half an hour of backoff, not waited for
+        healthy = simulate_policies.simulate("healthy", policy)
+        assert healthy["lists"] == len(tracker_module.list_jobs(tracker_module.config)) and not healthy["deadline_hit"]
+        print("✓ Policy simulation test passed")
+
+    def test_ranking_records_flow_into_the_payload():
+        """Test that parsed records keep integer ranks through JSON and resolve in place into the payload."""
+        from top_pt_stream_services import RankingBatch, RankingRecord, as_records
+
+        rows = parse_top10(sample_page(), "TOP 10 Movies")
+        assert all(isinstance(row, RankingRecord) and isinstance(row.rank, int) for row in rows)
+        assert as_records(json.loads(json.dumps(rows))) == rows  # Checkpoints store plain lists
+        old_rows = [("1", "Dune", "dune"), ("n/a", "Heat", "heat")]  # Text ranks from older state files
+        assert as_records(old_rows) == [(1, "Dune", "dune"), (2, "Heat", "heat")]
+
+        batch = RankingBatch.from_rows(rows[:3])
+        assert len(batch) == 3 and batch.slugs == [row.slug for row in rows[:3]] and batch.ranks[1] == rows[1].rank
+        batch.resolve(2, "show", 30)
+        batch.resolve(0, "movie", 10)
+        payload = batch.payload(("movie", "show"))
+        assert payload == {"movies": [{"ids": {"trakt": 10}}], "shows": [{"ids": {"trakt": 30}}]}
+        assert batch.payload(("movie",)) == {"movies": [{"ids": {"trakt": 10}}]}
+        items = [
+            {"type": "show", "show": {"ids": {"trakt": 2}}},
+            {"type": "person"},
+            {"type": "movie", "movie": {"ids": {"trakt": 1}}},
+        ]
+        assert tracker_module.parse_items(items) == {
+            "movies": [{"ids": {"trakt": 1}}],
+            "shows": [{"ids": {"trakt": 2}}],
+        }
+
+        original = tracker_module.search_title
+        tracker_module.search_title = lambda info, *args: [("movie" if info[2] % 2 else "show", info[2] * 100, info[2])]
+        try:
+            payload = tracker_module.create_mixed_trakt_list_payload(rows, "client", "token")
+        finally:
+            tracker_module.search_title = original
+        assert payload["movies"] == [{"ids": {"trakt": row.rank * 100}} for row in rows if row.rank % 2]
+        assert payload["shows"] == [{"ids": {"trakt": row.rank * 100}} for row in rows if not row.rank % 2]
+        print("✓ Ranking record test passed")
+
+    def test_title_prefetch_resolves_other_charts_in_the_background():
+        """Test that titles of the other charts on a page are resolved ahead, at the configured request share."""
+        trailer = (
+            '<div><a class="x" href="/title/coming-up/">Coming &amp; Up</a><a href="/title/next-show/">Next</a></div>'
+        )
+        page = sample_page(sections=("TOP 10 Movies",), rows=2, trailer=trailer)
+        assert tracker_module.harvest_titles(page) == {
+            "top-10-movies-1": "Title & 1",
+            "top-10-movies-2": "Title & 2",
+            "coming-up": "Coming & Up",
+            "next-show": "Next",
+        }
+
+        searches = []
+
+        class FakeResponse:
+            status_code = 200
+
+            def __init__(self, url):
+                self.url = url
+
+            def json(self):
+                type = "show" if "Next" in self.url else "movie"
+                title, slug = ("Next", "next-show") if type == "show" else ("Coming and Up", "coming-up")
+                return [{"type": type, type: {"title": title, "year": 2024, "ids": {"slug": slug, "trakt": 7}}}]
+
+        class VirtualClock:
+            now = 0.0
+
+            def sleep(self, seconds):
+                self.now += seconds
+
+        clock = VirtualClock()
+        account = TraktAccount("PREFETCH", [], "client", "secret", "token", "refresh", min_interval=1.0)
+        original_request = tracker_module.trakt_request
+        tracker_module.trakt_request = lambda method, url, **kwargs: searches.append(clock.now) or FakeResponse(url)
+        with tempfile.TemporaryDirectory() as tmp:
+            tracker_module.config.TRACKER_CACHE = os.path.join(tmp, "cache.json")
+            try:
+                prefetcher = tracker_module.TitlePrefetcher(0.5, 10, clock=lambda: clock.now, sleeper=clock.sleep)
+                prefetcher.harvest("https://flixpatrol.com/top10/netflix/india/", page.encode())
+                prefetcher.harvest("https://flixpatrol.com/top10/netflix/india/", page.encode())  # Read once
+                prefetcher.start(account, exclude={"top-10-movies-1", "top-10-movies-2"})  # The synced rows
+                prefetcher.finish(5)
+                assert len(searches) == 2 and searches[1] - searches[0] >= 2  # Half the rate of 1 request/s
+                assert prefetcher.resolved == 2
+                assert tracker_module.search_title_by_type(("Next", "next-show"), "show") == [7]
+                assert tracker_module.search_title(("Coming & Up", "coming-up", 3)) == [("movie", 7, 3)]
+                assert len(searches) == 2  # Both already resolved when they entered a synced chart
+                again = tracker_module.TitlePrefetcher(0.5, 10)
+                again.harvest("https://flixpatrol.com/top10/netflix/india/", page)
+                again.start(account, exclude={"top-10-movies-1", "top-10-movies-2"})
+                again.stop()
+                assert again.searched == 0 and len(searches) == 2  # Only titles not resolved yet are searched
+            finally:
+                tracker_module.trakt_request = original_request
+                tracker_module.config.TRACKER_CACHE = ""
+                tracker_module._tracker_cache = None
+        print("✓ Title prefetch test passed")
+
+    def test_request_plan_predicts_and_defers_work():
+        """Test that the planner counts Trakt requests per endpoint from the caches and defers what does not fit."""
+        config = Config()
+        config.SYNC_ONLY_CHANGED = True
+        data = {
+            key: [(rank, f"Title {rank}", f"{key}-{rank}") for rank in range(1, 11)]
+            for key, _, _ in config.scraping_tasks
+        }
+        data["prime_shows"] = data["netflix_shows"]  # The same shows on both services
+        accounts = TraktAccount.all_from_config(config)
+        accounts["NETFLIX"].access_token = "netflix-token"
+        with tempfile.TemporaryDirectory() as tmp:
+            tracker_module.config.TRACKER_CACHE = os.path.join(tmp, "cache.json")
+            try:
+                cache = tracker_module.get_tracker_cache()
+                cache.put("tokens", accounts["NETFLIX"]._token_key())
+                cache.put("lists", "NETFLIX", slugs=config.TRAKT_ACCOUNTS["NETFLIX"])
+                for rank in range(1, 11):
+                    cache.put("titles", f"movie|netflix_movies-{rank}", type="movie", trakt=rank)
+                cache.put("titles", "show|netflix_shows-1", type="show", trakt=100)
+                synced = {"movies": [{"ids": {"trakt": rank}} for rank in range(1, 11)]}
+                cache.put("synced", "top-india-netflix-movies", sha256=tracker_module.payload_digest(synced))
+
+                plan = tracker_module.plan_requests(
+                    config, accounts, tracker_module.list_jobs(config), data, {}, {}, float("inf")
+                )
+                netflix, prime = plan.requests["NETFLIX"], plan.requests["PRIME"]
+                assert "GET /users/me" not in netflix and "GET /users/me/lists" not in netflix
+                assert (
+                    prime["GET /users/me"] == 1
+                    and prime["POST /oauth/token"] == 1
+                    and prime["GET /users/me/lists"] == 1
+                )
+                assert plan.lists["top-india-netflix-movies"]["requests"] == 0  # Resolved and unchanged since synced
+                assert netflix["GET /search"] == 9 and netflix["POST /users/me/lists/{id}/items"] == 1
+                assert prime["GET /search"] == 10 + 9  # The movies, then the shows not already resolved
+                assert plan.order(tracker_module.list_jobs(config))[0][1] == "top-india-netflix-movies"
+
+                # 0.3s per GET and 1s per POST: PRIME's shows (6.6s with its token and list checks) fit in 7s,
+                # its movies do not and are deferred, without being started
+                short = tracker_module.plan_requests(
+                    config, accounts, tracker_module.list_jobs(config), data, {}, {"top-india-zee5-overall": "ok"}, 7
+                )
+                assert short.deferred == ["top-india-amazon-prime-video-movies"]
+                assert short.requests["PRIME"]["GET /search"] == 9
+                kept = [job[1] for job in short.order(tracker_module.list_jobs(config))]
+                assert kept.index("top-india-amazon-prime-video-shows") < kept.index("top-india-jiohotstar-overall")
+                assert "top-india-amazon-prime-video-movies" not in kept and "top-india-zee5-overall" in kept
+
+                config.TRAKT_GET_QUOTA = 10
+                paced = tracker_module.plan_requests(
+                    config, accounts, tracker_module.list_jobs(config), data, {}, {}, float("inf")
+                )
+                assert paced.pacing == {"PRIME": 30.0, "OTHERS": 30.0}  # NETFLIX makes exactly its 10 GETs
+
+                # A plan is a dry run: what its scrape records in the caches is neither kept nor saved
+                cache.save()
+                with open(cache.path, "rb") as f:
+                    saved = f.read()
+
+                def scrape(only=None):
+                    tracker_module.get_tracker_cache().record_publish("netflix", time.time())
+                    return data
+
+                tracker = StreamingServiceTracker()
+                tracker._scrape_all_services = scrape
+                assert tracker.plan() == 0
+                assert tracker_module.get_tracker_cache() is cache and cache.get("publish", "netflix") is None
+                with open(cache.path, "rb") as f:
+                    assert f.read() == saved
+            finally:
+                tracker_module.config.TRACKER_CACHE = ""
+                tracker_module._tracker_cache = None
+        print("✓ Request plan test passed")
+
     def run_tests():
         """Run all tests."""
         print("Running refactoring tests...")
         test_config_initialization()
         test_tracker_initialization()
         test_main_function_exists()
+        test_streaming_parser_matches_dom_parser()
+        test_streaming_parser_stops_after_requested_sections()
+        test_run_profiler()
+        test_resume_only_redoes_failed_lists()
+        test_hedged_fetcher()
+        test_snapshot_archive_and_replay()
+        test_event_log_sampling()
+        test_backfill_skips_stored_dates()
+        test_search_result_matching()
+        test_process_pool_parsing_matches_in_process()
+        test_run_budget_caps_timeouts_and_drops_low_priority_work()
+        test_account_registry_runs_accounts_in_parallel()
+        test_trace_export()
+        test_strategy_cache_learns_and_detects_drift()
+        test_query_service_serves_materialized_views()
+        test_state_bundle_round_trip_and_merge()
+        test_work_queue_leases_and_distributed_run()
+        test_change_feed_deltas_and_offsets()
+        test_candidate_corpus_resolves_known_titles_locally()
+        test_publish_windows_and_change_check()
+        test_policy_simulation_is_deterministic()
+        test_ranking_records_flow_into_the_payload()
+        test_title_prefetch_resolves_other_charts_in_the_background()
+        test_request_plan_predicts_and_defers_work()
         print("\n🎉 All tests passed! The refactored code structure is working correctly.")
 
     if __name__ == "__main__":
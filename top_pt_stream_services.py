@@ -1,11 +1,55 @@
+import argparse
+import array
+import atexit
+import bisect
+import codecs
+import contextlib
+import cProfile
+import functools
+import hashlib
+import html
+import itertools
+import json
 import logging
+import logging.handlers
+import lzma
+import math
 import os
+import pstats
+import queue
+import re
+import socket
+import sqlite3
+import sys
+import tempfile
+import threading
 import time
-from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Tuple, Union
+import tracemalloc
+import zipfile
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from datetime import date, datetime, timedelta, timezone
+from html.parser import HTMLParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+from urllib.parse import parse_qsl, urlparse
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Tag
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -18,39 +62,160 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 # ============================
 # CONFIGURATION
 # ============================
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    """Parse "event=rate,event=rate" (e.g. "search.compare=0.1") into a dict of sampling rates."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        event, _, rate = item.partition("=")
+        rates[event.strip()] = float(rate)
+    return rates
+
+
+def parse_account_lists(value: str) -> Dict[str, List[str]]:
+    """Parse "ACCOUNT=slug,slug;ACCOUNT=slug" into the list slugs owned by each account."""
+    accounts = {}
+    for item in filter(None, (part.strip() for part in value.split(";"))):
+        account, _, slugs = item.partition("=")
+        accounts[account.strip().upper()] = [slug.strip() for slug in slugs.split(",") if slug.strip()]
+    return accounts
+
+
+# Trakt accounts and the lists each one owns. Lists can be moved to more accounts (each has its own rate
+# limits) with TRAKT_ACCOUNTS, e.g. "NETFLIX=top-india-netflix-movies;EXTRA=top-india-netflix-shows"
+DEFAULT_TRAKT_ACCOUNTS = {
+    "NETFLIX": ["top-india-netflix-movies", "top-india-netflix-shows"],  # Account 1: Netflix
+    "PRIME": ["top-india-amazon-prime-video-movies", "top-india-amazon-prime-video-shows"],  # Account 2: Prime Video
+    "OTHERS": ["top-india-zee5-overall", "top-india-jiohotstar-overall"],  # Account 3: jiohotstar & Zee5
+}
+
+# Credentials read for every account, from <ACCOUNT>_<FIELD> environment variables
+TRAKT_CREDENTIAL_FIELDS = ("CLIENT_ID", "CLIENT_SECRET", "ACCESS_TOKEN", "REFRESH_TOKEN")
+
+
 class Config:
     """Configuration management for the streaming services tracker."""
 
     def __init__(self):
         # Load environment variables for multiple Trakt.tv accounts
-
-        # Account 1: Netflix
-        self.NETFLIX_CLIENT_ID = os.getenv("NETFLIX_CLIENT_ID")
-        self.NETFLIX_CLIENT_SECRET = os.getenv("NETFLIX_CLIENT_SECRET")
-        self.NETFLIX_ACCESS_TOKEN = os.getenv("NETFLIX_ACCESS_TOKEN")
-        self.NETFLIX_REFRESH_TOKEN = os.getenv("NETFLIX_REFRESH_TOKEN")
-
-        # Account 2: Prime Video
-        self.PRIME_CLIENT_ID = os.getenv("PRIME_CLIENT_ID")
-        self.PRIME_CLIENT_SECRET = os.getenv("PRIME_CLIENT_SECRET")
-        self.PRIME_ACCESS_TOKEN = os.getenv("PRIME_ACCESS_TOKEN")
-        self.PRIME_REFRESH_TOKEN = os.getenv("PRIME_REFRESH_TOKEN")
-
-        # Account 3: jiohotstar & Zee5
-        self.OTHERS_CLIENT_ID = os.getenv("OTHERS_CLIENT_ID")
-        self.OTHERS_CLIENT_SECRET = os.getenv("OTHERS_CLIENT_SECRET")
-        self.OTHERS_ACCESS_TOKEN = os.getenv("OTHERS_ACCESS_TOKEN")
-        self.OTHERS_REFRESH_TOKEN = os.getenv("OTHERS_REFRESH_TOKEN")
+        accounts = os.getenv("TRAKT_ACCOUNTS", "")
+        self.TRAKT_ACCOUNTS = parse_account_lists(accounts) if accounts else dict(DEFAULT_TRAKT_ACCOUNTS)
+        for account in self.TRAKT_ACCOUNTS:
+            for field in TRAKT_CREDENTIAL_FIELDS:
+                setattr(self, f"{account}_{field}", os.getenv(f"{account}_{field}"))
+
+        # Each account syncs its lists with its own worker threads and request rate limit
+        self.TRAKT_ACCOUNT_WORKERS = int(os.getenv("TRAKT_ACCOUNT_WORKERS", "2"))  # lists processed at once
+        self.TRAKT_MIN_INTERVAL = float(os.getenv("TRAKT_MIN_INTERVAL", "0.3"))  # seconds between requests
+        # Trakt quotas per account: authenticated GETs per window, and seconds between POSTs
+        self.TRAKT_GET_QUOTA = int(os.getenv("TRAKT_GET_QUOTA", "1000"))
+        self.TRAKT_QUOTA_WINDOW = float(os.getenv("TRAKT_QUOTA_WINDOW", "300"))  # seconds
+        self.TRAKT_POST_INTERVAL = float(os.getenv("TRAKT_POST_INTERVAL", "1"))  # seconds
+
+        # Request planning: predict each account's Trakt requests before the run, order its lists cheapest
+        # first, pace it under the GET quota and defer the lists that would not fit the run deadline
+        self.PLAN_REQUESTS = os.getenv("PLAN_REQUESTS", "True").lower() in ("true", "True")
+        self.PLAN_REQUEST_SECONDS = float(os.getenv("PLAN_REQUEST_SECONDS", "0.5"))  # expected time per request
 
         # Other configs
         self.KIDS_LIST = os.getenv("KIDS_LIST", "False").lower() in ("true", "True")
         self.PRINT_LISTS = os.getenv("PRINT_LISTS", "False").lower() in ("true", "True")
 
         # Request configuration
-        self.REQUEST_TIMEOUT = 30  # seconds
+        self.REQUEST_TIMEOUT = 30  # seconds, read timeout of each request
+        self.CONNECT_TIMEOUT = float(os.getenv("CONNECT_TIMEOUT", "5"))  # seconds
         self.MAX_RETRIES = 10
         self.BACKOFF_FACTOR = 2
 
+        # Run deadline: every request timeout and retry sleep is capped by the time left, and low priority
+        # work (resolving the last ranks of each list) is dropped once less than the reserve is left
+        self.RUN_DEADLINE = float(os.getenv("RUN_DEADLINE", "3600"))  # seconds per run, 0 to disable
+        self.RUN_DEADLINE_RESERVE = float(os.getenv("RUN_DEADLINE_RESERVE", "300"))  # seconds
+        self.LOW_PRIORITY_RANK = int(os.getenv("LOW_PRIORITY_RANK", "8"))  # ranks below this one are low priority
+
+        # Scraping configuration
+        # Streaming mode reads each page once, in chunks, and stops as soon as the needed sections are read
+        self.STREAMING_PARSER = os.getenv("STREAMING_PARSER", "False").lower() in ("true", "True")
+        self.STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "16384"))  # bytes
+
+        # Parallel parsing: network threads only fetch page bytes and a process pool parses them
+        self.PARSE_PROCESSES = int(os.getenv("PARSE_PROCESSES", "0"))  # parser processes, 0 to parse in-process
+        self.PARSE_CHUNK_SIZE = int(os.getenv("PARSE_CHUNK_SIZE", "4"))  # pages sent to a parser process at once
+        self.FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "4"))  # pages fetched in parallel
+
+        # Request hedging for FlixPatrol pages: when the first request has not answered by the tracked latency
+        # percentile, an identical second request is issued and the first response wins
+        self.HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS", "False").lower() in ("true", "True")
+        self.HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+        self.HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "5"))  # samples needed to trust the percentile
+        self.HEDGE_INITIAL_DELAY = float(os.getenv("HEDGE_INITIAL_DELAY", "3"))  # seconds, until enough samples
+        self.HEDGE_MAX_PER_HOST = int(os.getenv("HEDGE_MAX_PER_HOST", "3"))  # hedges allowed per host and run
+
+        # Content-addressed archive of every fetched FlixPatrol page, and replay mode reading pages from it
+        self.SNAPSHOT_ARCHIVE = os.getenv("SNAPSHOT_ARCHIVE", "")  # archive directory, empty to disable
+        self.SNAPSHOT_REPLAY = os.getenv("SNAPSHOT_REPLAY", "False").lower() in ("true", "True")
+        self.SNAPSHOT_REPLAY_AT = os.getenv("SNAPSHOT_REPLAY_AT", "")  # ISO timestamp, latest snapshot if empty
+
+        # Local state (checkpoints, caches) kept between runs
+        self.STATE_DIR = os.getenv("STATE_DIR", ".tracker_state")
+        self.CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", os.path.join(self.STATE_DIR, "checkpoints"))
+        # Cache of resolved titles, list IDs, validated tokens and page hashes; empty to disable
+        self.TRACKER_CACHE = os.getenv("TRACKER_CACHE", os.path.join(self.STATE_DIR, "cache.json"))
+        self.TOKEN_CHECK_TTL = float(os.getenv("TOKEN_CHECK_TTL", "6"))  # hours a validated token is trusted
+        self.LIST_CACHE_TTL = float(os.getenv("LIST_CACHE_TTL", "24"))  # hours known list IDs are trusted
+        # Every Trakt search result seen, indexed by trigrams to resolve titles locally; empty to disable
+        self.CANDIDATE_CORPUS = os.getenv("CANDIDATE_CORPUS", os.path.join(self.STATE_DIR, "candidates.sqlite3"))
+        self.RESOLVE_MIN_CONFIDENCE = float(os.getenv("RESOLVE_MIN_CONFIDENCE", "0.85"))  # local match needed
+        # Single-file bundle of all local state, imported before and exported after each run; empty to disable
+        self.STATE_BUNDLE = os.getenv("STATE_BUNDLE", "")
+        # Parse strategies that worked per (service, section), tried first on the next pages; empty to disable
+        self.STRATEGY_CACHE = os.getenv("STRATEGY_CACHE", os.path.join(self.STATE_DIR, "parse_strategies.json"))
+
+        # Durable work queue shared by the `coordinate` command and its `work` processes
+        self.WORK_QUEUE = os.getenv("WORK_QUEUE", os.path.join(self.STATE_DIR, "work_queue.sqlite3"))
+        self.WORK_LEASE = float(os.getenv("WORK_LEASE", "60"))  # seconds a claimed task stays with its worker
+        self.WORK_MAX_ATTEMPTS = int(os.getenv("WORK_MAX_ATTEMPTS", "3"))  # claims before a task is failed
+        self.WORK_POLL_INTERVAL = float(os.getenv("WORK_POLL_INTERVAL", "1"))  # seconds between queue polls
+        self.WORK_IDLE_EXIT = float(os.getenv("WORK_IDLE_EXIT", "60"))  # idle seconds before a worker exits, 0 never
+
+        # Append-only log of chart movements per run, readable from a saved byte offset; empty to disable
+        self.CHANGE_FEED = os.getenv("CHANGE_FEED", os.path.join(self.STATE_DIR, "changes.jsonl"))
+        # Skip updating lists whose payload is the same as the one last synced successfully
+        self.SYNC_ONLY_CHANGED = os.getenv("SYNC_ONLY_CHANGED", "False").lower() in ("true", "True")
+
+        # Learned chart publish windows (`schedule`, `check`, `run --if-changed`)
+        self.PUBLISH_HISTORY = int(os.getenv("PUBLISH_HISTORY", "60"))  # publish times kept per service
+        self.PUBLISH_DELAY = int(os.getenv("PUBLISH_DELAY", "20"))  # minutes after a window to schedule a run
+
+        # Background resolution of the other titles on fetched pages, into the tracker cache and candidate corpus
+        self.PREFETCH_TITLES = os.getenv("PREFETCH_TITLES", "False").lower() in ("true", "True")
+        self.PREFETCH_SHARE = float(os.getenv("PREFETCH_SHARE", "0.25"))  # share of an account's request rate
+        self.PREFETCH_MAX = int(os.getenv("PREFETCH_MAX", "100"))  # titles searched per run
+        self.PREFETCH_WAIT = float(os.getenv("PREFETCH_WAIT", "30"))  # seconds left to drain after the sync
+
+        # Ranking history database, filled by runs and by the dated backfill
+        self.RANKINGS_DB = os.getenv("RANKINGS_DB", os.path.join(self.STATE_DIR, "rankings.sqlite3"))
+        self.BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "4"))  # pages fetched in parallel
+        self.BACKFILL_MIN_INTERVAL = float(os.getenv("BACKFILL_MIN_INTERVAL", "1.0"))  # seconds between requests
+        self.RECORD_RANKINGS = os.getenv("RECORD_RANKINGS", "True").lower() in ("true", "True")  # store run charts
+
+        # Read-only HTTP query service over the ranking history (`serve` command)
+        self.SERVE_HOST = os.getenv("SERVE_HOST", "127.0.0.1")
+        self.SERVE_PORT = int(os.getenv("SERVE_PORT", "8080"))
+        self.SERVE_CACHE_SIZE = int(os.getenv("SERVE_CACHE_SIZE", "512"))  # responses kept in the LRU cache
+        self.SERVE_RELOAD_INTERVAL = float(os.getenv("SERVE_RELOAD_INTERVAL", "30"))  # seconds between view checks
+
+        # Profiling configuration (opt-in, near zero overhead when disabled)
+        self.PROFILE = os.getenv("PROFILE", "False").lower() in ("true", "True")
+        self.PROFILE_MEMORY = os.getenv("PROFILE_MEMORY", "False").lower() in ("true", "True")
+        self.PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+        # Structured event log: JSON lines written by a background thread, with optional per-event sampling
+        self.EVENT_LOG = os.getenv("EVENT_LOG", "")  # JSON lines file, empty to send events to the standard log
+        self.EVENT_SAMPLE_RATES = parse_sample_rates(os.getenv("EVENT_SAMPLE_RATES", ""))
+
+        # Span trace of a run in Chrome trace-event format, viewable in chrome://tracing or Perfetto
+        self.TRACE_FILE = os.getenv("TRACE_FILE", "")  # JSON file, empty to disable
+
         # Dates
         self.yesterday_date = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
 
@@ -68,26 +233,62 @@ class Config:
             "shows": "TOP 10 TV Shows",
             "overall": "TOP 10 Overall",
             "overall_jiohotstar": "TOP 10 Overall (in Hindi)",
+            "kids_movies": "TOP 10 Kids Movies",
+            "kids_shows": "TOP 10 Kids TV Shows",
         }
 
+        # Scraping tasks: (data key, service, section)
+        self.scraping_tasks = [
+            ("netflix_movies", "netflix", "movies"),
+            ("netflix_shows", "netflix", "shows"),
+            ("zee5_overall", "zee5", "overall"),
+            ("jiohotstar_overall", "jiohotstar", "overall_jiohotstar"),
+            ("prime_movies", "prime", "movies"),
+            ("prime_shows", "prime", "shows"),
+        ]
+
+        # Top kids only available on "yesterday" page
+        if self.KIDS_LIST:
+            self.urls["netflix_kids"] = self.dated_url("netflix", self.yesterday_date)
+            self.scraping_tasks += [
+                ("netflix_kids_movies", "netflix_kids", "kids_movies"),
+                ("netflix_kids_shows", "netflix_kids", "kids_shows"),
+            ]
+
+        # Charts covered by the dated backfill: (service, section)
+        self.backfill_charts = [
+            ("netflix", "movies"),
+            ("netflix", "shows"),
+            ("netflix", "kids_movies"),
+            ("netflix", "kids_shows"),
+            ("zee5", "overall"),
+            ("jiohotstar", "overall_jiohotstar"),
+            ("prime", "movies"),
+            ("prime", "shows"),
+        ]
+
+    def list_account(self, list_slug: str) -> Optional[str]:
+        """Return the account owning a Trakt list, None if no account owns it."""
+        for account, slugs in self.TRAKT_ACCOUNTS.items():
+            if list_slug in slugs:
+                return account
+        return None
+
+    def chart_service(self, service: str) -> str:
+        """Return the service whose charts a page shows ("netflix" for the dated "netflix_kids" page)."""
+        url = self.urls[service]
+        return min((name for name, base in self.urls.items() if url.startswith(base)), key=lambda n: len(self.urls[n]))
+
+    def dated_url(self, service: str, chart_date: str) -> str:
+        """Return the FlixPatrol page of a service for a given date (YYYY-MM-DD)."""
+        return f"{self.urls[service]}{chart_date}/"
+
 
 # ============================
 # GLOBAL VARIABLES (for backward compatibility)
 # ============================
 config = Config()
 
-# Netflix account credentials
-NETFLIX_CLIENT_ID = config.NETFLIX_CLIENT_ID
-NETFLIX_ACCESS_TOKEN = config.NETFLIX_ACCESS_TOKEN
-
-# Prime Video account credentials
-PRIME_CLIENT_ID = config.PRIME_CLIENT_ID
-PRIME_ACCESS_TOKEN = config.PRIME_ACCESS_TOKEN
-
-# jiohotstar & Zee5 account credentials
-OTHERS_CLIENT_ID = config.OTHERS_CLIENT_ID
-OTHERS_ACCESS_TOKEN = config.OTHERS_ACCESS_TOKEN
-
 # Other configs
 KIDS_LIST = config.KIDS_LIST
 PRINT_LISTS = config.PRINT_LISTS
@@ -167,628 +368,4041 @@ trakt_jiohotstar_list_slug = "top-india-jiohotstar-overall"
 trakt_prime_movies_list_slug = "top-india-amazon-prime-video-movies"
 trakt_prime_shows_list_slug = "top-india-amazon-prime-video-shows"
 
+# Trakt lists: (scraped data key, list slug, media type or None for mixed lists, list data)
+trakt_lists = [
+    ("netflix_movies", trakt_netflix_movies_list_slug, "movie", trakt_netflix_movies_list_data),
+    ("netflix_shows", trakt_netflix_shows_list_slug, "show", trakt_netflix_shows_list_data),
+    ("prime_movies", trakt_prime_movies_list_slug, "movie", trakt_prime_movies_list_data),
+    ("prime_shows", trakt_prime_shows_list_slug, "show", trakt_prime_shows_list_data),
+    ("zee5_overall", trakt_zee5_list_slug, None, trakt_zee5_top_list_data),
+    ("jiohotstar_overall", trakt_jiohotstar_list_slug, None, trakt_jiohotstar_top_list_data),
+]
+trakt_list_data = {slug: list_data for _, slug, _, list_data in trakt_lists}
+
+
+# Trakt lists a configuration syncs: (scraped data key, list slug, media type or None for mixed lists, account)
+def list_jobs(config: Config) -> List[Tuple[str, str, Optional[str], str]]:
+    return [
+        (key, slug, media_type, config.list_account(slug))
+        for key, slug, media_type, _ in trakt_lists
+        if config.list_account(slug) is not None
+    ]
+
+
 # ============================
-# HELPER METHODS
+# REQUEST HEDGING
 # ============================
 
 
-# Get headers
-def get_headers(client_id: str = None, access_token: str = None) -> Dict[str, str]:
-    """Returns headers with authorization for requests.
+class LatencyTracker:
+    """Thread-safe window of recent response latencies per host."""
 
-    Args:
-        client_id: The Trakt.tv client ID for the appropriate account
-        access_token: The access token for the appropriate account
-    """
-    # Default to Netflix account if no credentials provided
-    client_id = client_id or NETFLIX_CLIENT_ID
-    access_token = access_token or NETFLIX_ACCESS_TOKEN
+    def __init__(self, window: int = 200):
+        self._samples: Dict[str, Deque[float]] = {}
+        self._window = window
+        self._lock = threading.Lock()
 
-    user_agent = (
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/130.0.0.0 Safari/537.36"
-    )
+    def record(self, host: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(host, deque(maxlen=self._window)).append(seconds)
 
-    return {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {access_token}",
-        "trakt-api-version": "2",
-        "trakt-api-key": client_id,
-        "User-Agent": user_agent,
-    }
+    def count(self, host: str) -> int:
+        with self._lock:
+            return len(self._samples.get(host, ()))
 
+    def percentile(self, host: str, q: float) -> Optional[float]:
+        """Return the q-quantile (0..1) of the recorded latencies for a host, or None without samples."""
+        with self._lock:
+            samples = sorted(self._samples.get(host, ()))
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
 
-# Print the results
-def print_top_list(title: str, top_list: List[Tuple[str, str, str]]) -> None:
-    logging.info("=" * 30)
-    logging.info(f"{title}")
-    logging.info("=" * 30)
-    for rank, item_title, title_tag in top_list:
-        logging.info(f"{rank}: {item_title} | {title_tag}")
+    def hosts(self) -> List[str]:
+        with self._lock:
+            return list(self._samples)
 
 
-# Scrape movie or show data based in the section title
-def scrape_top10(url: str, section_title: str) -> Optional[List[Tuple[str, str, str]]]:
-    data = []
+class HedgedFetcher:
+    """Issue a second identical GET when the first one is slower than the tracked latency percentile.
 
-    # Define headers to mimic a real browser
-    user_agent = (
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
-        "(KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36"
-    )
-    headers = {
-        "Content-Type": "application/json",
-        "User-Agent": user_agent,
-        "Cookie": "_nss=1",
-    }
+    The first response to arrive wins; the other one is closed when it completes. Hedges are capped
+    per host and run (see `start_run`) so a slow host cannot double the load on it.
+    """
 
-    try:
-        # Send the GET request
-        response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    def __init__(
+        self,
+        percentile: float,
+        min_samples: int,
+        initial_delay: float,
+        max_per_host: int,
+        getter: Callable[..., requests.Response] = None,
+        max_workers: int = 8,
+    ):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.max_per_host = max_per_host
+        self.latency = LatencyTracker()
+        self.hedges_issued: Counter = Counter()
+        self.hedges_won: Counter = Counter()
+        self._getter = getter or requests.get
+        self._lock = threading.Lock()
+        # Room for a primary and a hedge per concurrent fetch: a primary waiting for a free thread would
+        # count its queueing time as latency and be hedged for nothing
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="hedge")
+
+    @classmethod
+    def from_config(cls, config: Config) -> "HedgedFetcher":
+        return cls(
+            config.HEDGE_PERCENTILE,
+            config.HEDGE_MIN_SAMPLES,
+            config.HEDGE_INITIAL_DELAY,
+            config.HEDGE_MAX_PER_HOST,
+            max_workers=2 * max(config.FETCH_WORKERS, config.BACKFILL_CONCURRENCY),
+        )
 
-        # Check for a successful response
-        if response.status_code == 200:
-            # Parse the HTML content
-            soup = BeautifulSoup(response.content, "html.parser")
-
-            # Locate the correct section - search in document order, not heading tag order
-            # This ensures we find the first occurrence in the actual HTML structure
-            section_header = None
-
-            # Find all heading tags in document order
-            all_headings = soup.find_all(["h2", "h3", "h4"])
-
-            for heading in all_headings:
-                heading_text = heading.get_text(strip=True)
-                # Try exact match first
-                if heading_text == section_title:
-                    section_header = heading
-                    logging.debug(f"Found section '{section_title}' with {heading.name} tag (exact match)")
-                    break
-                # Try case-insensitive match
-                elif heading_text.lower() == section_title.lower():
-                    section_header = heading
-                    logging.debug(f"Found section '{section_title}' with {heading.name} tag (case-insensitive)")
-                    break
+    def start_run(self) -> None:
+        """Start counting hedges for a new run; latency samples carry over."""
+        with self._lock:
+            self.hedges_issued.clear()
+            self.hedges_won.clear()
+
+    def hedge_delay(self, host: str) -> float:
+        """Seconds to wait for the first request before hedging it."""
+        if self.latency.count(host) < self.min_samples:
+            return self.initial_delay
+        return self.latency.percentile(host, self.percentile)
+
+    def _timed_get(self, host: str, url: str, kwargs: Dict[str, Any]) -> requests.Response:
+        start = time.monotonic()
+        response = self._getter(url, **kwargs)
+        self.latency.record(host, time.monotonic() - start)
+        return response
 
-            # Check if the section was found
-            if section_header:
-                # All services use the same HTML structure: heading is inside a card div
-                section_div = None
-
-                # Find parent card div (heading inside card)
-                parent = section_header.parent
-                while parent and section_div is None:
-                    if parent.name == "div" and parent.get("class") and "card" in parent.get("class"):
-                        section_div = parent
-                        logging.debug(f"Found card div as parent of heading for {section_title}")
-                        break
-                    parent = parent.parent
-                    # Don't go too far up
-                    if parent and parent.name == "body":
-                        break
+    def _take_hedge(self, host: str) -> bool:
+        with self._lock:
+            if self.hedges_issued[host] >= self.max_per_host:
+                return False
+            self.hedges_issued[host] += 1
+            return True
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        host = urlparse(url).netloc
+        first = self._executor.submit(self._timed_get, host, url, kwargs)
+        done, _ = wait([first], timeout=self.hedge_delay(host))
+        if done or not self._take_hedge(host):
+            return first.result()
+
+        logging.debug(f"Hedging request to {url}")
+        second = self._executor.submit(self._timed_get, host, url, kwargs)
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    if future is second:
+                        with self._lock:
+                            self.hedges_won[host] += 1
+                    for loser in pending:
+                        loser.add_done_callback(_close_response)
+                    return future.result()
+        raise error
+
+    def summary(self) -> List[str]:
+        """Per-host hedging and latency lines for the run summary."""
+        lines = []
+        for host in sorted(set(self.latency.hosts()) | set(self.hedges_issued)):
+            p50 = self.latency.percentile(host, 0.5) or 0.0
+            p99 = self.latency.percentile(host, 0.99) or 0.0
+            lines.append(
+                f"{host}: {self.hedges_issued[host]} hedges issued, {self.hedges_won[host]} won, "
+                f"p50 {p50:.2f}s, p99 {p99:.2f}s"
+            )
+        return lines
 
-                if not section_div:
-                    logging.warning(f"Could not find card div containing section header for {section_title}")
-                    return data
 
-                tbody = section_div.find("tbody")  # Locate the table body within the div
-                if not tbody:
-                    logging.warning(f"Could not find tbody in card div for {section_title}")
-                    return data
+def _close_response(future: Future) -> None:
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
 
-                rows = tbody.find_all("tr")
-                logging.debug(f"Found {len(rows)} rows for {section_title}")
 
-                for row in rows:
-                    try:
-                        # Try to find rank with specific class, fall back to first td if not found
-                        rank_td = row.find(
-                            "td",
-                            class_=(
-                                "table-td w-12 font-semibold text-right " "text-gray-500 table-hover:text-gray-400"
-                            ),
-                        )
-                        if not rank_td:
-                            # Fallback: try to find first td element
-                            rank_td = row.find("td")
-
-                        if not rank_td:
-                            logging.warning(f"Could not find rank td in row for {section_title}")
-                            continue
-
-                        rank = rank_td.get_text(strip=True)
-
-                        # Get the anchor tag containing the title
-                        title_tag = row.find("a")
-                        if not title_tag:
-                            logging.warning(f"Could not find title link in row for {section_title}")
-                            continue
-
-                        title = title_tag.get_text(strip=True)  # Get the movie/show title
-                        title_tag_href = title_tag.get("href", "")
-                        if not title_tag_href:
-                            logging.warning(f"Title link has no href for {section_title}: {title}")
-                            continue
-
-                        # Extract the title tag from the href
-                        title_tag_slug = title_tag_href.split("/")[-2] if len(title_tag_href.split("/")) >= 2 else ""
-                        if not title_tag_slug:
-                            logging.warning(f"Could not extract slug from href: {title_tag_href}")
-                            continue
-
-                        rank = rank.rstrip(".")
-                        data.append(
-                            (rank, title, title_tag_slug)
-                        )  # Append the rank, title, and title tag to the data list
-                    except Exception as row_error:
-                        logging.warning(f"Error processing row in {section_title}: {row_error}")
-                        continue
-
-                logging.info(f"Scraped {len(data)} items from {section_title}")
-            else:
-                logging.warning(f"Could not find section header for '{section_title}' in {url}")
-            return data
-        else:
-            logging.error(f"Failed to retrieve page {url}, status code: {response.status_code}")
-            return None
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Request failed for {url}: {e}")
-        return None
-    except Exception as e:
-        logging.error(f"Error scraping {url}: {e}")
-        return None
+_hedged_fetcher: Optional[HedgedFetcher] = None
 
 
-# parse items from trakt list
-def parse_items(items: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
-    movies = []
-    shows = []
-    for item in items:
-        if item["type"] == "movie":
-            movie_data = {"ids": {"trakt": item["movie"]["ids"]["trakt"]}}
-            movies.append(movie_data)
-        elif item["type"] == "show":
-            show_data = {"ids": {"trakt": item["show"]["ids"]["trakt"]}}
-            shows.append(show_data)
-    payload = {"movies": movies, "shows": shows}
-    return payload
+def get_hedged_fetcher() -> HedgedFetcher:
+    """Return the process-wide hedged fetcher, created from the configuration on first use."""
+    global _hedged_fetcher
+    if _hedged_fetcher is None:
+        _hedged_fetcher = HedgedFetcher.from_config(config)
+    return _hedged_fetcher
 
 
-# Decorator to retry requests
-def retry_request(func):
-    def wrapper(*args, **kwargs):
-        attempts = MAX_RETRIES
-        for attempt in range(attempts):
-            response = func(*args, **kwargs)
-            if (
-                response
-                and response == 304
-                or (hasattr(response, "status_code") and response.status_code in [200, 201])
-            ):
-                return response
-            logging.warning(
-                f"Attempt {attempt + 1} failed with {getattr(response, 'status_code', 'unknown status')}. Retrying..."
-            )
-            time.sleep(BACKOFF_FACTOR**attempt)
-        logging.error("All attempts to update the list failed.")
-        return None
+def start_hedged_run() -> None:
+    """Reset the hedge cap of the process-wide fetcher, if any, at the start of a run."""
+    if _hedged_fetcher is not None:
+        _hedged_fetcher.start_run()
 
-    return wrapper
+
+# ============================
+# SNAPSHOT ARCHIVE
+# ============================
+
+
+class SnapshotArchive:
+    """Content-addressed, lzma-compressed archive of fetched pages.
+
+    Page bodies are stored once per SHA-256 under `objects/<aa>/<sha256>.xz`, and every fetch appends
+    a line to `index.jsonl` with its URL, UTC fetch time, hash and size. The index is read once and
+    kept in memory per URL; later lookups only read the lines appended since, by any process.
+    """
+
+    INDEX_FILE = "index.jsonl"
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        self._entries: List[Dict[str, Any]] = []
+        self._by_url: Dict[str, List[Dict[str, Any]]] = {}
+        self._index_offset = 0  # Bytes of index.jsonl already loaded
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], f"{digest}.xz")
+
+    def store(self, url: str, content: bytes, fetched_at: Optional[str] = None) -> str:
+        """Archive a page body fetched from url and return its hash."""
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._object_path(digest)
+        entry = {
+            "url": url,
+            "fetched_at": fetched_at or datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "sha256": digest,
+            "size": len(content),
+        }
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path + ".tmp", "wb") as f:
+                    f.write(lzma.compress(content))
+                os.replace(path + ".tmp", path)
+            with open(os.path.join(self.root, self.INDEX_FILE), "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        return digest
+
+    def read(self, digest: str) -> bytes:
+        """Return the page body with the given hash, decompressed as it is read."""
+        with lzma.open(self._object_path(digest)) as f:
+            return f.read()
+
+    def _load_index(self) -> None:
+        """Add the index lines appended since the last load to the in-memory index (lock held)."""
+        try:
+            with open(os.path.join(self.root, self.INDEX_FILE), "rb") as f:
+                f.seek(self._index_offset)
+                appended = f.read()
+        except FileNotFoundError:
+            return
+        complete = appended[: appended.rfind(b"\n") + 1]  # A line being appended is read next time
+        self._index_offset += len(complete)
+        for line in complete.splitlines():
+            if line.strip():
+                entry = json.loads(line)
+                self._entries.append(entry)
+                self._by_url.setdefault(entry["url"], []).append(entry)
+
+    def entries(self, url: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return index entries in fetch order, optionally only for one URL."""
+        with self._lock:
+            self._load_index()
+            return list(self._entries if url is None else self._by_url.get(url, ()))
+
+    def latest(self, url: str, at: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Return the last entry for url fetched at or before the ISO timestamp `at`."""
+        candidates = [entry for entry in self.entries(url) if not at or entry["fetched_at"] <= at]
+        return max(candidates, key=lambda entry: entry["fetched_at"]) if candidates else None
+
+    def iter_snapshots(self, url: Optional[str] = None) -> Iterator[Tuple[Dict[str, Any], bytes]]:
+        """Yield (index entry, page body) for every archived fetch, decompressing each distinct page once."""
+        last_digest, last_content = None, b""
+        for entry in sorted(self.entries(url), key=lambda entry: (entry["sha256"], entry["fetched_at"])):
+            if entry["sha256"] != last_digest:
+                last_digest, last_content = entry["sha256"], self.read(entry["sha256"])
+            yield entry, last_content
+
+
+_snapshot_archive: Optional[SnapshotArchive] = None
+
+
+def get_snapshot_archive() -> Optional[SnapshotArchive]:
+    """Return the configured snapshot archive, or None when archiving is disabled."""
+    global _snapshot_archive
+    if not config.SNAPSHOT_ARCHIVE:
+        return None
+    if _snapshot_archive is None or _snapshot_archive.root != config.SNAPSHOT_ARCHIVE:
+        _snapshot_archive = SnapshotArchive(config.SNAPSHOT_ARCHIVE)
+    return _snapshot_archive
+
+
+# Build a response for url from the archive instead of the network
+def replay_page(url: str) -> requests.Response:
+    response = requests.Response()
+    response.url = url
+    archive = get_snapshot_archive()
+    entry = archive.latest(url, config.SNAPSHOT_REPLAY_AT or None) if archive else None
+    if entry is None:
+        logging.error(f"No archived snapshot for {url}")
+        response.status_code = 404
+        response._content = b""
+    else:
+        logging.debug(f"Replaying {url} from snapshot {entry['sha256']} fetched at {entry['fetched_at']}")
+        response.status_code = 200
+        response._content = archive.read(entry["sha256"])
+    response._content_consumed = True
+    return response
 
 
 # ============================
-# TRAKT METHODS
+# PARSE STRATEGY CACHE
 # ============================
 
 
-# Refresh Trakt.tv access token
-def refresh_token(
-    client_id: str,
-    client_secret: str,
-    refresh_token: str,
-) -> Tuple[Optional[str], Optional[str]]:
-    """Refresh a Trakt.tv access token.
+# Layout key of a FlixPatrol URL: the service ("netflix" for /top10/netflix/india/2024-01-02/)
+def layout_key(url: str) -> str:
+    parts = [part for part in urlparse(url).path.split("/") if part]
+    return parts[1] if len(parts) > 1 and parts[0] == "top10" else "/".join(parts)
 
-    Args:
-        client_id: The Trakt.tv client ID
-        client_secret: The Trakt.tv client secret
-        refresh_token: The refresh token to use
 
-    Returns:
-        Tuple[Optional[str], Optional[str]]: New access token and refresh token, or None if refresh failed
+class StrategyCache:
+    """Parse strategies that last worked per (service, section), persisted as a JSON file.
+
+    Each entry maps a strategy kind ("heading", "rank") to the name of the strategy in HEADING_STRATEGIES
+    or RANK_TD_STRATEGIES. The file is only rewritten when a strategy changes, and only by the process that
+    owns it: a cache opened with persist=False (in parser processes) collects the changes in `learned`,
+    which are sent back with the parse results and recorded by the parent.
     """
-    url = "https://api.trakt.tv/oauth/token"
-    data = {
-        "refresh_token": refresh_token,
-        "client_id": client_id,
-        "client_secret": client_secret,
-        "redirect_uri": "urn:ietf:wg:oauth:2.0:oob",
-        "grant_type": "refresh_token",
-    }
 
-    try:
-        response = requests.post(url, json=data, timeout=REQUEST_TIMEOUT)
-        if response.status_code == 200:
-            result = response.json()
-            return result["access_token"], result["refresh_token"]
-        else:
-            logging.error(f"Token refresh failed with status {response.status_code}")
-            return None, None
-    except Exception as e:
-        logging.error(f"Error refreshing token: {e}")
-        return None, None
+    def __init__(self, path: str, persist: bool = True):
+        self.path = path
+        self.persist = persist
+        self.learned: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+        self._strategies: Dict[str, Dict[str, str]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self._strategies = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Ignoring unreadable strategy cache {path}: {e}")
+
+    @staticmethod
+    def _key(url: str, section_title: str) -> str:
+        return f"{layout_key(url)}|{section_title}"
+
+    def get(self, url: str, section_title: str) -> Dict[str, str]:
+        return self._strategies.get(self._key(url, section_title), {})
+
+    def record(self, url: str, section_title: str, strategies: Dict[str, str]) -> None:
+        key = self._key(url, section_title)
+        with self._lock:
+            if self._strategies.get(key) == strategies:
+                return
+            self._strategies[key] = strategies
+            if not self.persist:
+                self.learned[key] = strategies
+                return
+            self._save()
+
+    def update(self, learned: Dict[str, Dict[str, str]]) -> None:
+        """Record the strategies a parser process learned."""
+        with self._lock:
+            changed = {key: entry for key, entry in learned.items() if self._strategies.get(key) != entry}
+            if changed:
+                self._strategies.update(changed)
+                self._save()
+
+    def take_learned(self) -> Dict[str, Dict[str, str]]:
+        with self._lock:
+            learned, self.learned = self.learned, {}
+        return learned
+
+    def merge(self, strategies: Dict[str, Dict[str, str]]) -> None:
+        """Add the entries of another cache that are missing here; local entries are fresher and win."""
+        with self._lock:
+            missing = {key: entry for key, entry in strategies.items() if key not in self._strategies}
+            if missing:
+                self._strategies.update(missing)
+                self._save()
+
+    def _save(self) -> None:
+        # A cache that cannot be written only costs the next run the full cascade, never a parse
+        tmp_path = None
+        try:
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._strategies, f, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.warning(f"Could not save strategy cache {self.path}: {e}")
+            if tmp_path:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_path)
 
 
-# Check Trakt access token
-def check_token(
-    client_id: str = None,
-    client_secret: str = None,
-    access_token: str = None,
-    refresh_token: str = None,
-) -> Union[bool, Tuple[Optional[str], Optional[str]]]:
-    """Check if a Trakt.tv access token is valid and refresh if needed.
+_strategy_cache: Optional[StrategyCache] = None
 
-    Args:
-        client_id: The Trakt.tv client ID to check
-        client_secret: The Trakt.tv client secret
-        access_token: The access token to check
-        refresh_token: The refresh token to use if access token is invalid
+# Set in parser processes, which never write the strategy cache themselves
+_parser_process = False
 
-    Returns:
-        Union[bool, Tuple[Optional[str], Optional[str]]]:
-            - True if token is valid
-            - Tuple of new tokens if refreshed
-            - (None, None) if refresh failed
-    """
-    # Default to Netflix account if no credentials provided
-    if not all([client_id, client_secret, access_token, refresh_token]):
-        client_id = config.NETFLIX_CLIENT_ID
-        client_secret = config.NETFLIX_CLIENT_SECRET
-        access_token = config.NETFLIX_ACCESS_TOKEN
-        refresh_token = config.NETFLIX_REFRESH_TOKEN
-
-    response = requests.get(
-        "https://api.trakt.tv/users/me", headers=get_headers(client_id, access_token), timeout=REQUEST_TIMEOUT
-    )
 
-    if response.status_code == 200:
-        return True
-    elif response.status_code == 401:  # Unauthorized - try refreshing token
-        logging.info("Access token expired, attempting refresh...")
-        return refresh_token(client_id, client_secret, refresh_token)
-    else:
-        logging.error(f"Token check failed with status {response.status_code}")
-        return None, None
+def get_strategy_cache() -> Optional[StrategyCache]:
+    """Return the configured strategy cache, or None when it is disabled."""
+    global _strategy_cache
+    if not config.STRATEGY_CACHE:
+        return None
+    if _strategy_cache is None or _strategy_cache.path != config.STRATEGY_CACHE:
+        _strategy_cache = StrategyCache(config.STRATEGY_CACHE, persist=not _parser_process)
+    return _strategy_cache
 
 
-# Get Trakt user's lists
-def get_lists(client_id: str = None, access_token: str = None) -> List[Dict[str, Any]]:
-    """Get all lists for a Trakt.tv user.
+# ============================
+# RANKING RECORDS
+# ============================
 
-    Args:
-        client_id: The Trakt.tv client ID to use
-        access_token: The access token to use
-    Returns:
-        List[Dict[str, Any]]: List of Trakt.tv lists
+
+class RankingRecord(NamedTuple):
+    """One chart row, the same object from the parser to the Trakt payload.
+
+    A NamedTuple has empty __slots__ and stores its fields inline, so a row costs a single small
+    allocation and still unpacks, pickles (parser processes) and serializes to JSON (checkpoints, caches)
+    as (rank, title, slug).
     """
-    response = requests.get(
-        "https://api.trakt.tv/users/me/lists", headers=get_headers(client_id, access_token), timeout=REQUEST_TIMEOUT
-    )
-    return response.json()
 
+    rank: int
+    title: str
+    slug: str
 
-# Get a list by ID
-def get_list(list_id: str, client_id: str = None, access_token: str = None) -> Dict[str, Any]:
-    """Get a specific Trakt.tv list.
+    @classmethod
+    def from_cells(cls, rank: str, title: str, slug: str, position: int) -> "RankingRecord":
+        """Build a record from the scraped cell texts; a rank that is not a number becomes the row position."""
+        return cls(rank_to_int(rank.rstrip("."), position), title, sys.intern(slug))
 
-    Args:
-        list_id: ID of the list to get
-        client_id: The Trakt.tv client ID to use
-        access_token: The access token to use
-    Returns:
-        Dict[str, Any]: List details
-    """
-    response = requests.get(
-        f"https://api.trakt.tv/users/me/lists/{list_id}",
-        headers=get_headers(client_id, access_token),
-        timeout=REQUEST_TIMEOUT,
-    )
-    return response.json()
+    @classmethod
+    def coerce(cls, row: Sequence[Any], position: int) -> "RankingRecord":
+        """Record from a row read back from JSON (a list) or from an older state file (with a text rank)."""
+        if isinstance(row, cls):
+            return row
+        rank, title, slug = row
+        return cls(rank_to_int(rank, position), title, sys.intern(slug))
 
 
-# Get list id by slug
-def get_list_id(list_slug: str) -> Optional[int]:
-    lists = get_lists()
-    for list in lists:
-        if list["ids"]["slug"] == list_slug:
-            return list["ids"]["trakt"]
-    return None
+def as_records(rows: Iterable[Sequence[Any]]) -> List[RankingRecord]:
+    return [RankingRecord.coerce(row, position) for position, row in enumerate(rows, 1)]
 
 
-# Get a list items
-def get_list_items(list_id: str, client_id: str = None, access_token: str = None) -> Dict[str, List[Dict[str, Any]]]:
-    """Get items from a Trakt.tv list.
+class RankingBatch:
+    """The rows of one chart in parallel arrays, with the Trakt ID each row resolves to.
 
-    Args:
-        list_id: The ID of the list to get items from
-        client_id: The Trakt.tv client ID for the appropriate account
-        access_token: The access token for the appropriate account
+    Ranks and Trakt IDs live in typed arrays and titles and slugs in plain lists, so resolving a chart
+    fills slots in place and the Trakt payload is written straight from the arrays. Rows are read by index
+    from the arrays (`batch.titles[i]`), which builds no record per row.
     """
-    logging.info(f"Getting items from list ID: {list_id}")
-    response = requests.get(
-        f"https://api.trakt.tv/users/me/lists/{list_id}/items",
-        headers=get_headers(client_id, access_token),
-        timeout=REQUEST_TIMEOUT,
-    )
-    parsed_items = parse_items(response.json())
-    return parsed_items
 
+    __slots__ = ("ranks", "titles", "slugs", "types", "trakt_ids")
+
+    # Resolved type of a row: 0 while unresolved
+    TYPE_CODES = {"movie": 1, "show": 2}
+
+    def __init__(self, records: Iterable[RankingRecord] = ()):
+        self.ranks = array.array("H")
+        self.titles: List[str] = []
+        self.slugs: List[str] = []
+        self.types = bytearray()
+        self.trakt_ids = array.array("q")
+        for record in records:
+            self.append(record)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Sequence[Any]]) -> "RankingBatch":
+        return cls(as_records(rows))
+
+    def append(self, record: RankingRecord) -> None:
+        self.ranks.append(record.rank)
+        self.titles.append(record.title)
+        self.slugs.append(record.slug)
+        self.types.append(0)
+        self.trakt_ids.append(0)
+
+    def __len__(self) -> int:
+        return len(self.ranks)
+
+    def resolve(self, index: int, type: str, trakt_id: int) -> None:
+        self.types[index] = self.TYPE_CODES[type]
+        self.trakt_ids[index] = trakt_id
+
+    def payload(self, types: Tuple[str, ...]) -> Dict[str, List[Dict[str, Any]]]:
+        """Trakt list payload of the resolved rows, in rank order, with one key per type."""
+        return {
+            f"{type}s": [
+                {"ids": {"trakt": trakt_id}}
+                for code, trakt_id in zip(self.types, self.trakt_ids)
+                if code == self.TYPE_CODES[type]
+            ]
+            for type in types
+        }
 
-# Delete a list by ID
-def delete_list(list_id: str, client_id: str = None, access_token: str = None) -> int:
-    """Delete a Trakt.tv list.
 
-    Args:
-        list_id: The ID of the list to delete
-        client_id: The Trakt.tv client ID for the appropriate account
-        access_token: The access token for the appropriate account
-    """
-    response = requests.delete(
-        f"https://api.trakt.tv/users/me/lists/{list_id}",
-        headers=get_headers(client_id, access_token),
-        timeout=REQUEST_TIMEOUT,
-    )
-    return response.status_code
+# ============================
+# TRACKER CACHE
+# ============================
 
 
-@retry_request
-def create_list(list_data: Dict[str, Any], client_id: str = None, access_token: str = None) -> requests.Response:
-    """Create a new list in Trakt.tv.
+class TrackerCache:
+    """Small JSON cache that lets a run skip work an earlier run already did.
 
-    Args:
-        list_data: The data for creating the list
-        client_id: The Trakt.tv client ID for the appropriate account
-        access_token: The access token for the appropriate account
+    Namespaces:
+        titles: "<type>|<slug>" -> resolved Trakt result ({"type", "trakt"})
+        lists: "<account>" -> {"slugs": list slugs known to exist}
+        tokens: sha256 of an access token -> {} (the token itself is never stored)
+        pages: page URL -> {"sha256", "changed_at", "checked_at", "sections": {section title: rows}}, plus the
+            "etag" and "last_modified" validators of the response when the server sent them
+        charts: scraped data key -> {"rows"} of the last successful scrape, the base of the change feed
+        synced: list slug -> {"sha256"} of the payload last synced successfully
+        publish: service -> {"times"} when its chart rows changed, the newest PUBLISH_HISTORY; each time is the
+            middle of the interval between the last check seeing the old rows and the first seeing new ones
+        runs: "last" -> {"run_id", "complete"}, complete once every list of the latest run was synced
+
+    Every entry carries an "updated_at" timestamp; merging two caches keeps the newest entry of each key,
+    so caches written concurrently by several runners can be combined.
     """
-    response = requests.post(
-        "https://api.trakt.tv/users/me/lists",
-        headers=get_headers(client_id, access_token),
-        json=list_data,
-        timeout=REQUEST_TIMEOUT,
-    )
-    if response and response.status_code == 201:
+
+    NAMESPACES = ("titles", "lists", "tokens", "pages", "charts", "synced", "publish", "runs")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.data: Dict[str, Dict[str, Dict[str, Any]]] = {namespace: {} for namespace in self.NAMESPACES}
+        self._dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self.merge(json.load(f))
+                self._dirty = False
+            except (OSError, ValueError) as e:
+                logging.warning(f"Ignoring unreadable tracker cache {path}: {e}")
+
+    def get(self, namespace: str, key: str, max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Return an entry, or None if it is missing or older than max_age seconds."""
+        entry = self.data[namespace].get(key)
+        if entry is None:
+            return None
+        if max_age is not None and time.time() - entry["updated_at"] > max_age:
+            return None
+        return entry
+
+    def put(self, namespace: str, key: str, **fields: Any) -> None:
+        with self._lock:
+            self.data[namespace][key] = {**fields, "updated_at": time.time()}
+            self._dirty = True
+
+    def merge(self, data: Dict[str, Dict[str, Dict[str, Any]]]) -> int:
+        """Merge another cache's data, keeping the newest entry of each key; returns the entries taken."""
+        taken = 0
+        with self._lock:
+            for namespace in self.NAMESPACES:
+                entries = self.data[namespace]
+                for key, entry in data.get(namespace, {}).items():
+                    if key not in entries or entry.get("updated_at", 0) > entries[key].get("updated_at", 0):
+                        entries[key] = entry
+                        taken += 1
+            self._dirty = self._dirty or bool(taken)
+        return taken
+
+    def save(self) -> None:
+        """Atomically write the cache if it changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+    def page_sections(
+        self,
+        url: str,
+        digest: Optional[str],
+        section_titles: List[str],
+        validators: Optional[Dict[str, str]] = None,
+    ) -> Optional[Dict[str, List[Any]]]:
+        """Rows parsed earlier from identical page bytes, None if the page changed or a section is missing.
+
+        digest is None when the server answered 304 Not Modified to the request built by `conditional_headers`.
+        A hit is an observation of the page unchanged, which bounds when its next change was published; it
+        also takes the validators of the response, if any.
+        """
+        entry = self.get("pages", url)
+        if (
+            entry is None
+            or digest not in (None, entry["sha256"])
+            or not all(t in entry["sections"] for t in section_titles)
+        ):
+            return None
+        self.put("pages", url, **{**entry, "checked_at": time.time(), **(validators or {})})
+        return {section_title: as_records(entry["sections"][section_title]) for section_title in section_titles}
+
+    def conditional_headers(self, url: str, section_titles: List[str]) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since headers for a page whose sections are all cached, else none."""
+        entry = self.get("pages", url)
+        if entry is None or not all(t in entry["sections"] for t in section_titles):
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def record_page(
+        self, url: str, digest: str, sections: Dict[str, List[Any]], validators: Optional[Dict[str, str]] = None
+    ) -> None:
+        sections = {title: [list(row) for row in rows] for title, rows in sections.items()}
+        previous = self.get("pages", url)
+        if previous and previous["sha256"] == digest:
+            sections = {**previous["sections"], **sections}
+            changed_at = previous["changed_at"]
+        else:
+            changed_at = time.time()
+            if previous and any(
+                rows != previous["sections"][title] for title, rows in sections.items() if title in previous["sections"]
+            ):
+                # Published after the last check that still saw the old rows and before this one
+                last_seen = previous.get("checked_at", previous["updated_at"])
+                self.record_publish(layout_key(url), (last_seen + changed_at) / 2)
+        self.put(
+            "pages",
+            url,
+            sha256=digest,
+            changed_at=changed_at,
+            checked_at=time.time(),
+            sections=sections,
+            **(validators or {}),
+        )
+
+    def record_publish(self, service: str, at: float) -> None:
+        """Remember that a service published new charts at a time (seconds since the epoch)."""
+        times = (self.get("publish", service) or {}).get("times", [])
+        self.put("publish", service, times=(times + [at])[-config.PUBLISH_HISTORY :])
+
+
+_tracker_cache: Optional[TrackerCache] = None
+
+
+def get_tracker_cache() -> Optional[TrackerCache]:
+    """Return the configured tracker cache, or None when it is disabled."""
+    global _tracker_cache
+    if not config.TRACKER_CACHE:
+        return None
+    if _tracker_cache is None or _tracker_cache.path != config.TRACKER_CACHE:
+        _tracker_cache = TrackerCache(config.TRACKER_CACHE)
+    return _tracker_cache
+
+
+@contextlib.contextmanager
+def scratch_state() -> Iterator[None]:
+    """Use in-memory copies of the tracker and strategy caches, dropped on exit, so that nothing is persisted."""
+    global _tracker_cache, _strategy_cache
+    saved = (_tracker_cache, _strategy_cache)
+    current = get_tracker_cache()
+    if current is not None:
+        _tracker_cache = TrackerCache(current.path)
+        _tracker_cache.merge(current.data)
+    if config.STRATEGY_CACHE:
+        _strategy_cache = StrategyCache(config.STRATEGY_CACHE, persist=False)
+    try:
+        yield
+    finally:
+        _tracker_cache, _strategy_cache = saved
+
+
+# Cache validators of a page response, for the conditional request of the next fetch
+def response_validators(response: requests.Response) -> Dict[str, str]:
+    validators = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+    return {name: value for name, value in validators.items() if value}
+
+
+# Parse sections of a fetched page, reusing the rows of an earlier parse of identical bytes
+def parse_sections_cached(
+    url: str,
+    content: bytes,
+    section_titles: List[str],
+    parse: Callable[[], Dict[str, List[RankingRecord]]],
+    validators: Optional[Dict[str, str]] = None,
+) -> Dict[str, List[RankingRecord]]:
+    cache = get_tracker_cache()
+    if cache is None:
+        return parse()
+    digest = hashlib.sha256(content).hexdigest()
+    sections = cache.page_sections(url, digest, section_titles, validators)
+    if sections is not None:
+        logging.debug(f"Page {url} unchanged, reusing parsed rows")
+        return sections
+    sections = parse()
+    if all(sections.values()):
+        cache.record_page(url, digest, sections, validators)
+    return sections
+
+
+# ============================
+# CANDIDATE CORPUS
+# ============================
+# Every candidate a Trakt search returned is kept with a normalized title and its trigrams, so that titles
+# seen before (recurring franchises, re-releases, other services) are resolved without calling Trakt.
+
+
+# Lowercase a title, spell out "&" and reduce it to single-spaced letters and digits
+def normalize_title(title: str) -> str:
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", title.lower().replace("&", " and ")).split())
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a: Set[str], b: Set[str]) -> float:
+    """Dice coefficient of two trigram sets."""
+    return 2 * len(a & b) / (len(a) + len(b)) if a and b else 0.0
+
+
+def match_confidence(title: str, title_tag: str, candidate_title: str, candidate_slug: str) -> float:
+    """Confidence in [0, 1] that a Trakt candidate is the FlixPatrol title with that slug.
+
+    Half comes from the title trigrams. The other half is 1 when the slugs agree the way the search
+    matchers require (one contains or starts the other), the slug trigram similarity otherwise.
+    """
+    tag = title_tag.replace("-", "")
+    slug = candidate_slug.replace("-", "")
+    slug_score = 1.0 if tag and (tag in slug or tag.startswith(slug)) else similarity(trigrams(tag), trigrams(slug))
+    title_score = similarity(trigrams(normalize_title(title)), trigrams(normalize_title(candidate_title)))
+    return (title_score + slug_score) / 2
+
+
+# Best of some Trakt search results by match confidence, instead of blindly the first one; None without results
+def best_search_result(
+    results: List[Dict[str, Any]], title: str, title_tag: str
+) -> Optional[Tuple[Dict[str, Any], float]]:
+    if not results:
+        return None
+    scored = [
+        (match_confidence(title, title_tag, result[result["type"]]["title"], result[result["type"]]["ids"]["slug"]), i)
+        for i, result in enumerate(results)
+    ]
+    confidence, index = max(scored, key=lambda item: (item[0], -item[1]))
+    return results[index], confidence
+
+
+class CandidateCorpus:
+    """SQLite corpus of Trakt search candidates with a trigram index over their normalized titles."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS candidates (
+            type TEXT NOT NULL,
+            trakt INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            slug TEXT NOT NULL,
+            year INTEGER,
+            PRIMARY KEY (type, trakt)
+        );
+        CREATE TABLE IF NOT EXISTS trigrams (
+            gram TEXT NOT NULL,
+            type TEXT NOT NULL,
+            trakt INTEGER NOT NULL,
+            PRIMARY KEY (gram, type, trakt)
+        ) WITHOUT ROWID;
+    """
+
+    # Candidates sharing the most trigrams with the searched title that are scored in full
+    SHORTLIST = 20
+
+    # Candidates scored within this of the best one are told apart by their year, or left to Trakt
+    AMBIGUITY_MARGIN = 0.02
+
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(self.SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def add(self, results: List[Dict[str, Any]]) -> None:
+        """Store the candidates of a Trakt search response."""
+        candidates = []
+        for result in results:
+            item = result.get(result.get("type"))
+            if not item or "trakt" not in item.get("ids", {}):
+                continue
+            candidates.append(
+                (result["type"], item["ids"]["trakt"], item["title"], item["ids"]["slug"], item.get("year"))
+            )
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO candidates VALUES (?, ?, ?, ?, ?)", candidates)
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO trigrams VALUES (?, ?, ?)",
+                [
+                    (gram, type, trakt)
+                    for type, trakt, title, _, _ in candidates
+                    for gram in trigrams(normalize_title(title))
+                ],
+            )
+
+    def resolve(self, title: str, title_tag: str, types: Tuple[str, ...]) -> Optional[Tuple[str, int, float]]:
+        """Return the (type, Trakt ID, confidence) of the best known candidate of the given types, if any.
+
+        When several candidates are about as good (a remake, a movie and its series), the one whose year is
+        in the FlixPatrol slug wins. Without a single such candidate the match is ambiguous and None is
+        returned, so the title is searched on Trakt.
+        """
+        grams = sorted(trigrams(normalize_title(title)))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT c.type, c.trakt, c.title, c.slug, c.year FROM candidates c JOIN ("
+                f"SELECT type, trakt, COUNT(*) AS shared FROM trigrams WHERE gram IN ({', '.join('?' * len(grams))}) "
+                f"AND type IN ({', '.join('?' * len(types))}) GROUP BY type, trakt ORDER BY shared DESC LIMIT ?"
+                f") s ON c.type = s.type AND c.trakt = s.trakt",
+                (*grams, *types, self.SHORTLIST),
+            ).fetchall()
+        scored = [
+            (match_confidence(title, title_tag, name, slug), type, trakt, year)
+            for type, trakt, name, slug, year in rows
+        ]
+        if not scored:
+            return None
+        best = max(confidence for confidence, *_ in scored)
+        close = [candidate for candidate in scored if best - candidate[0] <= self.AMBIGUITY_MARGIN]
+        if len(close) > 1:
+            close = [candidate for candidate in close if candidate[3] and str(candidate[3]) in title_tag]
+            if len(close) != 1:
+                logging.debug(f"Known candidates of {title} are ambiguous, searching Trakt")
+                return None
+        confidence, type, trakt, _ = close[0]
+        return type, trakt, confidence
+
+    def merge(self, other_path: str) -> int:
+        """Add the candidates of another corpus file, returning how many were new."""
+        with self._lock, self._conn:
+            self._conn.execute("ATTACH DATABASE ? AS other", (other_path,))
+            added = self._conn.execute("INSERT OR IGNORE INTO candidates SELECT * FROM other.candidates").rowcount
+            self._conn.execute("INSERT OR IGNORE INTO trigrams SELECT * FROM other.trigrams")
+        self._conn.execute("DETACH DATABASE other")
+        return added
+
+
+_candidate_corpus: Optional[CandidateCorpus] = None
+
+
+def get_candidate_corpus() -> Optional[CandidateCorpus]:
+    """Return the configured candidate corpus, or None when it is disabled."""
+    global _candidate_corpus
+    if not config.CANDIDATE_CORPUS:
+        return None
+    if _candidate_corpus is None or _candidate_corpus.path != config.CANDIDATE_CORPUS:
+        _candidate_corpus = CandidateCorpus(config.CANDIDATE_CORPUS)
+    return _candidate_corpus
+
+
+# Resolve a title from the corpus when the best known candidate is confident enough
+def resolve_locally(title: str, title_tag: str, types: Tuple[str, ...]) -> Optional[Tuple[str, int]]:
+    corpus = get_candidate_corpus()
+    found = corpus.resolve(title, title_tag, types) if corpus else None
+    if found is None or found[2] < config.RESOLVE_MIN_CONFIDENCE:
+        return None
+    log_event("search.local", title=title, trakt_id=found[1], confidence=round(found[2], 3))
+    return found[0], found[1]
+
+
+# ============================
+# STATE BUNDLE
+# ============================
+# One versioned, integrity-checked file holding all local state, so that a fresh runner starts warm.
+
+
+BUNDLE_VERSION = 1
+
+
+def bundle_files(config: Config) -> Dict[str, str]:
+    """Bundle member name -> local path of every state file worth carrying between runs."""
+    return {
+        "cache.json": config.TRACKER_CACHE,
+        "parse_strategies.json": config.STRATEGY_CACHE,
+        "rankings.sqlite3": config.RANKINGS_DB,
+        "candidates.sqlite3": config.CANDIDATE_CORPUS,
+        "changes.jsonl": config.CHANGE_FEED,
+    }
+
+
+def export_bundle(config: Config, path: str) -> None:
+    """Write all local state to a single bundle file, atomically.
+
+    A bundle already at path (written by another runner) is merged first, so concurrent writers do not
+    drop each other's state.
+    """
+    if os.path.exists(path):
+        import_bundle(config, path)
+    manifest: Dict[str, Any] = {
+        "version": BUNDLE_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "files": {},
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_LZMA) as bundle:
+        for name, local_path in bundle_files(config).items():
+            if not local_path or not os.path.exists(local_path):
+                continue
+            with open(local_path, "rb") as f:
+                content = f.read()
+            bundle.writestr(name, content)
+            manifest["files"][name] = {"sha256": hashlib.sha256(content).hexdigest(), "size": len(content)}
+        bundle.writestr("manifest.json", json.dumps(manifest, indent=2))
+    os.replace(tmp_path, path)
+    logging.info(f"Exported state bundle {path} ({', '.join(manifest['files'])})")
+
+
+def import_bundle(config: Config, path: str) -> bool:
+    """Merge the state of a bundle into the local state.
+
+    Every member is checked against the manifest before anything is changed. Caches are merged entry by
+    entry (newest wins), parse strategies only add what is missing locally, the ranking history gets
+    the charts it does not have yet, and the change feed gets the events it does not have yet, appended.
+    Each local file is replaced atomically.
+
+    Returns:
+        bool: False if the bundle is missing, of another version or corrupt
+    """
+    try:
+        with zipfile.ZipFile(path) as bundle:
+            manifest = json.loads(bundle.read("manifest.json"))
+            if manifest.get("version") != BUNDLE_VERSION:
+                logging.warning(f"Ignoring state bundle {path} of version {manifest.get('version')}")
+                return False
+            members = {}
+            for name, expected in manifest["files"].items():
+                content = bundle.read(name)
+                if hashlib.sha256(content).hexdigest() != expected["sha256"]:
+                    logging.error(f"State bundle {path} is corrupt: checksum mismatch for {name}")
+                    return False
+                members[name] = content
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+        logging.error(f"Could not read state bundle {path}: {e}")
+        return False
+
+    global _tracker_cache, _strategy_cache
+    local = bundle_files(config)
+    if "cache.json" in members and local["cache.json"]:
+        cache = TrackerCache(local["cache.json"])
+        taken = cache.merge(json.loads(members["cache.json"]))
+        cache.save()
+        _tracker_cache = None
+        logging.info(f"Imported {taken} cache entries")
+    if "parse_strategies.json" in members and local["parse_strategies.json"]:
+        StrategyCache(local["parse_strategies.json"]).merge(json.loads(members["parse_strategies.json"]))
+        _strategy_cache = None
+    if "rankings.sqlite3" in members and local["rankings.sqlite3"]:
+        merge_rankings(local["rankings.sqlite3"], members["rankings.sqlite3"])
+    if "candidates.sqlite3" in members and local["candidates.sqlite3"]:
+        with tempfile.TemporaryDirectory() as tmp:
+            other = os.path.join(tmp, "candidates.sqlite3")
+            with open(other, "wb") as f:
+                f.write(members["candidates.sqlite3"])
+            corpus = CandidateCorpus(local["candidates.sqlite3"])
+            try:
+                logging.info(f"Imported {corpus.merge(other)} search candidates")
+            finally:
+                corpus.close()
+    if "changes.jsonl" in members and local["changes.jsonl"]:
+        logging.info(f"Imported {ChangeFeed(local['changes.jsonl']).merge(members['changes.jsonl'])} chart changes")
+    return True
+
+
+def merge_rankings(db_path: str, content: bytes) -> None:
+    """Add the charts of another ranking database that the local one does not have yet."""
+    with tempfile.TemporaryDirectory() as tmp:
+        other = os.path.join(tmp, "rankings.sqlite3")
+        with open(other, "wb") as f:
+            f.write(content)
+        store = RankingStore(db_path)
+        try:
+            with store._lock, store._conn:
+                store._conn.execute("ATTACH DATABASE ? AS other", (other,))
+                # Rows first, restricted to charts missing locally, so a local chart is never mixed with another
+                store._conn.execute(
+                    "INSERT OR IGNORE INTO rankings SELECT r.* FROM other.rankings r WHERE NOT EXISTS ("
+                    "SELECT 1 FROM charts c WHERE c.service = r.service AND c.section = r.section "
+                    "AND c.chart_date = r.chart_date)"
+                )
+                added = store._conn.execute("INSERT OR IGNORE INTO charts SELECT * FROM other.charts").rowcount
+            store._conn.execute("DETACH DATABASE other")
+            if added:
+                materialize_views(store)
+            logging.info(f"Imported {added} charts into {db_path}")
+        finally:
+            store.close()
+
+
+# ============================
+# STRUCTURED EVENT LOGGING
+# ============================
+# Hot paths log structured events through log_event(). Nothing is formatted unless the event level is
+# enabled, and then only when the record is written: with EVENT_LOG set, records are handed off through
+# a queue to a background thread that writes them as JSON lines.
+
+_event_logger = logging.getLogger("tracker.events")
+_event_sample_rates: Dict[str, float] = {}
+_event_counters: Dict[str, Iterator[int]] = {}
+_event_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class Event:
+    """Event name and fields, only rendered into text when a handler formats the record."""
+
+    __slots__ = ("name", "fields")
+
+    def __init__(self, name: str, fields: Dict[str, Any]):
+        self.name = name
+        self.fields = fields
+
+    def __str__(self) -> str:
+        return " ".join([self.name] + [f"{key}={value}" for key, value in self.fields.items()])
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Render event records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        event = record.msg
+        data = {"ts": round(record.created, 6), "level": record.levelname, "thread": record.threadName}
+        if isinstance(event, Event):
+            data["event"] = event.name
+            data.update(event.fields)
+        else:
+            data["message"] = record.getMessage()
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that passes records through untouched, leaving all formatting to the writer thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_event_log(path: str, sample_rates: Optional[Dict[str, float]] = None) -> None:
+    """Write events as JSON lines to path from a background thread."""
+    global _event_listener
+    stop_event_log()
+    _event_sample_rates.clear()
+    _event_sample_rates.update(sample_rates or {})
+    _event_counters.clear()
+
+    file_handler = logging.FileHandler(path, encoding="utf-8")
+    file_handler.setFormatter(JsonLinesFormatter())
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    _event_logger.addHandler(DeferredQueueHandler(records))
+    _event_logger.setLevel(logging.DEBUG)
+    _event_logger.propagate = False
+    _event_listener = logging.handlers.QueueListener(records, file_handler)
+    _event_listener.start()
+
+
+def stop_event_log() -> None:
+    """Flush pending events and restore the default routing of events to the standard log."""
+    global _event_listener
+    if _event_listener is not None:
+        _event_listener.stop()
+        for handler in _event_listener.handlers:
+            handler.close()
+        _event_listener = None
+    for handler in list(_event_logger.handlers):
+        _event_logger.removeHandler(handler)
+    _event_logger.setLevel(logging.NOTSET)
+    _event_logger.propagate = True
+
+
+atexit.register(stop_event_log)
+
+
+def log_event(name: str, level: int = logging.DEBUG, **fields: Any) -> None:
+    """Log a structured event; fields are only formatted if the event is written.
+
+    Events with a sampling rate in EVENT_SAMPLE_RATES are kept deterministically, one every 1/rate calls.
+    """
+    if not _event_logger.isEnabledFor(level):
+        return
+    rate = _event_sample_rates.get(name)
+    if rate is not None:
+        if rate <= 0:
+            return
+        counter = _event_counters.setdefault(name, itertools.count())
+        if next(counter) % max(1, round(1 / rate)):
+            return
+    _event_logger.log(level, Event(name, fields))
+
+
+# ============================
+# RUN DEADLINE
+# ============================
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """Raised instead of starting a request when the run deadline has passed."""
+
+
+class RunBudget:
+    """Time budget of a run, from which every request derives its (connect, read) timeouts.
+
+    A budget of 0 seconds never expires, requests then use the configured timeouts.
+    """
+
+    def __init__(
+        self,
+        seconds: float,
+        connect_timeout: float,
+        read_timeout: float,
+        reserve: float = 0,
+        clock: Callable[[], float] = time.monotonic,
+        sleeper: Callable[[float], None] = time.sleep,
+    ):
+        self.seconds = seconds
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.reserve = reserve
+        self._clock = clock
+        self._sleeper = sleeper
+        self.started = clock()
+        self.dropped: Counter = Counter()  # low priority work skipped, by kind
+
+    @classmethod
+    def from_config(cls, config: Config, **clock: Any) -> "RunBudget":
+        return cls(
+            config.RUN_DEADLINE, config.CONNECT_TIMEOUT, config.REQUEST_TIMEOUT, config.RUN_DEADLINE_RESERVE, **clock
+        )
+
+    def elapsed(self) -> float:
+        return self._clock() - self.started
+
+    def remaining(self) -> float:
+        if not self.seconds:
+            return float("inf")
+        return max(0.0, self.seconds - self.elapsed())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self) -> Tuple[float, float]:
+        """(connect, read) timeouts for a request started now.
+
+        The read timeout bounds each socket read, not the whole transfer, so a request can still overrun
+        the deadline slightly; the next request then fails fast.
+
+        Raises:
+            DeadlineExceeded: If no time is left
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"run deadline of {self.seconds:.0f}s exceeded")
+        return min(self.connect_timeout, remaining), min(self.read_timeout, remaining)
+
+    def allows_low_priority(self, kind: str) -> bool:
+        """Whether low priority work still fits, counting it as dropped otherwise."""
+        if self.remaining() > self.reserve:
+            return True
+        self.dropped[kind] += 1
+        return False
+
+    def sleep(self, seconds: float) -> bool:
+        """Sleep unless that would pass the deadline; returns False when the sleep was skipped."""
+        if seconds >= self.remaining():
+            return False
+        self._sleeper(seconds)
+        return True
+
+
+_run_budget: Optional[RunBudget] = None
+
+
+def get_run_budget() -> RunBudget:
+    """Return the budget of the current run, a budget without deadline if no run started one."""
+    global _run_budget
+    if _run_budget is None:
+        _run_budget = RunBudget(0, config.CONNECT_TIMEOUT, config.REQUEST_TIMEOUT)
+    return _run_budget
+
+
+def start_run_budget(config: Config, **clock: Any) -> RunBudget:
+    """Start the deadline of a new run, optionally on another clock (`clock` and `sleeper` of RunBudget)."""
+    global _run_budget
+    _run_budget = RunBudget.from_config(config, **clock)
+    return _run_budget
+
+
+# Timeout of a request started now: (connect, read) capped by the remaining run budget
+def request_timeout() -> Tuple[float, float]:
+    return get_run_budget().timeout()
+
+
+# ============================
+# TRACING
+# ============================
+# Spans (HTTP calls, parses, title resolutions, list updates, retry sleeps, rate limit waits) are recorded
+# as Chrome trace "complete" events. Spans nest per thread; work handed to another thread records the
+# span it was submitted from as its parent. With tracing off, trace_span() returns a shared null context.
+
+
+class Tracer:
+    """Collects spans in memory and writes them as a Chrome trace-event JSON file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.events: List[Dict[str, Any]] = []
+        self._ids = itertools.count(1)
+        self._local = threading.local()
+        self._origin = time.perf_counter()
+        self._thread_names: Dict[int, str] = {}
+
+    def _stack(self) -> List[int]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current(self) -> Optional[int]:
+        """Id of the innermost open span of the current thread, or of the span this thread works for."""
+        stack = self._stack()
+        return stack[-1] if stack else getattr(self._local, "parent", None)
+
+    @contextlib.contextmanager
+    def adopt(self, parent: Optional[int]) -> Iterator[None]:
+        """Make spans opened by this thread children of a span opened by another thread."""
+        previous = getattr(self._local, "parent", None)
+        self._local.parent = parent
+        try:
+            yield
+        finally:
+            self._local.parent = previous
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str, **args: Any) -> Iterator[None]:
+        span_id, parent = next(self._ids), self.current()
+        stack = self._stack()
+        stack.append(span_id)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            stack.pop()
+            thread = threading.current_thread()
+            self._thread_names.setdefault(thread.ident, thread.name)
+            self.events.append(
+                {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": (start - self._origin) * 1e6,
+                    "dur": (end - start) * 1e6,
+                    "pid": os.getpid(),
+                    "tid": thread.ident,
+                    "args": {"id": span_id, "parent": parent, **args},
+                }
+            )
+
+    def write(self) -> None:
+        metadata = [
+            {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+            for tid, name in self._thread_names.items()
+        ]
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": metadata + self.events, "displayTimeUnit": "ms"}, f)
+        logging.info(f"Trace with {len(self.events)} spans written to {self.path}")
+
+
+_tracer: Optional[Tracer] = None
+
+
+def start_trace(path: str) -> Tracer:
+    """Start recording spans, to be written to path by stop_trace()."""
+    global _tracer
+    _tracer = Tracer(path)
+    return _tracer
+
+
+def stop_trace() -> None:
+    """Write the recorded spans and stop tracing."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.write()
+
+
+def trace_span(name: str, category: str, **args: Any) -> contextlib.AbstractContextManager:
+    """Context manager recording a span when tracing is on."""
+    if _tracer is None:
+        return _NULL_CONTEXT
+    return _tracer.span(name, category, **args)
+
+
+def current_span() -> Optional[int]:
+    """Id of the current span, to hand to work submitted to another thread."""
+    return _tracer.current() if _tracer is not None else None
+
+
+def adopt_span(parent: Optional[int]) -> contextlib.AbstractContextManager:
+    """Context manager making the spans of this thread children of a span of another thread."""
+    if _tracer is None:
+        return _NULL_CONTEXT
+    return _tracer.adopt(parent)
+
+
+def traced(category: str, detail: Optional[Callable[..., Dict[str, Any]]] = None) -> Callable:
+    """Decorator recording every call of a function as a span; detail(*args, **kwargs) gives span arguments."""
+
+    def decorate(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with _tracer.span(func.__name__, category, **(detail(*args, **kwargs) if detail else {})):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+# ============================
+# HELPER METHODS
+# ============================
+
+
+# Get headers
+def get_headers(client_id: str = None, access_token: str = None) -> Dict[str, str]:
+    """Returns headers with authorization for requests.
+
+    Args:
+        client_id: The Trakt.tv client ID for the appropriate account
+        access_token: The access token for the appropriate account
+    """
+    user_agent = (
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/130.0.0.0 Safari/537.36"
+    )
+
+    return {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {access_token}",
+        "trakt-api-version": "2",
+        "trakt-api-key": client_id,
+        "User-Agent": user_agent,
+    }
+
+
+# Print the results
+def print_top_list(title: str, top_list: List[RankingRecord]) -> None:
+    logging.info("=" * 30)
+    logging.info(f"{title}")
+    logging.info("=" * 30)
+    for rank, item_title, title_tag in top_list:
+        logging.info(f"{rank}: {item_title} | {title_tag}")
+
+
+# FlixPatrol request headers, defined to mimic a real browser
+FLIXPATROL_HEADERS = {
+    "Content-Type": "application/json",
+    "User-Agent": (
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36"
+    ),
+    "Cookie": "_nss=1",
+}
+
+# Class of the rank cell in FlixPatrol ranking tables
+RANK_TD_CLASS = "table-td w-12 font-semibold text-right text-gray-500 table-hover:text-gray-400"
+
+
+# Fetch a FlixPatrol page, hedging slow requests when enabled
+@traced("http", detail=lambda url, stream=False, headers=None: {"url": url, "stream": stream})
+def fetch_page(url: str, stream: bool = False, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+    """Fetch a FlixPatrol page, or replay it from the snapshot archive in replay mode.
+
+    Extra headers (such as the conditional ones of `TrackerCache.conditional_headers`) are sent along
+    with the usual ones. Complete (non-streamed) pages are added to the snapshot archive when one is
+    configured; streamed pages are archived by their reader once the body has been consumed.
+    """
+    if config.SNAPSHOT_REPLAY:
+        return replay_page(url)
+    headers = {**FLIXPATROL_HEADERS, **(headers or {})}
+    if config.HEDGE_REQUESTS:
+        response = get_hedged_fetcher().get(url, headers=headers, timeout=request_timeout(), stream=stream)
+    else:
+        response = requests.get(url, headers=headers, timeout=request_timeout(), stream=stream)
+    archive = get_snapshot_archive()
+    if archive and not stream and response.status_code == 200:
+        archive.store(url, response.content)
+    return response
+
+
+# Extract the slug from a FlixPatrol title href (e.g. "/title/some-movie/")
+def slug_from_href(href: str) -> str:
+    parts = href.split("/")
+    return parts[-2] if len(parts) >= 2 else ""
+
+
+# Section lookup strategies, tried in this order on each heading (h2, h3, h4) in document order
+def heading_matches_exact(heading_text: str, section_title: str) -> bool:
+    return heading_text == section_title
+
+
+def heading_matches_case_insensitive(heading_text: str, section_title: str) -> bool:
+    return heading_text.lower() == section_title.lower()
+
+
+HEADING_TAGS = ["h2", "h3", "h4"]
+HEADING_STRATEGIES = [
+    ("exact match", heading_matches_exact),
+    ("case-insensitive", heading_matches_case_insensitive),
+]
+
+
+# First heading, in document order, matched by one of the strategies (tried in order on each heading)
+def find_section_header(
+    headings: List[Tag], section_title: str, strategies: List[Tuple[str, Callable[[str, str], bool]]]
+) -> Tuple[Optional[Tag], Optional[str]]:
+    for heading in headings:
+        heading_text = heading.get_text(strip=True)
+        for strategy, matches in strategies:
+            if matches(heading_text, section_title):
+                return heading, strategy
+    return None, None
+
+
+# A cached parse strategy stopped working: the page layout changed
+def log_layout_drift(url: str, section_title: str, kind: str, strategy: str) -> None:
+    logging.warning(f"Layout drift on {layout_key(url)} '{section_title}': {kind} strategy '{strategy}' failed")
+    log_event("layout.drift", logging.WARNING, service=layout_key(url), section=section_title, kind=kind, was=strategy)
+
+
+# All services use the same HTML structure: the section heading is inside a card div
+def find_card_div(section_header: Tag) -> Optional[Tag]:
+    parent = section_header.parent
+    while parent:
+        if parent.name == "div" and parent.get("class") and "card" in parent.get("class"):
+            return parent
+        parent = parent.parent
+        # Don't go too far up
+        if parent and parent.name == "body":
+            break
+    return None
+
+
+# Rank cell lookup strategies: the cell with the rank class, falling back to the first td of the row
+def rank_td_by_class(row: Tag) -> Optional[Tag]:
+    return row.find("td", class_=RANK_TD_CLASS)
+
+
+def rank_td_first(row: Tag) -> Optional[Tag]:
+    return row.find("td")
+
+
+RANK_TD_STRATEGIES = [
+    ("rank class", rank_td_by_class),
+    ("first td", rank_td_first),
+]
+
+
+# Parse movie or show data from a FlixPatrol page based in the section title
+@traced("parse", detail=lambda content, section_title, url="": {"section": section_title, "url": url})
+def parse_top10(content: Union[bytes, str], section_title: str, url: str = "") -> List[RankingRecord]:
+    """Parse a ranking section out of an already fetched FlixPatrol page.
+
+    Args:
+        content: The raw HTML of the page
+        section_title: The heading of the section to extract (e.g. "TOP 10 Movies")
+        url: The page URL, only used for logging
+    Returns:
+        List[RankingRecord]: (rank, title, slug) tuples, empty if the section was not found
+    """
+    # Parse the HTML content
+    return parse_top10_soup(BeautifulSoup(content, "html.parser"), section_title, url)
+
+
+def parse_top10_soup(soup: BeautifulSoup, section_title: str, url: str = "") -> List[RankingRecord]:
+    """Same as `parse_top10`, on an already parsed page so several sections can share one parse."""
+    data = []
+
+    # Go straight to the strategies that worked last time for this service and section, and only fall back
+    # to the full cascade (logging a layout drift) when they fail
+    cache = get_strategy_cache() if url else None
+    cached = cache.get(url, section_title) if cache else {}
+    used: Dict[str, str] = {}
+
+    # Locate the correct section - search in document order, not heading tag order
+    # This ensures we find the first occurrence in the actual HTML structure
+    headings = soup.find_all(HEADING_TAGS)
+    section_header, strategy = None, None
+    cached_heading = dict(HEADING_STRATEGIES).get(cached.get("heading"))
+    if cached_heading:
+        section_header, strategy = find_section_header(headings, section_title, [(cached["heading"], cached_heading)])
+        if not section_header:
+            log_layout_drift(url, section_title, "heading", cached["heading"])
+    if not section_header:
+        # Try exact match first, then case-insensitive
+        section_header, strategy = find_section_header(headings, section_title, HEADING_STRATEGIES)
+    if section_header:
+        used["heading"] = strategy
+        logging.debug(f"Found section '{section_title}' with {section_header.name} tag ({strategy})")
+
+    # Check if the section was found
+    if not section_header:
+        logging.warning(f"Could not find section header for '{section_title}' in {url}")
+        return data
+
+    # Find parent card div (heading inside card)
+    section_div = find_card_div(section_header)
+    if not section_div:
+        logging.warning(f"Could not find card div containing section header for {section_title}")
+        return data
+    logging.debug(f"Found card div as parent of heading for {section_title}")
+
+    tbody = section_div.find("tbody")  # Locate the table body within the div
+    if not tbody:
+        logging.warning(f"Could not find tbody in card div for {section_title}")
+        return data
+
+    rows = tbody.find_all("tr")
+    logging.debug(f"Found {len(rows)} rows for {section_title}")
+    cached_rank = dict(RANK_TD_STRATEGIES).get(cached.get("rank"))
+    drifted = False
+
+    for row in rows:
+        try:
+            # Try the cached rank strategy, then the rank class, falling back to first td if not found
+            rank_td, strategy = None, None
+            if cached_rank:
+                rank_td, strategy = cached_rank(row), cached["rank"]
+                if not rank_td and not drifted:
+                    log_layout_drift(url, section_title, "rank", cached["rank"])
+                    drifted = True
+            if not rank_td:
+                for strategy, find_rank_td in RANK_TD_STRATEGIES:
+                    rank_td = find_rank_td(row)
+                    if rank_td:
+                        break
+
+            if not rank_td:
+                logging.warning(f"Could not find rank td in row for {section_title}")
+                continue
+            used.setdefault("rank", strategy)
+
+            rank = rank_td.get_text(strip=True)
+
+            # Get the anchor tag containing the title
+            title_tag = row.find("a")
+            if not title_tag:
+                logging.warning(f"Could not find title link in row for {section_title}")
+                continue
+
+            title = title_tag.get_text(strip=True)  # Get the movie/show title
+            title_tag_href = title_tag.get("href", "")
+            if not title_tag_href:
+                logging.warning(f"Title link has no href for {section_title}: {title}")
+                continue
+
+            # Extract the title tag from the href
+            title_tag_slug = slug_from_href(title_tag_href)
+            if not title_tag_slug:
+                logging.warning(f"Could not extract slug from href: {title_tag_href}")
+                continue
+
+            data.append(RankingRecord.from_cells(rank, title, title_tag_slug, len(data) + 1))
+        except Exception as row_error:
+            logging.warning(f"Error processing row in {section_title}: {row_error}")
+            continue
+
+    if cache and data:
+        cache.record(url, section_title, used)
+    logging.info(f"Scraped {len(data)} items from {section_title}")
+    return data
+
+
+# Scrape movie or show data based in the section title
+@traced("scrape", detail=lambda url, section_title: {"url": url, "section": section_title})
+def scrape_top10(url: str, section_title: str) -> Optional[List[RankingRecord]]:
+    try:
+        # Send the GET request, conditional when the page's rows are cached
+        cache = get_tracker_cache()
+        response = fetch_page(url, headers=cache.conditional_headers(url, [section_title]) if cache else None)
+
+        # Check for a successful response
+        if response.status_code == 304 and cache:
+            sections = cache.page_sections(url, None, [section_title])
+            if sections is not None:
+                logging.debug(f"Page {url} not modified, reusing parsed rows")
+                return sections[section_title]
+        if response.status_code == 200:
+            prefetcher = get_title_prefetcher()
+            if prefetcher:
+                prefetcher.harvest(url, response.content)
+            sections = parse_sections_cached(
+                url,
+                response.content,
+                [section_title],
+                lambda: {section_title: parse_top10(response.content, section_title, url)},
+                response_validators(response),
+            )
+            return sections[section_title]
+        else:
+            logging.error(f"Failed to retrieve page {url}, status code: {response.status_code}")
+            return None
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Request failed for {url}: {e}")
+        return None
+    except Exception as e:
+        logging.error(f"Error scraping {url}: {e}")
+        return None
+
+
+class Top10StreamParser(HTMLParser):
+    """Incremental tokenizer that extracts ranking rows while the page is being fed.
+
+    Mirrors the lookup done by `parse_top10`: the first h2/h3/h4 whose text matches a requested
+    section (case-insensitively) selects its enclosing card div, and the rows of the first tbody
+    inside that card are emitted as soon as each <tr> is closed. Completed rows are queued in
+    `rows` as (section_title, (rank, title, slug)) and the parser reports `done` once every
+    requested section has been read, so the caller can stop reading the response.
+    """
+
+    def __init__(self, section_titles: List[str]):
+        super().__init__(convert_charrefs=True)
+        self.rows: Deque[Tuple[str, RankingRecord]] = deque()
+        self._emitted: Dict[str, int] = {}  # rows emitted per section, the position of rows without a rank
+        self.finished: Set[str] = set()
+        self._wanted = {title.lower(): title for title in section_titles}
+        self._div_stack: List[bool] = []  # One entry per open div, True when it is a card div
+        self._heading: Optional[List[str]] = None
+        self._section: Optional[str] = None
+        self._card_depth = 0
+        self._tbody_depth = 0
+        self._row: Optional[Dict[str, Any]] = None
+        self._td: Optional[List[str]] = None
+        self._anchor: Optional[List[str]] = None
+        self._text: List[str] = []  # Text node being received, may arrive split across feeds
+
+    @property
+    def done(self) -> bool:
+        return len(self.finished) == len(self._wanted)
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        self._flush_text()
+        if tag == "div":
+            self._div_stack.append("card" in (dict(attrs).get("class") or "").split())
+        elif tag in HEADING_TAGS and self._heading is None and self._section is None:
+            self._heading = []
+        elif self._section is None:
+            return
+        elif tag == "tbody":
+            self._tbody_depth += 1
+        elif self._tbody_depth == 0:
+            return
+        elif tag == "tr":
+            self._row = {"tds": [], "title": None, "href": None}
+        elif self._row is None:
+            return
+        elif tag == "td" and self._td is None:
+            self._td = []
+            self._row["tds"].append((" ".join((dict(attrs).get("class") or "").split()), self._td))
+        elif tag == "a" and self._row["href"] is None and self._anchor is None:
+            self._anchor = []
+            self._row["href"] = dict(attrs).get("href") or ""
+
+    def handle_endtag(self, tag: str) -> None:
+        self._flush_text()
+        if tag == "div":
+            if self._div_stack:
+                self._div_stack.pop()
+            if self._section is not None and len(self._div_stack) < self._card_depth:
+                logging.warning(f"Could not find tbody in card div for {self._section}")
+                self._finish_section()
+        elif tag in HEADING_TAGS and self._heading is not None:
+            self._match_heading("".join(self._heading))
+            self._heading = None
+        elif self._section is None:
+            return
+        elif tag == "tbody" and self._tbody_depth:
+            self._tbody_depth -= 1
+            if self._tbody_depth == 0:
+                self._finish_section()
+        elif tag == "td" and self._td is not None:
+            self._td = None
+        elif tag == "a" and self._anchor is not None:
+            self._row["title"] = "".join(self._anchor)
+            self._anchor = None
+        elif tag == "tr" and self._row is not None:
+            self._emit_row(self._row)
+            self._row = None
+            self._td = None
+            self._anchor = None
+
+    def handle_data(self, data: str) -> None:
+        if self._heading is not None or self._td is not None or self._anchor is not None:
+            self._text.append(data)
+
+    def close(self) -> None:
+        super().close()
+        self._flush_text()
+
+    def _flush_text(self) -> None:
+        # Same semantics as BeautifulSoup's get_text(strip=True): each complete text node is stripped
+        if not self._text:
+            return
+        text = "".join(self._text).strip()
+        self._text = []
+        if not text:
+            return
+        if self._heading is not None:
+            self._heading.append(text)
+        if self._td is not None:
+            self._td.append(text)
+        if self._anchor is not None:
+            self._anchor.append(text)
+
+    def _match_heading(self, heading_text: str) -> None:
+        section_title = self._wanted.get(heading_text.lower())
+        if section_title is None or section_title in self.finished:
+            return
+        card_depth = max((depth for depth, is_card in enumerate(self._div_stack, 1) if is_card), default=0)
+        if not card_depth:
+            logging.warning(f"Could not find card div containing section header for {section_title}")
+            self.finished.add(section_title)
+            return
+        logging.debug(f"Found section '{section_title}' while streaming")
+        self._section = section_title
+        self._card_depth = card_depth
+
+    def _emit_row(self, row: Dict[str, Any]) -> None:
+        section_title = self._section
+        tds = row["tds"]
+        rank_td = next((text for css, text in tds if css == RANK_TD_CLASS), None)
+        if rank_td is None and tds:
+            rank_td = tds[0][1]
+        if rank_td is None:
+            logging.warning(f"Could not find rank td in row for {section_title}")
+            return
+        if row["href"] is None:
+            logging.warning(f"Could not find title link in row for {section_title}")
+            return
+        title = row["title"] or ""
+        if not row["href"]:
+            logging.warning(f"Title link has no href for {section_title}: {title}")
+            return
+        slug = slug_from_href(row["href"])
+        if not slug:
+            logging.warning(f"Could not extract slug from href: {row['href']}")
+            return
+        self._emitted[section_title] = position = self._emitted.get(section_title, 0) + 1
+        self.rows.append((section_title, RankingRecord.from_cells("".join(rank_td), title, slug, position)))
+
+    def _finish_section(self) -> None:
+        self.finished.add(self._section)
+        self._section = None
+        self._card_depth = 0
+        self._tbody_depth = 0
+        self._row = None
+        self._td = None
+        self._anchor = None
+
+
+# Charset a streamed page is decoded with: the one the Content-Type declares, else utf-8. requests falls back
+# to ISO-8859-1 for text/* without a charset, which would mangle non-ASCII titles the DOM parser reads fine
+def declared_encoding(response: requests.Response) -> str:
+    if "charset=" not in response.headers.get("Content-Type", "").lower():
+        return "utf-8"
+    return requests.utils.get_encoding_from_headers(response.headers) or "utf-8"
+
+
+# Stream rows of several sections of a FlixPatrol page, stopping once all of them were read
+def iter_top10_rows(url: str, section_titles: List[str], chunk_size: int = None) -> Iterator[Tuple[str, RankingRecord]]:
+    """Yield (section_title, (rank, title, slug)) as soon as each table row has been received.
+
+    The response body is read in chunks and fed to `Top10StreamParser`; the connection is closed
+    as soon as every requested section has been read, so the rest of the page is never downloaded.
+    When a snapshot archive is configured, the rest of the page is still read (without parsing it)
+    so that the complete page can be archived.
+
+    Raises:
+        requests.exceptions.RequestException: If the request fails or the status is not 200
+    """
+    chunk_size = chunk_size or config.STREAM_CHUNK_SIZE
+    parser = Top10StreamParser(section_titles)
+    response = fetch_page(url, stream=True)
+    archive = get_snapshot_archive() if not config.SNAPSHOT_REPLAY else None
+    chunks: Optional[List[bytes]] = [] if archive else None
+    try:
+        if response.status_code != 200:
+            raise requests.exceptions.HTTPError(f"status code: {response.status_code}", response=response)
+        decoder = codecs.getincrementaldecoder(declared_encoding(response))(errors="replace")
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if chunks is not None:
+                chunks.append(chunk)
+                if parser.done:
+                    continue
+            parser.feed(decoder.decode(chunk))
+            while parser.rows:
+                yield parser.rows.popleft()
+            if parser.done and chunks is None:
+                logging.debug(f"All sections read from {url}, closing connection early")
+                return
+        if chunks is not None:
+            archive.store(url, b"".join(chunks))
+            if parser.done:
+                return
+        parser.feed(decoder.decode(b"", final=True))
+        parser.close()
+        while parser.rows:
+            yield parser.rows.popleft()
+        for section_title in section_titles:
+            if section_title not in parser.finished:
+                logging.warning(f"Could not find section header for '{section_title}' in {url}")
+    finally:
+        response.close()
+
+
+# Streaming counterpart of scrape_top10 that reads several sections from a single request
+@traced("scrape", detail=lambda url, section_titles: {"url": url, "sections": section_titles})
+def scrape_top10_streaming(url: str, section_titles: List[str]) -> Optional[Dict[str, List[RankingRecord]]]:
+    """Scrape several sections of one page with a single streamed request.
+
+    Returns:
+        Optional[Dict[str, List[RankingRecord]]]: Rows per section title, or None if the request failed
+    """
+    data: Dict[str, List[RankingRecord]] = {section_title: [] for section_title in section_titles}
+    try:
+        for section_title, row in iter_top10_rows(url, section_titles):
+            data[section_title].append(row)
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Request failed for {url}: {e}")
+        return None
+    except Exception as e:
+        logging.error(f"Error scraping {url}: {e}")
+        return None
+    for section_title, rows in data.items():
+        logging.info(f"Scraped {len(rows)} items from {section_title}")
+    return data
+
+
+# parse items from trakt list
+def parse_items(items: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    payload: Dict[str, List[Dict[str, Any]]] = {"movies": [], "shows": []}
+    for item in items:
+        if item["type"] in ("movie", "show"):
+            payload[f"{item['type']}s"].append({"ids": {"trakt": item[item["type"]]["ids"]["trakt"]}})
+    return payload
+
+
+# Decorator to retry requests
+def retry_request(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        attempts = MAX_RETRIES
+        for attempt in range(attempts):
+            try:
+                with trace_span(f"{func.__name__} attempt", "retry", attempt=attempt + 1):
+                    response = func(*args, **kwargs)
+            except DeadlineExceeded as e:
+                logging.error(f"Giving up: {e}")
+                return None
+            if (
+                response
+                and response == 304
+                or (hasattr(response, "status_code") and response.status_code in [200, 201])
+            ):
+                return response
+            logging.warning(
+                f"Attempt {attempt + 1} failed with {getattr(response, 'status_code', 'unknown status')}. Retrying..."
+            )
+            with trace_span("retry sleep", "sleep", seconds=BACKOFF_FACTOR**attempt):
+                slept = get_run_budget().sleep(BACKOFF_FACTOR**attempt)
+            if not slept:
+                logging.error("Run deadline reached, no time left to retry.")
+                return None
+        logging.error("All attempts to update the list failed.")
+        return None
+
+    return wrapper
+
+
+# ============================
+# PARALLEL PARSING
+# ============================
+
+
+@traced("parse", detail=lambda content, section_titles, url="": {"sections": section_titles, "url": url})
+def parse_page_sections(
+    content: Union[bytes, str], section_titles: List[str], url: str = ""
+) -> Dict[str, List[RankingRecord]]:
+    """Parse several ranking sections out of one fetched page, parsing the HTML once.
+
+    Only RankingRecord tuples are returned so that results are cheap to send back from a parser process.
+    """
+    soup = BeautifulSoup(content, "html.parser")
+    return {section_title: parse_top10_soup(soup, section_title, url) for section_title in section_titles}
+
+
+def _parse_page_job(job: Tuple[bytes, List[str], str]) -> Dict[str, List[RankingRecord]]:
+    """Unpack a (content, section titles, url) job."""
+    content, section_titles, url = job
+    return parse_page_sections(content, section_titles, url)
+
+
+def _init_parser_process() -> None:
+    """Make a parser process collect learned parse strategies instead of writing the shared cache file."""
+    global _parser_process, _strategy_cache
+    _parser_process = True
+    _strategy_cache = None  # A forked process inherits the parent's writable cache
+
+
+def _parse_page_job_in_process(
+    job: Tuple[bytes, List[str], str],
+) -> Tuple[Dict[str, List[RankingRecord]], Dict[str, Dict[str, str]]]:
+    """Parse a job in a parser process, returning the rows with the parse strategies learned meanwhile."""
+    sections = _parse_page_job(job)
+    cache = get_strategy_cache()
+    return sections, cache.take_learned() if cache else {}
+
+
+def _record_learned(
+    result: Tuple[Dict[str, List[RankingRecord]], Dict[str, Dict[str, str]]],
+) -> Dict[str, List[RankingRecord]]:
+    sections, learned = result
+    cache = get_strategy_cache()
+    if cache and learned:
+        cache.update(learned)
+    return sections
+
+
+class PageParser:
+    """Parses fetched pages either in the calling process or in a pool of parser processes.
+
+    Both backends run `parse_page_sections` on the same bytes, so results do not depend on the backend.
+    BeautifulSoup parsing is CPU bound and holds the GIL, so only separate processes let it use more
+    than one core; pages are sent to the workers in chunks of `chunk_size` to amortise the IPC cost.
+    """
+
+    def __init__(self, processes: int = 0, chunk_size: int = 1):
+        self.processes = processes
+        self.chunk_size = max(1, chunk_size)
+        self._pool = (
+            ProcessPoolExecutor(max_workers=processes, initializer=_init_parser_process) if processes > 0 else None
+        )
+
+    @classmethod
+    def from_config(cls, config: Config) -> "PageParser":
+        return cls(config.PARSE_PROCESSES, config.PARSE_CHUNK_SIZE)
+
+    def parse(self, content: bytes, section_titles: List[str], url: str = "") -> Dict[str, List[RankingRecord]]:
+        """Parse a single page, in a worker process when the pool is enabled."""
+        if self._pool is None:
+            return parse_page_sections(content, section_titles, url)
+        return _record_learned(self._pool.submit(_parse_page_job_in_process, (content, section_titles, url)).result())
+
+    def parse_many(self, jobs: List[Tuple[bytes, List[str], str]]) -> List[Dict[str, List[RankingRecord]]]:
+        """Parse (content, section titles, url) jobs, returning the rows per section title in job order."""
+        if self._pool is None:
+            return [_parse_page_job(job) for job in jobs]
+        return [
+            _record_learned(result)
+            for result in self._pool.map(_parse_page_job_in_process, jobs, chunksize=self.chunk_size)
+        ]
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+def fetch_pages(
+    urls: List[str], workers: int, headers: Optional[Dict[str, Dict[str, str]]] = None
+) -> Dict[str, Optional[requests.Response]]:
+    """Fetch several pages with a pool of network threads, sending each page its extra headers, if any.
+
+    Returns:
+        Dict[str, Optional[requests.Response]]: The 200 (or 304 Not Modified) response of each page,
+            None for pages that failed
+    """
+
+    parent_span = current_span()
+    headers = headers or {}
+
+    def fetch(url: str) -> Optional[requests.Response]:
+        try:
+            with adopt_span(parent_span):
+                response = profile_worker_call(fetch_page, url, headers=headers.get(url))
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Request failed for {url}: {e}")
+            return None
+        if response.status_code not in (200, 304):
+            logging.error(f"Failed to retrieve page {url}, status code: {response.status_code}")
+            return None
+        return response
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="fetch") as pool:
+        return dict(zip(urls, pool.map(fetch, urls)))
+
+
+# ============================
+# TRAKT ACCOUNTS
+# ============================
+
+# Account whose work the current thread is doing, set by TraktAccount workers
+_account_context = threading.local()
+
+
+class TraktAccount:
+    """A Trakt account with the lists it owns, its token state, worker pool and request rate limiter.
+
+    Trakt rate limits apply per account, so every account runs its lists on its own workers and
+    spreading lists over more accounts increases sync throughput.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        list_slugs: List[str],
+        client_id: Optional[str] = None,
+        client_secret: Optional[str] = None,
+        access_token: Optional[str] = None,
+        refresh_token: Optional[str] = None,
+        workers: int = 2,
+        min_interval: float = 0.0,
+    ):
+        self.name = name
+        self.list_slugs = list_slugs
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.workers = max(1, workers)
+        self.limiter = PolitenessLimiter(min_interval)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @classmethod
+    def from_config(cls, config: Config, name: str) -> "TraktAccount":
+        credentials = {field.lower(): getattr(config, f"{name}_{field}", None) for field in TRAKT_CREDENTIAL_FIELDS}
+        return cls(
+            name,
+            config.TRAKT_ACCOUNTS[name],
+            workers=config.TRAKT_ACCOUNT_WORKERS,
+            min_interval=config.TRAKT_MIN_INTERVAL,
+            **credentials,
+        )
+
+    @classmethod
+    def all_from_config(cls, config: Config) -> Dict[str, "TraktAccount"]:
+        return {name: cls.from_config(config, name) for name in config.TRAKT_ACCOUNTS}
+
+    @property
+    def credentials(self) -> Tuple[Optional[str], Optional[str]]:
+        """(client ID, access token) of the account."""
+        return self.client_id, self.access_token
+
+    def submit(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Run func on one of the account's workers; Trakt requests made by func use the account's rate limit."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"trakt-{self.name}")
+        return self._executor.submit(self._run_as_account, current_span(), func, args, kwargs)
+
+    def _run_as_account(
+        self, parent_span: Optional[int], func: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any]
+    ) -> Any:
+        _account_context.account = self
+        try:
+            with adopt_span(parent_span):
+                return profile_worker_call(func, *args, **kwargs)
+        finally:
+            _account_context.account = None
+
+    def validate(self) -> bool:
+        """Check the access token of the account, refreshing it if it expired.
+
+        A token validated less than TOKEN_CHECK_TTL hours ago is trusted without asking Trakt again.
+        """
+        if not all([self.client_id, self.client_secret, self.access_token, self.refresh_token]):
+            logging.error(f"{self.name} Trakt account is missing its client ID, secret, access or refresh token")
+            return False
+        if self.token_recently_validated():
+            logging.info(f"{self.name} Trakt token validated recently, not checking it again")
+            return True
+        result = check_token(self.client_id, self.client_secret, self.access_token, self.refresh_token)
+        if result is True:
+            logging.info(f"{self.name} Trakt token is valid")
+        elif isinstance(result, tuple) and all(result):
+            logging.info(f"{self.name} Trakt token refreshed successfully")
+            self.access_token, self.refresh_token = result
+        else:
+            logging.error(f"Failed to validate {self.name} Trakt token")
+            return False
+        cache = get_tracker_cache()
+        if cache:
+            cache.put("tokens", self._token_key())
+        return True
+
+    def token_recently_validated(self) -> bool:
+        """Whether the access token was validated less than TOKEN_CHECK_TTL hours ago (tracker cache)."""
+        cache = get_tracker_cache()
+        return bool(
+            cache
+            and self.access_token
+            and cache.get("tokens", self._token_key(), max_age=config.TOKEN_CHECK_TTL * 3600)
+        )
+
+    def _token_key(self) -> str:
+        # Only a hash of the token is ever stored
+        return hashlib.sha256(self.access_token.encode()).hexdigest()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+# Send a Trakt API request, waiting for the rate limit of the account the current thread works for
+def trakt_request(method: str, url: str, **kwargs: Any) -> requests.Response:
+    account = getattr(_account_context, "account", None)
+    if account is not None:
+        account.limiter.wait(url)
+    with trace_span(f"{method} {urlparse(url).path}", "http", url=url, account=account.name if account else None):
+        return requests.request(method, url, **kwargs)
+
+
+# ============================
+# TRAKT METHODS
+# ============================
+
+
+# Refresh Trakt.tv access token
+def refresh_token(
+    client_id: str,
+    client_secret: str,
+    refresh_token: str,
+) -> Tuple[Optional[str], Optional[str]]:
+    """Refresh a Trakt.tv access token.
+
+    Args:
+        client_id: The Trakt.tv client ID
+        client_secret: The Trakt.tv client secret
+        refresh_token: The refresh token to use
+
+    Returns:
+        Tuple[Optional[str], Optional[str]]: New access token and refresh token, or None if refresh failed
+    """
+    url = "https://api.trakt.tv/oauth/token"
+    data = {
+        "refresh_token": refresh_token,
+        "client_id": client_id,
+        "client_secret": client_secret,
+        "redirect_uri": "urn:ietf:wg:oauth:2.0:oob",
+        "grant_type": "refresh_token",
+    }
+
+    try:
+        response = trakt_request("POST", url, json=data, timeout=request_timeout())
+        if response.status_code == 200:
+            result = response.json()
+            return result["access_token"], result["refresh_token"]
+        else:
+            logging.error(f"Token refresh failed with status {response.status_code}")
+            return None, None
+    except Exception as e:
+        logging.error(f"Error refreshing token: {e}")
+        return None, None
+
+
+# Alias used where a `refresh_token` argument shadows the function
+refresh_access_token = refresh_token
+
+
+# Check Trakt access token
+def check_token(
+    client_id: str = None,
+    client_secret: str = None,
+    access_token: str = None,
+    refresh_token: str = None,
+) -> Union[bool, Tuple[Optional[str], Optional[str]]]:
+    """Check if a Trakt.tv access token is valid and refresh if needed.
+
+    Args:
+        client_id: The Trakt.tv client ID to check
+        client_secret: The Trakt.tv client secret
+        access_token: The access token to check
+        refresh_token: The refresh token to use if access token is invalid
+
+    Returns:
+        Union[bool, Tuple[Optional[str], Optional[str]]]:
+            - True if token is valid
+            - Tuple of new tokens if refreshed
+            - (None, None) if refresh failed
+    """
+    response = trakt_request(
+        "GET", "https://api.trakt.tv/users/me", headers=get_headers(client_id, access_token), timeout=request_timeout()
+    )
+
+    if response.status_code == 200:
+        return True
+    elif response.status_code == 401:  # Unauthorized - try refreshing token
+        logging.info("Access token expired, attempting refresh...")
+        return refresh_access_token(client_id, client_secret, refresh_token)
+    else:
+        logging.error(f"Token check failed with status {response.status_code}")
+        return None, None
+
+
+# Get Trakt user's lists
+def get_lists(client_id: str = None, access_token: str = None) -> List[Dict[str, Any]]:
+    """Get all lists for a Trakt.tv user.
+
+    Args:
+        client_id: The Trakt.tv client ID to use
+        access_token: The access token to use
+    Returns:
+        List[Dict[str, Any]]: List of Trakt.tv lists
+    """
+    response = trakt_request(
+        "GET",
+        "https://api.trakt.tv/users/me/lists",
+        headers=get_headers(client_id, access_token),
+        timeout=request_timeout(),
+    )
+    return response.json()
+
+
+# Get a list by ID
+def get_list(list_id: str, client_id: str = None, access_token: str = None) -> Dict[str, Any]:
+    """Get a specific Trakt.tv list.
+
+    Args:
+        list_id: ID of the list to get
+        client_id: The Trakt.tv client ID to use
+        access_token: The access token to use
+    Returns:
+        Dict[str, Any]: List details
+    """
+    response = trakt_request(
+        "GET",
+        f"https://api.trakt.tv/users/me/lists/{list_id}",
+        headers=get_headers(client_id, access_token),
+        timeout=request_timeout(),
+    )
+    return response.json()
+
+
+# Get list id by slug
+def get_list_id(list_slug: str) -> Optional[int]:
+    lists = get_lists()
+    for list in lists:
+        if list["ids"]["slug"] == list_slug:
+            return list["ids"]["trakt"]
+    return None
+
+
+# Get a list items
+def get_list_items(list_id: str, client_id: str = None, access_token: str = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Get items from a Trakt.tv list.
+
+    Args:
+        list_id: The ID of the list to get items from
+        client_id: The Trakt.tv client ID for the appropriate account
+        access_token: The access token for the appropriate account
+    """
+    logging.info(f"Getting items from list ID: {list_id}")
+    response = trakt_request(
+        "GET",
+        f"https://api.trakt.tv/users/me/lists/{list_id}/items",
+        headers=get_headers(client_id, access_token),
+        timeout=request_timeout(),
+    )
+    parsed_items = parse_items(response.json())
+    return parsed_items
+
+
+# Delete a list by ID
+def delete_list(list_id: str, client_id: str = None, access_token: str = None) -> int:
+    """Delete a Trakt.tv list.
+
+    Args:
+        list_id: The ID of the list to delete
+        client_id: The Trakt.tv client ID for the appropriate account
+        access_token: The access token for the appropriate account
+    """
+    response = trakt_request(
+        "DELETE",
+        f"https://api.trakt.tv/users/me/lists/{list_id}",
+        headers=get_headers(client_id, access_token),
+        timeout=request_timeout(),
+    )
+    return response.status_code
+
+
+@retry_request
+def create_list(list_data: Dict[str, Any], client_id: str = None, access_token: str = None) -> requests.Response:
+    """Create a new list in Trakt.tv.
+
+    Args:
+        list_data: The data for creating the list
+        client_id: The Trakt.tv client ID for the appropriate account
+        access_token: The access token for the appropriate account
+    """
+    response = trakt_request(
+        "POST",
+        "https://api.trakt.tv/users/me/lists",
+        headers=get_headers(client_id, access_token),
+        json=list_data,
+        timeout=request_timeout(),
+    )
+    if response and response.status_code == 201:
         logging.info(f"List '{list_data['name']}' created successfully.")
     return response
 
 
-# Empty a list
-def empty_list(list_id: str, client_id: str, access_token: str) -> int:
-    logging.info("Emptying list...")
-    list_items = get_list_items(list_id, client_id, access_token)
-    response = requests.post(
-        f"https://api.trakt.tv/users/me/lists/{list_id}/items/remove",
-        headers=get_headers(client_id, access_token),
-        json=list_items,
-        timeout=REQUEST_TIMEOUT,
-    )
-    logging.info("List emptied")
-    return response.status_code
+# Empty a list
+@traced("sync", detail=lambda list_id, *args: {"list": list_id})
+def empty_list(list_id: str, client_id: str, access_token: str) -> int:
+    logging.info("Emptying list...")
+    list_items = get_list_items(list_id, client_id, access_token)
+    response = trakt_request(
+        "POST",
+        f"https://api.trakt.tv/users/me/lists/{list_id}/items/remove",
+        headers=get_headers(client_id, access_token),
+        json=list_items,
+        timeout=request_timeout(),
+    )
+    logging.info("List emptied")
+    return response.status_code
+
+
+# Check necessary lists
+def check_lists(config: Config, accounts: Optional[Dict[str, TraktAccount]] = None) -> bool:
+    """Check if lists exist, create them if they don't.
+
+    Args:
+        config: The configuration object containing account credentials
+        accounts: The accounts to check, built from the configuration if not given
+    Returns:
+        bool: True if any error occurred, False otherwise
+    """
+    error_create = False
+    cache = get_tracker_cache()
+
+    for account in (accounts or TraktAccount.all_from_config(config)).values():
+        known = cache.get("lists", account.name, max_age=config.LIST_CACHE_TTL * 3600) if cache else None
+        if known and set(account.list_slugs) <= set(known["slugs"]):
+            logging.debug(f"{account.name} lists known to exist, not listing them again")
+            continue
+        account_slugs = [list["ids"]["slug"] for list in get_lists(*account.credentials)]
+        logging.debug(f"{account.name} lists slugs: {account_slugs}")
+
+        for list_slug in account.list_slugs:
+            if list_slug in account_slugs:
+                continue
+            if list_slug not in trakt_list_data:
+                logging.error(f"No list data defined for {list_slug} of account {account.name}")
+                error_create = True
+                continue
+            if create_list(trakt_list_data[list_slug], *account.credentials) is None:
+                logging.error(f"Failed to create list {list_slug}")
+                error_create = True
+                continue
+            account_slugs.append(list_slug)
+        if cache:
+            cache.put("lists", account.name, slugs=account_slugs)
+    logging.debug("Lists checked!")
+    return error_create
+
+
+# Find the search result matching a FlixPatrol title and slug among results of a single type
+def match_search_result_by_type(
+    results: List[Dict[str, Any]], title: str, title_tag: str, type: str
+) -> Optional[Dict[str, Any]]:
+    normalized_title_tag = title_tag.replace("-", "")
+    lower_title = title.lower()
+    for result in results:
+        log_event("search.compare", title=title, candidate=result[type]["title"])
+        normalized_slug = result[type]["ids"]["slug"].replace("-", "")
+        if (
+            result["type"] == type
+            and result[type]["title"].lower() == lower_title
+            and (normalized_title_tag in normalized_slug or normalized_title_tag.startswith(normalized_slug))
+            or (
+                normalized_title_tag in normalized_slug
+                or normalized_title_tag.startswith(normalized_slug)
+                or normalized_slug.startswith(normalized_title_tag)
+            )
+        ):
+            log_event("search.match", title=title, trakt_id=result[type]["ids"]["trakt"], slug=normalized_slug)
+            return result
+    return None
+
+
+# Find the search result matching a FlixPatrol title and slug among movie and show results
+def match_search_result(results: List[Dict[str, Any]], title: str, title_tag: str) -> Optional[Dict[str, Any]]:
+    normalized_title_tag = title_tag.replace("-", "")
+    lower_title = title.lower()
+    for result in results:
+        type = result["type"]
+        normalized_slug = result[type]["ids"]["slug"].replace("-", "")
+        log_event(
+            "search.compare",
+            title=title,
+            tag=normalized_title_tag,
+            candidate=result[type]["title"],
+            slug=normalized_slug,
+        )
+        if (
+            result[type]["title"].lower() == lower_title
+            and (normalized_title_tag in normalized_slug or normalized_title_tag.startswith(normalized_slug))
+            or (normalized_title_tag in normalized_slug or normalized_title_tag.startswith(normalized_slug))
+        ):
+            log_event("search.match", title=title, trakt_id=result[type]["ids"]["trakt"], slug=normalized_slug)
+            return result
+    return None
+
+
+# Search movies or shows by title and type
+@traced("resolve", detail=lambda title_info, type, *args: {"title": title_info[0], "type": type})
+def search_title_by_type(
+    title_info: Tuple[str, str], type: str, client_id: str = None, access_token: str = None
+) -> List[int]:
+    title = title_info[0].replace("&", "and")
+    title_tag = title_info[1]
+    cache = get_tracker_cache()
+    cached = cache.get("titles", f"{type}|{title_tag}") if cache else None
+    if cached:
+        return [cached["trakt"]]
+    local = resolve_locally(title, title_tag, (type,))
+    if local:
+        return [local[1]]
+
+    response = trakt_request(
+        "GET",
+        f"https://api.trakt.tv/search/{type}?query={title}&extended=full",
+        headers=get_headers(client_id, access_token),
+        timeout=request_timeout(),
+    )
+    trakt_ids = []
+    if response.status_code == 200:
+        results = response.json()
+        log_event("search.results", title=title, type=type, count=len(results))
+        corpus = get_candidate_corpus()
+        if corpus:
+            corpus.add(results)
+        result = match_search_result_by_type(results, title, title_tag, type)
+        if result is None:
+            closest = best_search_result(results, title, title_tag)
+            if closest is None:
+                logging.warning(f"Title not found: {title}, no {type} search results")
+                return trakt_ids
+            result, confidence = closest
+            logging.warning(
+                f"Title not found: {title}, will add closest result: {result[type]['title']} ({confidence:.2f})"
+            )
+        elif cache:
+            cache.put("titles", f"{type}|{title_tag}", type=type, trakt=result[type]["ids"]["trakt"])
+        trakt_ids.append(result[type]["ids"]["trakt"])
+    else:
+        logging.error(f"Error: {response.status_code}")
+    return trakt_ids
+
+
+# Search movies and shows by title
+@traced("resolve", detail=lambda title_info, *args: {"title": title_info[0]})
+def search_title(
+    title_info: Tuple[str, str, str], client_id: str = None, access_token: str = None
+) -> List[Tuple[str, int, str]]:
+    title = title_info[0].replace("&", "and")
+    title_tag = title_info[1]
+    rank = title_info[2]
+    cache = get_tracker_cache()
+    cached = cache.get("titles", f"movie,show|{title_tag}") if cache else None
+    if cached:
+        return [(cached["type"], cached["trakt"], rank)]
+    local = resolve_locally(title, title_tag, ("movie", "show"))
+    if local:
+        return [(local[0], local[1], rank)]
+
+    response = trakt_request(
+        "GET",
+        f"https://api.trakt.tv/search/movie,show?query={title}&extended=full",
+        headers=get_headers(client_id, access_token),
+        timeout=request_timeout(),
+    )
+    trakt_info = []
+    if response.status_code == 200:
+        results = response.json()
+        log_event("search.results", title=title, type="movie,show", count=len(results))
+        corpus = get_candidate_corpus()
+        if corpus:
+            corpus.add(results)
+        result = match_search_result(results, title, title_tag)
+        if result is None:
+            closest = best_search_result(results, title, title_tag)
+            if closest is None:
+                logging.warning(f"Title not found: {title}, no search results")
+                return trakt_info
+            result, confidence = closest
+            logging.warning(
+                f"Title not found: {title}, will add closest result: "
+                f"{result[result['type']]['title']} ({confidence:.2f})"
+            )
+        elif cache:
+            cache.put(
+                "titles", f"movie,show|{title_tag}", type=result["type"], trakt=result[result["type"]]["ids"]["trakt"]
+            )
+        trakt_info.append((result["type"], result[result["type"]]["ids"]["trakt"], rank))
+    else:
+        logging.error(f"Error: {response.status_code}")
+    return trakt_info
+
+
+# Keep the rows worth resolving in the time left: ranks after LOW_PRIORITY_RANK go first when the deadline is close
+def prioritized_titles(top_list: List[RankingRecord]) -> List[RankingRecord]:
+    budget = get_run_budget()
+    kept = []
+    for position, row in enumerate(top_list, start=1):
+        if rank_to_int(row[0], position) > config.LOW_PRIORITY_RANK and not budget.allows_low_priority("search"):
+            logging.info(f"Run deadline close, not resolving rank {row[0]}: {row[1]}")
+            continue
+        kept.append(row)
+    return kept
+
+
+# Create a Trakt list payload based on the top movies and shows list
+@traced("resolve")
+def create_type_trakt_list_payload(
+    top_list: List[RankingRecord], type: str, client_id: str = None, access_token: str = None
+) -> Dict[str, List[Dict[str, Any]]]:
+    batch = RankingBatch.from_rows(top_list)
+
+    # resolve the trakt id of every row in place
+    for index in range(len(batch)):
+        trakt_id = search_title_by_type((batch.titles[index], batch.slugs[index]), type, client_id, access_token)
+        if trakt_id:
+            batch.resolve(index, type, trakt_id[0])
+
+    payload = batch.payload((type,))
+    log_event("payload.built", type=type, items=len(payload[f"{type}s"]))
+    return payload
+
+
+# Create a mixed Trakt list payload based on an overral top movies and shows list
+@traced("resolve")
+def create_mixed_trakt_list_payload(
+    top_list: List[RankingRecord], client_id: str = None, access_token: str = None
+) -> Dict[str, List[Dict[str, Any]]]:
+    batch = RankingBatch.from_rows(top_list)
+
+    # resolve the type and trakt id of every row in place
+    for index in range(len(batch)):
+        title_info = (batch.titles[index], batch.slugs[index], batch.ranks[index])
+        trakt_info = search_title(title_info, client_id, access_token)
+        if trakt_info:
+            batch.resolve(index, trakt_info[0][0], trakt_info[0][1])
+
+    payload = batch.payload(("movie", "show"))
+
+    log_event("payload.built", type="mixed", movies=len(payload["movies"]), shows=len(payload["shows"]))
+    return payload
+
+
+# Update a trakt list
+@traced("sync", detail=lambda list_slug, *args, **kwargs: {"list": list_slug})
+@retry_request
+def update_list(
+    list_slug: str,
+    payload: Dict[str, List[Dict[str, Any]]],
+    client_id: str = None,
+    access_token: str = None,
+) -> Union[requests.Response, int]:
+    """Update a list in Trakt.tv with new content.
+
+    Args:
+        list_slug: The slug of the list to update
+        payload: The content to update the list with
+        client_id: The Trakt.tv client ID for the appropriate account
+        access_token: The access token for the appropriate account
+    """
+    # Empty the list only if payload is not empty
+    if payload.get("movies") or payload.get("shows"):
+        empty_list(list_slug, client_id, access_token)
+        logging.info(f"Updating list {list_slug} ...")
+        # The deadline stops an update before the list is emptied, never between emptying and refilling it
+        response = trakt_request(
+            "POST",
+            f"https://api.trakt.tv/users/me/lists/{list_slug}/items",
+            headers=get_headers(client_id, access_token),
+            json=payload,
+            timeout=(config.CONNECT_TIMEOUT, config.REQUEST_TIMEOUT),
+        )
+        if response.status_code in [200, 201]:
+            logging.info("List updated successfully")
+        return response
+    else:
+        logging.warning("Payload is empty. No items to add on list " + list_slug)
+        return 304
+
+
+# ============================
+# TITLE PREFETCH
+# ============================
+# FlixPatrol pages show many more charts than the sections that are synced, and their titles are often the
+# ones entering the synced charts in the next days. They are harvested from pages already fetched and
+# resolved in the background, so that a newly charting title is usually a cache hit by the time it is synced.
+
+TITLE_LINK_PATTERN = re.compile(r'<a\b[^>]*\bhref="/title/([^"/]+)/"[^>]*>\s*([^<]+?)\s*</a>')
+
+# Any Trakt URL: prefetch requests share the per-host slots of the account's limiter
+TRAKT_API_URL = "https://api.trakt.tv/"
+
+
+# Titles linked from a FlixPatrol page: {slug: title}, in page order
+def harvest_titles(content: Union[bytes, str]) -> Dict[str, str]:
+    text = content.decode("utf-8", "replace") if isinstance(content, bytes) else content
+    titles: Dict[str, str] = {}
+    for slug, title in TITLE_LINK_PATTERN.findall(text):
+        titles.setdefault(slug, html.unescape(title))
+    return titles
+
+
+def title_known(title: str, slug: str) -> bool:
+    """Whether a title resolves without searching Trakt: cached under any search type, or in the corpus."""
+    cache = get_tracker_cache()
+    if cache and any(cache.get("titles", f"{types}|{slug}") for types in ("movie,show", "movie", "show")):
+        return True
+    return resolve_locally(title.replace("&", "and"), slug, ("movie", "show")) is not None
+
+
+class TitlePrefetcher:
+    """Resolve titles harvested from fetched pages on a background thread, within a share of a rate budget.
+
+    A prefetch request is only sent while the account's own requests leave its rate limiter idle, and at
+    most one every min_interval / share seconds, so the account's lists are never slowed down by more than
+    that share. Resolved titles land in the tracker cache and the candidate corpus like any other search.
+    """
+
+    def __init__(
+        self,
+        share: float,
+        limit: int,
+        clock: Callable[[], float] = time.monotonic,
+        sleeper: Callable[[float], None] = time.sleep,
+    ):
+        self.share = share
+        self.limit = limit
+        self.pending: Dict[str, str] = {}
+        self.searched = 0
+        self.resolved = 0
+        self._pages: Set[str] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._clock = clock
+        self._sleeper = sleeper
+
+    @classmethod
+    def from_config(cls, config: Config) -> "TitlePrefetcher":
+        return cls(config.PREFETCH_SHARE, config.PREFETCH_MAX)
+
+    def harvest(self, url: str, content: Union[bytes, str]) -> None:
+        """Queue the titles of a fetched page; a page fetched again (one fetch per section) is read once."""
+        with self._lock:
+            if url in self._pages:
+                return
+            self._pages.add(url)
+            for slug, title in harvest_titles(content).items():
+                self.pending.setdefault(slug, title)
+
+    def start(self, account: TraktAccount, exclude: Set[str]) -> None:
+        """Resolve the pending titles, except the excluded slugs (the synced rows), as the given account."""
+        with self._lock:
+            titles = [(title, slug) for slug, title in self.pending.items() if slug not in exclude]
+            self.pending.clear()
+        titles = [(title, slug) for title, slug in titles if not title_known(title, slug)][: self.limit]
+        if not titles or self.share <= 0:
+            return
+        logging.info(f"Prefetching {len(titles)} titles as {account.name}")
+        self._thread = threading.Thread(target=self._run, args=(account, titles), name="title-prefetch", daemon=True)
+        self._thread.start()
+
+    def finish(self, timeout: float) -> None:
+        """Give the prefetch up to timeout seconds (capped by the run deadline) to finish, then stop it."""
+        if self._thread is not None:
+            self._thread.join(max(0.0, min(timeout, get_run_budget().remaining())))
+        self.stop()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            log_event("prefetch.done", searched=self.searched, resolved=self.resolved)
+
+    def _run(self, account: TraktAccount, titles: List[Tuple[str, str]]) -> None:
+        _account_context.account = account
+        interval = account.limiter.min_interval / self.share
+        next_request = self._clock()
+        try:
+            for title, slug in titles:
+                while not self._stop.is_set() and (
+                    self._clock() < next_request or not account.limiter.idle(TRAKT_API_URL)
+                ):
+                    self._sleeper(max(next_request - self._clock(), account.limiter.min_interval, 0.05))
+                budget = get_run_budget()
+                if self._stop.is_set() or not budget.allows_low_priority("prefetch"):
+                    return
+                next_request = self._clock() + interval
+                profile_worker_call(self._resolve, title, slug, account)
+        finally:
+            _account_context.account = None
+
+    def _resolve(self, title: str, slug: str, account: TraktAccount) -> None:
+        self.searched += 1
+        try:
+            search_title((title, slug, 0), *account.credentials)
+        except requests.exceptions.RequestException as e:
+            logging.debug(f"Prefetch of {title} failed: {e}")
+            return
+        cache = get_tracker_cache()
+        cached = cache.get("titles", f"movie,show|{slug}") if cache else None
+        if cached:
+            # Typed lists look titles up by their own type
+            cache.put("titles", f"{cached['type']}|{slug}", type=cached["type"], trakt=cached["trakt"])
+            self.resolved += 1
+
+
+# Prefetcher of the current run, None when prefetching is off
+_title_prefetcher: Optional[TitlePrefetcher] = None
+
+
+def get_title_prefetcher() -> Optional[TitlePrefetcher]:
+    return _title_prefetcher
+
+
+def start_title_prefetcher(config: Config) -> Optional[TitlePrefetcher]:
+    """Start collecting page titles for a new run; prefetching needs the tracker cache to keep its results."""
+    global _title_prefetcher
+    enabled = config.PREFETCH_TITLES and config.TRACKER_CACHE
+    _title_prefetcher = TitlePrefetcher.from_config(config) if enabled else None
+    return _title_prefetcher
+
+
+# ============================
+# REQUEST PLANNING
+# ============================
+# The Trakt requests of a run are predicted per account and endpoint from the scraped charts and the local
+# caches (resolved titles, known lists, validated tokens, last synced payloads), before any Trakt call.
+
+# Endpoints counted by the planner, in request order
+PLAN_ENDPOINTS = (
+    "GET /users/me",
+    "POST /oauth/token",
+    "GET /users/me/lists",
+    "POST /users/me/lists",
+    "GET /search",
+    "GET /users/me/lists/{id}/items",
+    "POST /users/me/lists/{id}/items/remove",
+    "POST /users/me/lists/{id}/items",
+)
+
+# Requests of updating a list with a non-empty payload: its items are read, removed, then added
+LIST_UPDATE_REQUESTS = PLAN_ENDPOINTS[5:]
+
+
+# Trakt (type, ID) a title resolves to without searching, None when resolving it needs a search
+def cached_resolution(title: str, slug: str, types: Tuple[str, ...]) -> Optional[Tuple[str, int]]:
+    cache = get_tracker_cache()
+    cached = cache.get("titles", f"{','.join(types)}|{slug}") if cache else None
+    if cached:
+        return cached["type"], cached["trakt"]
+    return resolve_locally(title.replace("&", "and"), slug, types)
+
+
+def payload_digest(payload: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class RequestPlan:
+    """Predicted Trakt requests of a run per account and endpoint, the list order and the deferred lists.
+
+    Accounts run in parallel, each one request at a time through its rate limiter, so an account's
+    requests take about requests * max(interval, PLAN_REQUEST_SECONDS / workers) seconds, and POSTs at
+    least TRAKT_POST_INTERVAL each. A token refresh is counted for every token that has to be checked.
+    """
+
+    def __init__(self, available: float, post_interval: float):
+        self.available = available  # seconds of run time for Trakt requests, inf without a deadline
+        self.post_interval = post_interval
+        self.requests: Dict[str, Counter] = {}  # account -> endpoint -> requests
+        self.lists: Dict[str, Dict[str, Any]] = {}  # slug -> account, requests and seconds, in run order
+        self.intervals: Dict[str, float] = {}  # account -> expected seconds per request
+        self.pacing: Dict[str, float] = {}  # account -> seconds between requests needed to stay under the GET quota
+        self.deferred: List[str] = []
+
+    def account_seconds(self, account: str, counts: Counter) -> float:
+        posts = sum(count for endpoint, count in counts.items() if endpoint.startswith("POST"))
+        gets = sum(counts.values()) - posts
+        interval = self.intervals[account]
+        return gets * interval + posts * max(interval, self.post_interval)
+
+    def order(self, jobs: List[Tuple[str, str, Optional[str], str]]) -> List[Tuple[str, str, Optional[str], str]]:
+        """The list jobs in planned order, without the deferred ones; unplanned jobs keep their place at the end."""
+        position = {slug: i for i, slug in enumerate(self.lists)}
+        kept = [job for job in jobs if job[1] not in self.deferred]
+        return sorted(kept, key=lambda job: position.get(job[1], len(position)))
+
+    def summary(self) -> List[str]:
+        lines = []
+        for account, counts in self.requests.items():
+            total = sum(counts.values())
+            seconds = self.account_seconds(account, counts)
+            lines.append(f"{account}: {total} requests, ~{seconds:.0f}s at {self.intervals[account]:.2f}s per request")
+            lines += [f"  {endpoint:<40} {counts[endpoint]:5d}" for endpoint in PLAN_ENDPOINTS if counts[endpoint]]
+        for slug, planned in self.lists.items():
+            state = "deferred" if slug in self.deferred else "planned"
+            lines.append(f"{slug:<40} {planned['account']:<10} {planned['requests']:4d} requests  {state}")
+        if self.available != float("inf"):
+            lines.append(f"Time available for Trakt requests: {self.available:.0f}s")
+        return lines
+
+
+def plan_requests(
+    config: Config,
+    accounts: Dict[str, TraktAccount],
+    jobs: List[Tuple[str, str, Optional[str], str]],
+    data: Dict[str, Any],
+    payloads: Dict[str, Any],
+    statuses: Dict[str, str],
+    available: float,
+) -> RequestPlan:
+    """Predict the requests of resolving and syncing every list still to do, and fit them in the time available.
+
+    Each account's lists are ordered cheapest first, so that the most lists are done if the run is cut
+    short. An account pacing its requests faster than its GET quota allows is slowed down to the quota, and
+    the most expensive lists that would not fit the time available are deferred to the next run.
+    """
+    cache = get_tracker_cache()
+    plan = RequestPlan(available, config.TRAKT_POST_INTERVAL)
+    for name, account in accounts.items():
+        counts: Counter = Counter()
+        if not account.token_recently_validated():
+            counts["GET /users/me"] += 1
+            counts["POST /oauth/token"] += 1
+        known = cache.get("lists", name, max_age=config.LIST_CACHE_TTL * 3600) if cache else None
+        if not (known and set(account.list_slugs) <= set(known["slugs"])):
+            counts["GET /users/me/lists"] += 1
+            counts["POST /users/me/lists"] += len(set(account.list_slugs) - set(known["slugs"])) if known else 0
+
+        fixed = Counter(counts)
+        searched: Set[Tuple[str, str]] = set()  # A title matched once is cached for the account's next lists
+        lists = []
+        for key, slug, media_type, owner in jobs:
+            if owner != name or statuses.get(slug) == "ok":
+                continue
+            list_requests: Counter = Counter()
+            payload = payloads.get(slug)
+            if payload is None:
+                types = (media_type,) if media_type else ("movie", "show")
+                batch = RankingBatch.from_rows(data.get(key) or [])
+                for index, title_slug in enumerate(batch.slugs):
+                    resolution = cached_resolution(batch.titles[index], title_slug, types)
+                    if resolution:
+                        batch.resolve(index, *resolution)
+                    elif (",".join(types), title_slug) not in searched:
+                        searched.add((",".join(types), title_slug))
+                        list_requests["GET /search"] += 1
+                payload = None if list_requests else batch.payload(types)
+            synced = cache.get("synced", slug) if cache and config.SYNC_ONLY_CHANGED else None
+            unchanged = payload is not None and synced and synced.get("sha256") == payload_digest(payload)
+            if not unchanged and (payload is None or any(payload.values())):
+                list_requests.update(LIST_UPDATE_REQUESTS)
+            lists.append((slug, list_requests))
+            counts.update(list_requests)
+
+        gets = sum(count for endpoint, count in counts.items() if endpoint.startswith("GET"))
+        interval = max(account.limiter.min_interval, config.PLAN_REQUEST_SECONDS / account.workers)
+        if gets > config.TRAKT_GET_QUOTA:
+            plan.pacing[name] = config.TRAKT_QUOTA_WINDOW / config.TRAKT_GET_QUOTA
+            interval = max(interval, plan.pacing[name])
+        plan.intervals[name] = interval
+
+        lists.sort(key=lambda entry: plan.account_seconds(name, entry[1]))
+        used = plan.account_seconds(name, fixed)
+        for slug, list_requests in lists:
+            seconds = plan.account_seconds(name, list_requests)
+            if used + seconds > available:
+                plan.deferred.append(slug)
+                counts.subtract(list_requests)
+            else:
+                used += seconds
+            plan.lists[slug] = {"account": name, "requests": sum(list_requests.values()), "seconds": seconds}
+        plan.requests[name] = +counts
+    return plan
+
+
+# ============================
+# CHECKPOINTS
+# ============================
+
+
+class RunCheckpoint:
+    """Per-run checkpoint artifacts, one JSON file per phase under `<base_dir>/<run_id>/`.
+
+    - scrape: {"data": scraped_data, "failed": [data keys that failed to scrape]}
+    - resolve: {list slug: Trakt payload}
+    - partial: [list slugs whose payload left out ranks for lack of time, resolved again by `resume`]
+    - sync: {list slug: "ok" | "partial" | "failed"}
+    """
+
+    PHASES = ("scrape", "resolve", "sync")
+
+    def __init__(self, base_dir: str, run_id: str):
+        self.base_dir = base_dir
+        self.run_id = run_id
+        self.run_dir = os.path.join(base_dir, run_id)
+
+    @classmethod
+    def latest(cls, base_dir: str) -> Optional["RunCheckpoint"]:
+        """Return the checkpoint of the most recent run, if any."""
+        if not os.path.isdir(base_dir):
+            return None
+        run_ids = sorted(name for name in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, name)))
+        return cls(base_dir, run_ids[-1]) if run_ids else None
+
+    def _path(self, phase: str) -> str:
+        return os.path.join(self.run_dir, f"{phase}.json")
+
+    def load(self, phase: str) -> Optional[Any]:
+        """Load the artifact of a phase, or None if the phase never wrote one."""
+        try:
+            with open(self._path(phase), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, phase: str, data: Any) -> None:
+        """Atomically write the artifact of a phase."""
+        os.makedirs(self.run_dir, exist_ok=True)
+        tmp_path = self._path(phase) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(phase))
+
+
+# ============================
+# RANKING HISTORY
+# ============================
+
+
+# Convert a scraped rank ("1", "10") to an integer, using the row position when it is not numeric
+def rank_to_int(rank: Union[str, int], position: int) -> int:
+    try:
+        return int(rank)
+    except (TypeError, ValueError):
+        return position
+
+
+class RankingStore:
+    """SQLite store of dated charts: one row per (service, section, date, rank).
+
+    A chart is only recorded in `charts` once all of its rows were written, in the same transaction,
+    so an interrupted write is simply redone.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS charts (
+            service TEXT NOT NULL,
+            section TEXT NOT NULL,
+            chart_date TEXT NOT NULL,
+            fetched_at TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            PRIMARY KEY (service, section, chart_date)
+        );
+        CREATE TABLE IF NOT EXISTS rankings (
+            service TEXT NOT NULL,
+            section TEXT NOT NULL,
+            chart_date TEXT NOT NULL,
+            rank INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            slug TEXT NOT NULL,
+            PRIMARY KEY (service, section, chart_date, rank)
+        );
+        CREATE INDEX IF NOT EXISTS rankings_slug ON rankings (slug);
+        CREATE TABLE IF NOT EXISTS views (
+            name TEXT PRIMARY KEY,
+            body TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(self.SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def stored_dates(self, service: str, section: str) -> Set[str]:
+        """Return the dates for which a chart is already stored."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chart_date FROM charts WHERE service = ? AND section = ?", (service, section)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def write_chart(self, service: str, section: str, chart_date: str, rows: List[RankingRecord]) -> None:
+        """Replace the rows of a chart and mark it as stored."""
+        records = [
+            (service, section, chart_date, rank_to_int(rank, position), title, slug)
+            for position, (rank, title, slug) in enumerate(rows, 1)
+        ]
+        fetched_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM rankings WHERE service = ? AND section = ? AND chart_date = ?",
+                (service, section, chart_date),
+            )
+            self._conn.executemany("INSERT OR REPLACE INTO rankings VALUES (?, ?, ?, ?, ?, ?)", records)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO charts VALUES (?, ?, ?, ?, ?)",
+                (service, section, chart_date, fetched_at, len(records)),
+            )
+
+    def chart(self, service: str, section: str, chart_date: str) -> List[Tuple[int, str, str]]:
+        """Return the (rank, title, slug) rows of a stored chart."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT rank, title, slug FROM rankings WHERE service = ? AND section = ? AND chart_date = ? "
+                "ORDER BY rank",
+                (service, section, chart_date),
+            ).fetchall()
+
+    def all_rankings(self) -> List[Tuple[str, str, str, int, str, str]]:
+        """Return every stored (service, section, date, rank, title, slug) row, in chart order."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT service, section, chart_date, rank, title, slug FROM rankings "
+                "ORDER BY service, section, chart_date, rank"
+            ).fetchall()
+
+    def write_views(self, views: Dict[str, Any]) -> str:
+        """Replace all materialized views in one transaction, returning their build time."""
+        built_at = datetime.now(timezone.utc).isoformat(timespec="microseconds")
+        records = [(name, json.dumps(body, ensure_ascii=False)) for name, body in views.items()]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM views")
+            self._conn.executemany("INSERT INTO views VALUES (?, ?)", records)
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('views_built_at', ?)", (built_at,))
+        return built_at
+
+    def views_built_at(self) -> Optional[str]:
+        """Build time of the materialized views, None if they were never built."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'views_built_at'").fetchone()
+        return row[0] if row else None
+
+    def read_views(self) -> Dict[str, Any]:
+        with self._lock:
+            return {name: json.loads(body) for name, body in self._conn.execute("SELECT name, body FROM views")}
+
+
+# ============================
+# CHANGE FEED
+# ============================
+
+
+# Movements between two scrapes of a chart, matched by slug
+def chart_delta(previous: List[RankingRecord], current: List[RankingRecord]) -> Dict[str, Any]:
+    """Return the titles that entered, exited and moved between two charts.
+
+    Returns:
+        dict: {"entered": [{"rank", "title", "slug"}], "exited": [...with the old rank],
+               "moved": [{"slug", "title", "from", "to"}]}, in rank order
+    """
+    old = {slug: (rank_to_int(rank, position), title) for position, (rank, title, slug) in enumerate(previous, 1)}
+    new = {slug: (rank_to_int(rank, position), title) for position, (rank, title, slug) in enumerate(current, 1)}
+    return {
+        "entered": [
+            {"rank": rank, "title": title, "slug": slug} for slug, (rank, title) in new.items() if slug not in old
+        ],
+        "exited": [
+            {"rank": rank, "title": title, "slug": slug} for slug, (rank, title) in old.items() if slug not in new
+        ],
+        "moved": [
+            {"slug": slug, "title": title, "from": old[slug][0], "to": rank}
+            for slug, (rank, title) in new.items()
+            if slug in old and old[slug][0] != rank
+        ],
+    }
+
+
+class ChangeFeed:
+    """Append-only JSON-lines log of chart changes, addressed by byte offset.
+
+    Each line is one event {"run_id", "key", "at", "entered", "exited", "moved"}. Lines are only ever
+    appended, so the offset following an event stays valid forever: a reader saves it and later reads
+    the events appended since. A line without its trailing newline (an append in progress) is not read.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, events: List[Dict[str, Any]]) -> int:
+        """Append events in a single write, returning the offset after them."""
+        data = "".join(json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n" for event in events)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock, open(self.path, "ab") as f:
+            f.write(data.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+            return f.tell()
+
+    def read(self, offset: int = 0, limit: Optional[int] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield (next offset, event) for the events starting at offset, an offset a previous read returned.
+
+        An offset at or past the end of the feed yields nothing: no event was appended since.
+        """
+        if offset >= self.size():
+            return
+        with open(self.path, "rb") as f:
+            if offset:
+                f.seek(offset - 1)
+                if f.read(1) != b"\n":
+                    raise ValueError(f"Offset {offset} is not the start of an event in {self.path}")
+            for count, line in enumerate(iter(f.readline, b"")):
+                if not line.endswith(b"\n") or (limit is not None and count >= limit):
+                    return
+                offset += len(line)
+                yield offset, json.loads(line)
+
+    def size(self) -> int:
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def merge(self, content: bytes) -> int:
+        """Merge the feed of another runner (from a state bundle), returning how many events it added here.
+
+        Runners import the bundle before appending, so one feed is usually a prefix of the other and the
+        longer one is kept. Feeds that diverged keep the other runner's lines as they are, so that offsets
+        saved from it stay valid, followed by the events only this feed has.
+        """
+        content = content[: content.rfind(b"\n") + 1]
+        with self._lock:
+            local = b""
+            if os.path.exists(self.path):
+                with open(self.path, "rb") as f:
+                    local = f.read()
+            local = local[: local.rfind(b"\n") + 1]
+            if local.startswith(content):
+                return 0
+            if content.startswith(local):
+                merged, added = content, content[len(local) :].count(b"\n")
+            else:
+                theirs = {self._event_id(line) for line in content.splitlines()}
+                ours = {self._event_id(line) for line in local.splitlines()}
+                own = [line for line in local.splitlines(keepends=True) if self._event_id(line) not in theirs]
+                merged, added = content + b"".join(own), len(theirs - ours)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(merged)
+            os.replace(tmp_path, self.path)
+        return added
+
+    @staticmethod
+    def _event_id(line: bytes) -> Tuple[str, str]:
+        event = json.loads(line)
+        return event["run_id"], event["key"]
+
+
+# Compute the change events of a run against the last scrape of each chart, and remember this scrape
+def chart_changes(run_id: str, data: Dict[str, Any], skip: Set[str]) -> List[Dict[str, Any]]:
+    cache = get_tracker_cache()
+    at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    events = []
+    for key, rows in data.items():
+        if key in skip or not rows:
+            continue  # A failed scrape is not a chart where every title exited
+        previous = cache.get("charts", key) if cache else None
+        delta = chart_delta([tuple(row) for row in previous["rows"]] if previous else [], rows)
+        if cache:
+            cache.put("charts", key, rows=[list(row) for row in rows])
+        if any(delta.values()):
+            events.append({"run_id": run_id, "key": key, "at": at, **delta})
+    return events
+
+
+# ============================
+# PUBLISH SCHEDULE
+# ============================
+# The times at which a service's chart rows change are kept in the tracker cache. Their circular mean and
+# spread over the day give the service's publish window, and runs are scheduled shortly after the windows.
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def publish_window(times: List[float]) -> Optional[Tuple[int, int]]:
+    """Return the (center, half width) in UTC minutes of the day of publish times, None without history.
+
+    The center is the circular mean, so publishes around midnight do not average to noon. The half width
+    is the circular standard deviation, at least 15 minutes.
+    """
+    if not times:
+        return None
+    angles = [2 * math.pi * (t % 86400) / 86400 for t in times]
+    x = sum(math.cos(angle) for angle in angles) / len(angles)
+    y = sum(math.sin(angle) for angle in angles) / len(angles)
+    center = round((math.atan2(y, x) % (2 * math.pi)) / (2 * math.pi) * MINUTES_PER_DAY) % MINUTES_PER_DAY
+    resultant = min(1.0, math.hypot(x, y))
+    spread = math.sqrt(-2 * math.log(resultant)) / (2 * math.pi) * MINUTES_PER_DAY if resultant > 0 else 720
+    return center, max(15, round(spread))
+
+
+def predicted_windows(cache: TrackerCache) -> Dict[str, Dict[str, Any]]:
+    """Publish window and suggested fetch time (UTC minutes of the day) of every service with history."""
+    windows = {}
+    for service, entry in sorted(cache.data["publish"].items()):
+        window = publish_window(entry["times"])
+        if window is None:
+            continue
+        center, half_width = window
+        fetch_at = (center + half_width + config.PUBLISH_DELAY) % MINUTES_PER_DAY
+        windows[service] = {
+            "samples": len(entry["times"]),
+            "center": center,
+            "half_width": half_width,
+            "fetch_at": -(-fetch_at // 5) * 5 % MINUTES_PER_DAY,  # Rounded up to 5 minutes
+        }
+    return windows
+
+
+def cron_schedule(windows: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Cron lines (UTC) running once after each distinct publish window."""
+    return [f"{minute % 60} {minute // 60} * * *" for minute in sorted({w["fetch_at"] for w in windows.values()})]
 
 
-# Check necessary lists
-def check_lists(config: Config) -> bool:
-    """Check if lists exist, create them if they don't.
+def print_schedule(cache: Optional[TrackerCache]) -> int:
+    """Print the learned publish windows and the cron schedule that follows them."""
+    windows = predicted_windows(cache) if cache else {}
+    if not windows:
+        logging.error("No publish history yet, it is learned from the chart changes seen by runs and checks")
+        return 1
+
+    def clock(minute: int) -> str:
+        return f"{minute // 60:02d}:{minute % 60:02d}"
+
+    for service, window in windows.items():
+        print(
+            f"{service:<12} publishes {clock(window['center'])} UTC ± {window['half_width']} min "
+            f"({window['samples']} changes seen), fetch at {clock(window['fetch_at'])}"
+        )
+    for line in cron_schedule(windows):
+        print(f"cron: '{line}'")
+    return 0
+
+
+def charts_changed(tracker: "StreamingServiceTracker") -> bool:
+    """Fetch the chart pages and tell whether any chart differs from the one the last run scraped.
+
+    Costs one GET per page and no Trakt call. Unchanged pages are not even parsed (tracker cache). A last
+    run that did not sync every list counts as a change, so its lists are retried even if no chart moved.
+    The scraped charts are kept on the tracker, whose run then does not fetch the pages again.
+    """
+    cache = get_tracker_cache()
+    if cache is None:
+        return True
+    last_run = cache.get("runs", "last")
+    if last_run and not last_run["complete"]:
+        logging.info(f"Last run {last_run['run_id']} did not update every list, running again")
+        return True
+    changed = []
+    data = tracker._scrape_all_services()
+    for key, rows in data.items():
+        previous = cache.get("charts", key)
+        if key in tracker._failed_services or previous is None or as_records(previous["rows"]) != as_records(rows):
+            changed.append(key)
+    tracker._prescraped = {"data": data, "failed": sorted(tracker._failed_services)}
+    tracker._failed_services = set()
+    if changed:
+        logging.info(f"Charts changed since the last run: {', '.join(changed)}")
+    else:
+        logging.info("No chart changed since the last run")
+    return bool(changed)
+
+
+# ============================
+# BACKFILL
+# ============================
+
+
+class PolitenessLimiter:
+    """Enforce a minimum interval between the starts of requests to the same host."""
+
+    def __init__(
+        self,
+        min_interval: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleeper: Callable[[float], None] = time.sleep,
+    ):
+        self.min_interval = min_interval
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._clock = clock
+        self._sleeper = sleeper
+
+    def wait(self, url: str) -> None:
+        host = urlparse(url).netloc
+        with self._lock:
+            now = self._clock()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            with trace_span("rate limit wait", "wait", host=host):
+                self._sleeper(slot - now)
+
+    def idle(self, url: str) -> bool:
+        """Whether no request to the host of url is waiting for, or holding, the current slot."""
+        with self._lock:
+            return self._next_slot.get(urlparse(url).netloc, 0.0) <= self._clock()
+
+
+def date_range(start: str, end: str) -> Iterator[str]:
+    """Yield every date from start to end (inclusive, YYYY-MM-DD), most recent first."""
+    current, first = date.fromisoformat(end), date.fromisoformat(start)
+    while current >= first:
+        yield current.isoformat()
+        current -= timedelta(days=1)
+
+
+def backfill_tasks(
+    store: RankingStore, charts: List[Tuple[str, str]], start: str, end: str
+) -> Iterator[Tuple[str, str, List[str]]]:
+    """Yield (service, date, sections) for every dated page that still has charts to store."""
+    sections_by_service: Dict[str, List[str]] = {}
+    for service, section in charts:
+        sections_by_service.setdefault(service, []).append(section)
+    stored = {(service, section): store.stored_dates(service, section) for service, section in charts}
+
+    for chart_date in date_range(start, end):
+        for service, sections in sections_by_service.items():
+            missing = [section for section in sections if chart_date not in stored[(service, section)]]
+            if missing:
+                yield service, chart_date, missing
+
+
+def backfill(
+    store: RankingStore,
+    config: Config,
+    start: str,
+    end: Optional[str] = None,
+    charts: Optional[List[Tuple[str, str]]] = None,
+) -> Dict[str, int]:
+    """Fetch and store dated FlixPatrol charts between start and end (inclusive).
+
+    Pages whose charts are all stored are skipped, so an interrupted backfill resumes where it stopped.
+    Each dated page is fetched once for all of its missing sections and its rows are written as soon as
+    the page has been read; at most BACKFILL_CONCURRENCY pages are in flight at any time. A section with
+    no rows on its page is counted as missing and not stored, so the next backfill fetches it again.
 
-    Args:
-        config: The configuration object containing account credentials
     Returns:
-        bool: True if any error occurred, False otherwise
+        Dict[str, int]: Counts of fetched pages, stored charts, missing charts and failed pages
     """
-    error_create = False
+    end = end or config.yesterday_date
+    charts = charts or config.backfill_charts
+    limiter = PolitenessLimiter(config.BACKFILL_MIN_INTERVAL)
+    counts = {"pages": 0, "charts": 0, "missing": 0, "failed": 0}
+
+    parser = PageParser.from_config(config) if config.PARSE_PROCESSES > 0 else None
+
+    def run_task(service: str, chart_date: str, sections: List[str]) -> Tuple[int, int]:
+        url = config.dated_url(service, chart_date)
+        titles = {config.sections[section]: section for section in sections}
+        rows: Dict[str, List[RankingRecord]] = {title: [] for title in titles}
+        limiter.wait(url)
+        if parser is not None:
+            # This thread only downloads the page, the parse runs in a parser process
+            response = fetch_page(url)
+            if response.status_code != 200:
+                raise requests.exceptions.HTTPError(f"status code: {response.status_code}", response=response)
+            rows = parser.parse(response.content, list(titles), url)
+        else:
+            for section_title, row in iter_top10_rows(url, list(titles)):
+                rows[section_title].append(row)
+        stored = [(section, rows[title]) for title, section in titles.items() if rows.get(title)]
+        for section, section_rows in stored:
+            store.write_chart(service, section, chart_date, section_rows)
+        missing = sorted(set(sections) - {section for section, _ in stored})
+        if missing:
+            logging.warning(f"No {', '.join(missing)} chart on {url}, not storing it")
+        return len(stored), len(missing)
+
+    tasks = backfill_tasks(store, charts, start, end)
+    try:
+        max_in_flight = max(1, config.BACKFILL_CONCURRENCY) * 2
+        with ThreadPoolExecutor(max_workers=max(1, config.BACKFILL_CONCURRENCY), thread_name_prefix="backfill") as pool:
+            in_flight: Dict[Future, Tuple[str, str]] = {}
+            exhausted = False
+            while in_flight or not exhausted:
+                while not exhausted and len(in_flight) < max_in_flight:
+                    task = next(tasks, None)
+                    if task is None:
+                        exhausted = True
+                        break
+                    in_flight[pool.submit(run_task, *task)] = task[:2]
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    service, chart_date = in_flight.pop(future)
+                    counts["pages"] += 1
+                    try:
+                        stored, missing = future.result()
+                        counts["charts"] += stored
+                        counts["missing"] += missing
+                    except Exception as e:
+                        counts["failed"] += 1
+                        logging.error(f"Backfill of {service} {chart_date} failed: {e}")
+                if counts["pages"] % 50 == 0:
+                    logging.info(f"Backfill progress: {counts}")
+    finally:
+        if parser is not None:
+            parser.close()
+
+    logging.info(
+        f"Backfill finished: {counts['charts']} charts stored, {counts['missing']} missing, "
+        f"{counts['failed']} pages failed"
+    )
+    return counts
+
+
+# ============================
+# QUERY SERVICE
+# ============================
+# Views over the ranking history are materialized after each run and backfill. The read-only HTTP
+# service only serves them from memory, behind an LRU cache of encoded responses with ETags.
+
+
+# Date of the chart shown on a FlixPatrol page: the date in a dated URL, otherwise today
+def chart_date_of(url: str) -> str:
+    match = re.search(r"/(\d{4}-\d{2}-\d{2})/?$", url)
+    return match.group(1) if match else date.today().isoformat()
+
 
-    # Check Netflix lists
-    netflix_lists = get_lists(config.NETFLIX_CLIENT_ID, config.NETFLIX_ACCESS_TOKEN)
-    netflix_slugs = [list["ids"]["slug"] for list in netflix_lists]
-    logging.debug(f"Netflix lists slugs: {netflix_slugs}")
+def build_views(store: RankingStore) -> Dict[str, Any]:
+    """Precompute the documents served by the query service from the stored rankings.
 
-    if trakt_netflix_movies_list_slug not in netflix_slugs:
-        error_create = create_list(
-            trakt_netflix_movies_list_data, config.NETFLIX_CLIENT_ID, config.NETFLIX_ACCESS_TOKEN
+    - latest: {service: {section: {"date", "rows"}}} with the most recent chart of every section
+    - history/<service>/<section>: [{"date", "rows"}] in date order
+    - titles: {slug: title} of every title ever ranked
+    - titles/<slug>: {"slug", "title", "appearances": [{"service", "section", "date", "rank"}]}
+    """
+    history: Dict[Tuple[str, str], Dict[str, List[Dict[str, Any]]]] = {}
+    titles: Dict[str, Dict[str, Any]] = {}
+    for service, section, chart_date, rank, title, slug in store.all_rankings():
+        history.setdefault((service, section), {}).setdefault(chart_date, []).append(
+            {"rank": rank, "title": title, "slug": slug}
         )
-    if trakt_netflix_shows_list_slug not in netflix_slugs:
-        error_create = create_list(trakt_netflix_shows_list_data, config.NETFLIX_CLIENT_ID, config.NETFLIX_ACCESS_TOKEN)
-
-    # Check Prime Video lists
-    prime_lists = get_lists(config.PRIME_CLIENT_ID, config.PRIME_ACCESS_TOKEN)
-    prime_slugs = [list["ids"]["slug"] for list in prime_lists]
-    logging.debug(f"Prime Video lists slugs: {prime_slugs}")
-
-    if trakt_prime_movies_list_slug not in prime_slugs:
-        error_create = create_list(trakt_prime_movies_list_data, config.PRIME_CLIENT_ID, config.PRIME_ACCESS_TOKEN)
-    if trakt_prime_shows_list_slug not in prime_slugs:
-        error_create = create_list(trakt_prime_shows_list_data, config.PRIME_CLIENT_ID, config.PRIME_ACCESS_TOKEN)
-
-    # Check jiohotstar and Zee5 lists
-    others_lists = get_lists(config.OTHERS_CLIENT_ID, config.OTHERS_ACCESS_TOKEN)
-    others_slugs = [list["ids"]["slug"] for list in others_lists]
-    logging.debug(f"Others lists slugs: {others_slugs}")
-
-    if trakt_zee5_list_slug not in others_slugs:
-        error_create = create_list(trakt_zee5_top_list_data, config.OTHERS_CLIENT_ID, config.OTHERS_ACCESS_TOKEN)
-    if trakt_jiohotstar_list_slug not in others_slugs:
-        error_create = create_list(trakt_jiohotstar_top_list_data, config.OTHERS_CLIENT_ID, config.OTHERS_ACCESS_TOKEN)
-    # if trakt_prime_shows_list_slug not in lists_slugs:
-    #     error_create = create_list(trakt_prime_shows_list_data)
-    logging.debug("Lists checked!")
-    return error_create
+        entry = titles.setdefault(slug, {"slug": slug, "title": title, "appearances": []})
+        entry["appearances"].append({"service": service, "section": section, "date": chart_date, "rank": rank})
+
+    views: Dict[str, Any] = {"latest": {}, "titles": {slug: entry["title"] for slug, entry in titles.items()}}
+    for (service, section), charts in history.items():
+        views[f"history/{service}/{section}"] = [{"date": day, "rows": rows} for day, rows in charts.items()]
+        latest = max(charts)
+        views["latest"].setdefault(service, {})[section] = {"date": latest, "rows": charts[latest]}
+    for slug, entry in titles.items():
+        views[f"titles/{slug}"] = entry
+    return views
+
+
+def materialize_views(store: RankingStore) -> None:
+    """Rebuild and store the query service views."""
+    views = build_views(store)
+    store.write_views(views)
+    logging.info(f"Materialized {len(views)} ranking views")
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache with a fixed number of entries."""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class RankingQueryService:
+    """Answers ranking queries from the materialized views, reloading them when a run rebuilt them.
+
+    Routes:
+        /latest, /latest/<service>
+        /history/<service>/<section>?from=YYYY-MM-DD&to=YYYY-MM-DD
+        /titles?q=<text>, /titles/<slug>
+    """
 
+    def __init__(self, store: RankingStore, cache_size: int = 512, reload_interval: float = 30.0):
+        self.store = store
+        self.reload_interval = reload_interval
+        self.cache = LRUCache(cache_size)
+        self.built_at: Optional[str] = None
+        self._views: Dict[str, Any] = {}
+        self._history_dates: Dict[str, List[str]] = {}
+        self._checked_at = 0.0
+        self._reload_lock = threading.Lock()
+        self.reload()
+
+    def reload(self) -> bool:
+        """Load the views if they were rebuilt since the last load; returns True if they were."""
+        with self._reload_lock:
+            self._checked_at = time.monotonic()
+            built_at = self.store.views_built_at()
+            if built_at == self.built_at:
+                return False
+            views = self.store.read_views()
+            self._history_dates = {
+                name: [chart["date"] for chart in body] for name, body in views.items() if name.startswith("history/")
+            }
+            self._views, self.built_at = views, built_at
+            self.cache.clear()
+            logging.info(f"Loaded {len(views)} ranking views built at {built_at}")
+            return True
+
+    def get(self, path: str, params: Dict[str, str]) -> Tuple[int, bytes, str]:
+        """Return the (status, JSON body, ETag) of a query."""
+        if time.monotonic() - self._checked_at > self.reload_interval:
+            self.reload()
+        key = (path.rstrip("/") or "/", tuple(sorted(params.items())))
+        response = self.cache.get(key)
+        if response is None:
+            status, document = self._route(key[0], params)
+            body = json.dumps(document, ensure_ascii=False).encode("utf-8")
+            response = (status, body, f'"{hashlib.sha1(body).hexdigest()}"')
+            self.cache.put(key, response)
+        return response
 
-# Search movies or shows by title and type
-def search_title_by_type(title_info: Tuple[str, str], type: str) -> List[int]:
-    title = title_info[0].replace("&", "and")
-    title_tag = title_info[1]
+    def _route(self, path: str, params: Dict[str, str]) -> Tuple[int, Any]:
+        parts = [part for part in path.split("/") if part]
+        if not parts:
+            charts = sorted(name[len("history/") :] for name in self._history_dates)
+            return 200, {"built_at": self.built_at, "charts": charts}
+        if parts[0] == "latest" and len(parts) <= 2:
+            latest = self._views.get("latest", {})
+            if len(parts) == 1:
+                return 200, latest
+            return (200, latest[parts[1]]) if parts[1] in latest else (404, {"error": f"unknown service {parts[1]}"})
+        if parts[0] == "history" and len(parts) == 3:
+            return self._history("/".join(parts), params)
+        if parts[0] == "titles" and len(parts) <= 2:
+            if len(parts) == 2:
+                entry = self._views.get(f"titles/{parts[1]}")
+                return (200, entry) if entry else (404, {"error": f"unknown title {parts[1]}"})
+            query = params.get("q", "").lower()
+            index = self._views.get("titles", {})
+            return 200, [{"slug": slug, "title": title} for slug, title in index.items() if query in title.lower()]
+        return 404, {"error": f"unknown path {path}"}
+
+    def _history(self, name: str, params: Dict[str, str]) -> Tuple[int, Any]:
+        charts, dates = self._views.get(name), self._history_dates.get(name)
+        if charts is None:
+            return 404, {"error": f"unknown chart {name[len('history/'):]}"}
+        try:
+            start = date.fromisoformat(params["from"]).isoformat() if "from" in params else None
+            end = date.fromisoformat(params["to"]).isoformat() if "to" in params else None
+        except ValueError as e:
+            return 400, {"error": f"invalid date: {e}"}
+        first = bisect.bisect_left(dates, start) if start else 0
+        last = bisect.bisect_right(dates, end) if end else len(dates)
+        return 200, charts[first:last]
+
+
+def make_query_handler(service: RankingQueryService) -> type:
+    """Build the request handler class serving the given query service."""
+
+    class QueryHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            status, body, etag = service.get(url.path, dict(parse_qsl(url.query)))
+            if status == 200 and self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logging.debug(f"{self.address_string()} {format % args}")
+
+    return QueryHandler
+
+
+def serve_rankings(config: Config) -> int:
+    """Serve the ranking views over HTTP until interrupted."""
+    store = RankingStore(config.RANKINGS_DB)
+    if store.views_built_at() is None:
+        materialize_views(store)
+    service = RankingQueryService(store, config.SERVE_CACHE_SIZE, config.SERVE_RELOAD_INTERVAL)
+    server = ThreadingHTTPServer((config.SERVE_HOST, config.SERVE_PORT), make_query_handler(service))
+    logging.info(f"Serving ranking history on http://{config.SERVE_HOST}:{server.server_port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        store.close()
+    return 0
 
-    response = requests.get(
-        f"https://api.trakt.tv/search/{type}?query={title}&extended=full",
-        headers=get_headers(),
-        timeout=REQUEST_TIMEOUT,
-    )
-    trakt_ids = []
-    if response.status_code == 200:
-        results = response.json()
-        logging.debug(f"Results: {results} for title: {title}")
-        for result in results:
-            logging.debug("Comparing " + title + " with: " + result[type]["title"].lower())
-            normalized_slug = result[type]["ids"]["slug"].replace("-", "")
-            normalized_title_tag = title_tag.replace("-", "")
-            if (
-                result["type"] == type
-                and result[type]["title"].lower() == title.lower()
-                and (normalized_title_tag in normalized_slug or normalized_title_tag.startswith(normalized_slug))
-                or (
-                    normalized_title_tag in normalized_slug
-                    or normalized_title_tag.startswith(normalized_slug)
-                    or normalized_slug.startswith(normalized_title_tag)
-                )
-            ):
-                trakt_ids.append(result[type]["ids"]["trakt"])
-                logging.debug(
-                    f"Added trakt id: {result[type]['ids']['trakt']} with slug {normalized_slug} for title: {title}"
-                )
-                break
-        if trakt_ids == []:
-            logging.warning(f"Title not found: {title}, will add first result : {results[0][type]['title']}")
-            trakt_ids.append(results[0][type]["ids"]["trakt"])
-    else:
-        logging.error(f"Error: {response.status_code}")
-    return trakt_ids
 
+# ============================
+# WORK QUEUE
+# ============================
 
-# Search movies and shows by title
-def search_title(title_info: Tuple[str, str, str]) -> List[Tuple[str, int, str]]:
-    title = title_info[0].replace("&", "and")
-    title_tag = title_info[1]
-    rank = title_info[2]
 
-    response = requests.get(
-        f"https://api.trakt.tv/search/movie,show?query={title}&extended=full",
-        headers=get_headers(),
-        timeout=REQUEST_TIMEOUT,
-    )
-    trakt_info = []
-    if response.status_code == 200:
-        results = response.json()
-        logging.debug(f"Results: {results} for title: {title}")
-        for result in results:
-            type = result["type"]
-            normalized_slug = result[type]["ids"]["slug"].replace("-", "")
-            normalized_title_tag = title_tag.replace("-", "")
-            logging.debug(
-                "Comparing "
-                + title
-                + " and tag "
-                + normalized_title_tag
-                + " with: "
-                + result[type]["title"].lower()
-                + " and slug "
-                + normalized_slug
+class WorkQueue:
+    """Durable task queue in a SQLite file shared by a coordinator and any number of worker processes.
+
+    A worker claims a pending task with a lease and heartbeats while working on it. A lease that runs out
+    (the worker crashed or hung) puts the task back to pending, until it was claimed WORK_MAX_ATTEMPTS times.
+    Tasks are identified by (run ID, kind, name), so re-enqueueing a task of the same run resets it. Only
+    tasks of the latest run are claimed; the pending tasks of older runs, and those left when a run gives up
+    waiting, are cancelled.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            run_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            name TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            state TEXT NOT NULL,
+            worker TEXT,
+            lease_until REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            PRIMARY KEY (run_id, kind, name)
+        );
+        CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, kind);
+    """
+
+    def __init__(self, path: str, lease: float = 60.0, max_attempts: int = 3, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self._clock = clock
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.executescript(self.SCHEMA)
+
+    @classmethod
+    def from_config(cls, config: Config) -> "WorkQueue":
+        return cls(config.WORK_QUEUE, config.WORK_LEASE, config.WORK_MAX_ATTEMPTS)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Serialize writers across processes: BEGIN IMMEDIATE takes the database write lock up front."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, run_id: str, kind: str, name: str, payload: Dict[str, Any]) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO tasks (run_id, kind, name, payload, state) VALUES (?, ?, ?, ?, 'pending') "
+                "ON CONFLICT (run_id, kind, name) DO UPDATE SET payload = excluded.payload, state = 'pending', "
+                "worker = NULL, lease_until = NULL, attempts = 0, result = NULL",
+                (run_id, kind, name, json.dumps(payload)),
             )
-            if (
-                result[type]["title"].lower() == title.lower()
-                and (normalized_title_tag in normalized_slug or normalized_title_tag.startswith(normalized_slug))
-                or (normalized_title_tag in normalized_slug or normalized_title_tag.startswith(normalized_slug))
-            ):
-                trakt_info.append((type, result[type]["ids"]["trakt"], rank))
-                logging.debug(
-                    f"Added trakt id: {result[type]['ids']['trakt']} with slug {normalized_slug} for title: {title}"
-                )
-                break
-        if trakt_info == []:
-            type_0 = results[0]["type"]
-            logging.warning(f"Title not found: {title}, will add first result : {results[0][type_0]['title']}")
-            trakt_info.append((type_0, results[0][type_0]["ids"]["trakt"], rank))
-    else:
-        logging.error(f"Error: {response.status_code}")
-    return trakt_info
 
+    def claim(self, worker: str, kinds: Tuple[str, ...] = ("scrape", "sync")) -> Optional[Dict[str, Any]]:
+        """Lease the oldest pending task of the given kinds of the latest run to a worker, None if there is none."""
+        now = self._clock()
+        with self._transaction() as conn:
+            self._requeue_expired(conn, now)
+            # Run IDs are timestamps, so the greatest one is the latest run
+            latest = conn.execute("SELECT MAX(run_id) FROM tasks").fetchone()[0]
+            superseded = conn.execute(
+                "UPDATE tasks SET state = 'cancelled', result = '\"superseded by a newer run\"' "
+                "WHERE state = 'pending' AND run_id < ?",
+                (latest,),
+            ).rowcount
+            if superseded:
+                logging.warning(f"Cancelled {superseded} pending tasks of runs older than {latest}")
+            row = conn.execute(
+                f"SELECT run_id, kind, name, payload, attempts FROM tasks WHERE state = 'pending' AND run_id = ? "
+                f"AND kind IN ({', '.join('?' * len(kinds))}) ORDER BY rowid LIMIT 1",
+                (latest, *kinds),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE tasks SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 "
+                "WHERE run_id = ? AND kind = ? AND name = ?",
+                (worker, now + self.lease, *row[:3]),
+            )
+        run_id, kind, name, payload, attempts = row
+        return {"run_id": run_id, "kind": kind, "name": name, "payload": json.loads(payload), "attempt": attempts + 1}
 
-# Create a Trakt list payload based on the top movies and shows list
-def create_type_trakt_list_payload(top_list: List[Tuple[str, str, str]], type: str) -> Dict[str, List[Dict[str, Any]]]:
-    # get titles from top_list
-    titles_info = [(title, title_tag) for _, title, title_tag in top_list]
+    def heartbeat(self, task: Dict[str, Any], worker: str) -> bool:
+        """Extend the lease of a task, False if the worker lost it."""
+        return self._finish_or_extend(task, worker, "lease_until = ?", (self._clock() + self.lease,))
 
-    # get trakt ids from titles
-    trakt_ids = []
-    for title_info in titles_info:
-        trakt_id = search_title_by_type(title_info, type)
-        if trakt_id:
-            trakt_ids.append(trakt_id[0])
+    def complete(self, task: Dict[str, Any], worker: str, result: Any) -> bool:
+        return self._finish_or_extend(task, worker, "state = 'done', result = ?", (json.dumps(result),))
 
-    # create the payload
-    payload = {f"{type}s": []}
-    for trakt_id in trakt_ids:
-        payload[f"{type}s"].append({"ids": {"trakt": trakt_id}})
+    def fail(self, task: Dict[str, Any], worker: str, error: str) -> bool:
+        """Give a task back: pending again if it has attempts left, failed otherwise."""
+        state = "pending" if task["attempt"] < self.max_attempts else "failed"
+        return self._finish_or_extend(
+            task, worker, "state = ?, worker = NULL, lease_until = NULL, result = ?", (state, json.dumps(error))
+        )
 
-    logging.debug(f"Payload: {payload}")
-    return payload
+    def _finish_or_extend(self, task: Dict[str, Any], worker: str, assignments: str, values: Tuple[Any, ...]) -> bool:
+        with self._transaction() as conn:
+            updated = conn.execute(
+                f"UPDATE tasks SET {assignments} WHERE run_id = ? AND kind = ? AND name = ? "
+                f"AND state = 'leased' AND worker = ?",
+                (*values, task["run_id"], task["kind"], task["name"], worker),
+            ).rowcount
+        return updated == 1
+
+    def cancel(self, run_id: str, kind: str, reason: str) -> int:
+        """Cancel the tasks of a run that are neither done nor failed, returning how many were cancelled.
+
+        A worker still busy with one of them loses its lease, and its result is not recorded.
+        """
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE tasks SET state = 'cancelled', worker = NULL, lease_until = NULL, result = ? "
+                "WHERE run_id = ? AND kind = ? AND state IN ('pending', 'leased')",
+                (json.dumps(reason), run_id, kind),
+            ).rowcount
+
+    def _requeue_expired(self, conn: sqlite3.Connection, now: float) -> None:
+        expired = conn.execute(
+            "SELECT run_id, kind, name, worker FROM tasks WHERE state = 'leased' AND lease_until < ?", (now,)
+        ).fetchall()
+        for run_id, kind, name, worker in expired:
+            logging.warning(f"Lease of {kind} task {name} held by {worker} expired, requeueing it")
+        conn.execute(
+            "UPDATE tasks SET state = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END, worker = NULL, "
+            "lease_until = NULL, result = CASE WHEN attempts < ? THEN result ELSE '\"lease expired\"' END "
+            "WHERE state = 'leased' AND lease_until < ?",
+            (self.max_attempts, self.max_attempts, now),
+        )
 
+    def requeue_expired(self) -> None:
+        with self._transaction() as conn:
+            self._requeue_expired(conn, self._clock())
+
+    def outstanding(self, run_id: str, kind: str) -> int:
+        """Number of tasks of a run that are neither done nor failed."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE run_id = ? AND kind = ? AND state IN ('pending', 'leased')",
+                (run_id, kind),
+            ).fetchone()[0]
+
+    def pending(self) -> int:
+        """Number of tasks of any run still to be done."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tasks WHERE state IN ('pending', 'leased')").fetchone()[0]
+
+    def results(self, run_id: str, kind: str) -> Dict[str, Tuple[str, Any]]:
+        """Return name -> (state, result) of the tasks of a run."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, state, result FROM tasks WHERE run_id = ? AND kind = ?", (run_id, kind)
+            ).fetchall()
+        return {name: (state, json.loads(result) if result else None) for name, state, result in rows}
+
+    def wait(self, run_id: str, kind: str, poll_interval: float) -> bool:
+        """Block until every task of a run is done or failed, False if the run deadline came first.
+
+        The tasks left when the deadline comes are cancelled, so no worker picks them up after the run ended.
+        """
+        budget = get_run_budget()
+        while True:
+            self.requeue_expired()
+            if not self.outstanding(run_id, kind):
+                return True
+            if not budget.sleep(poll_interval):
+                cancelled = self.cancel(run_id, kind, "run deadline reached")
+                logging.warning(f"Run deadline reached with {cancelled} {kind} tasks left, cancelled them")
+                return False
 
-# Create a mixed Trakt list payload based on an overral top movies and shows list
-def create_mixed_trakt_list_payload(top_list: List[Tuple[str, str, str]]) -> Dict[str, List[Dict[str, Any]]]:
-    # get titles from top_list
-    titles_info = [(title, title_tag, rank) for rank, title, title_tag in top_list]
-
-    # get trakt ids from titles
-    trakt_infos = []
-    for title_info in titles_info:
-        trakt_info = search_title(title_info)
-        logging.debug(f"Trakt info: {trakt_info}")
-        if trakt_info:
-            trakt_infos.append(trakt_info[0])
 
-    # create the payload
-    payload = {"movies": [], "shows": []}
-    for type, trakt_id, rank in trakt_infos:
-        payload[f"{type}s"].append({"ids": {"trakt": trakt_id}})
+class LeaseKeeper:
+    """Heartbeats the lease of a task from a background thread while the worker is busy with it."""
 
-    logging.debug(f"Payload: {payload}")
-    return payload
+    def __init__(self, queue: WorkQueue, task: Dict[str, Any], worker: str):
+        self.queue = queue
+        self.task = task
+        self.worker = worker
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{task['name']}", daemon=True)
 
+    def __enter__(self) -> "LeaseKeeper":
+        self._thread.start()
+        return self
 
-# Update a trakt list
-@retry_request
-def update_list(
-    list_slug: str,
-    payload: Dict[str, List[Dict[str, Any]]],
-    client_id: str = None,
-    access_token: str = None,
-) -> Union[requests.Response, int]:
-    """Update a list in Trakt.tv with new content.
+    def __exit__(self, *exc_info: Any) -> None:
+        self._stop.set()
+        self._thread.join()
 
-    Args:
-        list_slug: The slug of the list to update
-        payload: The content to update the list with
-        client_id: The Trakt.tv client ID for the appropriate account
-        access_token: The access token for the appropriate account
+    def _run(self) -> None:
+        while not self._stop.wait(self.queue.lease / 3):
+            if not self.queue.heartbeat(self.task, self.worker):
+                logging.warning(f"Lost the lease of {self.task['kind']} task {self.task['name']}")
+                self.lost = True
+                return
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def start_task_budget(config: Config, deadline: Optional[float]) -> RunBudget:
+    """Start the budget of a claimed task: RUN_DEADLINE from now, cut to the coordinator's deadline if sooner."""
+    budget = start_run_budget(config)
+    if deadline is not None:
+        left = deadline - time.time()
+        budget.seconds = min(budget.seconds, left) if budget.seconds else left
+    return budget
+
+
+def run_worker(config: Config, worker: Optional[str] = None, work_queue: Optional[WorkQueue] = None) -> int:
+    """Claim and run scrape and sync tasks until the queue stayed empty for WORK_IDLE_EXIT seconds.
+
+    Each task gets its own budget, so a long-lived worker times its requests against the run that
+    enqueued the task rather than against its own start.
+
+    Returns:
+        int: 0 once idle, 1 if any task failed in this worker
     """
-    # Empty the list only if payload is not empty
-    if payload.get("movies") or payload.get("shows"):
-        empty_list(list_slug, client_id, access_token)
-        logging.info(f"Updating list {list_slug} ...")
-        response = requests.post(
-            f"https://api.trakt.tv/users/me/lists/{list_slug}/items",
-            headers=get_headers(client_id, access_token),
-            json=payload,
-            timeout=REQUEST_TIMEOUT,
-        )
-        if response.status_code in [200, 201]:
-            logging.info("List updated successfully")
-        return response
-    else:
-        logging.warning("Payload is empty. No items to add on list " + list_slug)
-        return 304
+    worker = worker or default_worker_id()
+    work_queue = work_queue or WorkQueue.from_config(config)
+    tracker = StreamingServiceTracker(config)
+    validated: Set[str] = set()
+    failures = 0
+    hedged_run = None
+    idle_since = time.monotonic()
+    logging.info(f"Worker {worker} polling {work_queue.path}")
+    try:
+        while True:
+            task = work_queue.claim(worker)
+            if task is None:
+                if config.WORK_IDLE_EXIT and time.monotonic() - idle_since >= config.WORK_IDLE_EXIT:
+                    logging.info(f"Worker {worker} idle, exiting")
+                    return 1 if failures else 0
+                time.sleep(config.WORK_POLL_INTERVAL)
+                continue
+
+            deadline = task["payload"].get("deadline")
+            if deadline is not None and deadline <= time.time():
+                logging.warning(f"Deadline of run {task['run_id']} passed, cancelling its {task['kind']} tasks")
+                work_queue.cancel(task["run_id"], task["kind"], "run deadline reached")
+                continue
+            tracker._budget = start_task_budget(config, deadline)
+            if task["run_id"] != hedged_run:
+                # Hedges are capped per run, not per task, however many of the run's tasks this worker claims
+                start_hedged_run()
+                hedged_run = task["run_id"]
+            logging.info(f"Worker {worker} running {task['kind']} task {task['name']} (attempt {task['attempt']})")
+            with LeaseKeeper(work_queue, task, worker), trace_span(task["name"], task["kind"], worker=worker):
+                try:
+                    result = tracker._run_task(task, validated)
+                except Exception as e:
+                    result, error = None, str(e)
+                else:
+                    error = "no result"
+            if result is None:
+                failures += 1
+                logging.warning(f"{task['kind']} task {task['name']} failed: {error}")
+                work_queue.fail(task, worker, error)
+            else:
+                work_queue.complete(task, worker, result)
+            idle_since = time.monotonic()
+    finally:
+        for account in tracker.accounts.values():
+            account.close()
+        work_queue.close()
+
+
+# ============================
+# PROFILING
+# ============================
+
+
+# Before Python 3.12 a cProfile profiler only sees the thread that enabled it, so work handed to
+# worker threads during a phase is profiled per call (see profile_worker_call) and merged in
+_PROFILES_PER_THREAD = sys.version_info < (3, 12)
+_worker_profiles: Optional[List[cProfile.Profile]] = None
+_worker_profiles_lock = threading.Lock()
+
+
+def profile_worker_call(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Call func on a worker thread, adding its profile to the phase being profiled, if any."""
+    if not _PROFILES_PER_THREAD or _worker_profiles is None:
+        return func(*args, **kwargs)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profiler.disable()
+        with _worker_profiles_lock:
+            if _worker_profiles is not None:
+                _worker_profiles.append(profiler)
+
+
+class RunProfiler:
+    """Opt-in per-phase profiler for a tracker run.
+
+    Each phase wrapped with `phase()` gets its own cProfile `.prof` file and, when memory
+    profiling is enabled, a report of the top allocations made during the phase. All files are
+    written to `<base_dir>/<run_id>/`. When disabled, `phase()` returns a shared null context.
+    The profile covers the calls workers (account workers, fetch pool, title prefetch) make
+    during the phase as well as the calling thread.
+    """
+
+    TOP_ALLOCATIONS = 25
+
+    def __init__(self, enabled: bool, base_dir: str, run_id: str, memory: bool = False):
+        self.enabled = enabled
+        self.memory = memory
+        self.run_dir = os.path.join(base_dir, run_id)
+        self._phase_count = 0
+        self._timings: List[Tuple[str, float]] = []
+
+    @classmethod
+    def from_config(cls, config: Config, run_id: str) -> "RunProfiler":
+        return cls(config.PROFILE, config.PROFILE_DIR, run_id, memory=config.PROFILE_MEMORY)
+
+    def phase(self, name: str) -> contextlib.AbstractContextManager:
+        """Return a context manager profiling the given phase of the run."""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return self._profile_phase(name)
+
+    @contextlib.contextmanager
+    def _profile_phase(self, name: str) -> Iterator[None]:
+        os.makedirs(self.run_dir, exist_ok=True)
+        self._phase_count += 1
+        prefix = os.path.join(self.run_dir, f"{self._phase_count:02d}_{name}")
+
+        started_tracing = self.memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        global _worker_profiles
+        worker_profiles: List[cProfile.Profile] = []
+        with _worker_profiles_lock:
+            _worker_profiles = worker_profiles
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            with _worker_profiles_lock:
+                _worker_profiles = None
+            self._timings.append((name, time.perf_counter() - start))
+            stats = pstats.Stats(profiler)
+            for worker_profile in worker_profiles:
+                stats.add(worker_profile)
+            stats.dump_stats(f"{prefix}.prof")
+            if self.memory:
+                self._write_allocations(f"{prefix}.alloc.txt", tracemalloc.take_snapshot())
+                if started_tracing:
+                    tracemalloc.stop()
+            self._write_timings()
+            logging.debug(f"Profile for phase '{name}' written to {prefix}.prof")
+
+    def _write_allocations(self, path: str, snapshot: tracemalloc.Snapshot) -> None:
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        stats = snapshot.statistics("lineno")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"Top {self.TOP_ALLOCATIONS} allocations by line\n")
+            for stat in stats[: self.TOP_ALLOCATIONS]:
+                f.write(f"{stat}\n")
+            f.write(f"Total allocated: {sum(stat.size for stat in stats) / 1024:.1f} KiB\n")
+
+    def _write_timings(self) -> None:
+        with open(os.path.join(self.run_dir, "phases.txt"), "w", encoding="utf-8") as f:
+            for name, elapsed in self._timings:
+                f.write(f"{name}\t{elapsed:.3f}s\n")
+
+
+_NULL_CONTEXT = contextlib.nullcontext()
 
 
 # ============================
@@ -810,6 +4424,28 @@ class StreamingServiceTracker:
         self._headers_cache = None
         self._failed_services = set()  # Track failed services to avoid retrying
 
+        # Run identification and opt-in profiling
+        self.run_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self._profiler = RunProfiler.from_config(self.config, self.run_id)
+        self._budget = get_run_budget()
+        self._sync_statuses: Dict[str, str] = {}
+
+        # Trakt accounts, each with its own workers, rate limiter and tokens, and the lists they sync
+        self.accounts = TraktAccount.all_from_config(self.config)
+        self.list_jobs = list_jobs(self.config)
+
+        # Work queue that scrape and sync tasks go to when running as a coordinator
+        self.work_queue: Optional[WorkQueue] = None
+
+        # Background resolution of the other titles on the fetched pages (PREFETCH_TITLES)
+        self._prefetcher: Optional[TitlePrefetcher] = None
+
+        # Predicted Trakt requests of the run, ordering and deferring its lists (PLAN_REQUESTS)
+        self._plan: Optional[RequestPlan] = None
+
+        # Scrape state of a `check` made just before the run, so the run does not fetch the pages again
+        self._prescraped: Optional[Dict[str, Any]] = None
+
     def _init_list_data(self) -> None:
         """Initialize Trakt list data configurations."""
         # Netflix lists
@@ -836,23 +4472,76 @@ class StreamingServiceTracker:
             self._headers_cache = get_headers()
         return self._headers_cache
 
-    def run(self) -> int:
-        """Main execution method."""
+    def run(self, phases: Tuple[str, ...] = RunCheckpoint.PHASES, resume: bool = False) -> int:
+        """Main execution method.
+
+        Args:
+            phases: The phases to run ("scrape", "resolve", "sync")
+            resume: Continue the latest checkpointed run, redoing only failed scrapes and lists
+        """
         try:
             logging.info("Starting streaming service data update...")
+            if self.config.STATE_BUNDLE and os.path.exists(self.config.STATE_BUNDLE):
+                import_bundle(self.config, self.config.STATE_BUNDLE)
+            self._budget = start_run_budget(self.config)
+            start_hedged_run()
+            self._prefetcher = start_title_prefetcher(self.config)
+            if self._budget.seconds:
+                logging.info(f"Run deadline: {self._budget.seconds:.0f}s")
+            if self._profiler.enabled:
+                logging.info(f"Profiling enabled, writing reports to {self._profiler.run_dir}")
+
+            checkpoint = self._open_checkpoint(phases, resume)
+            if checkpoint is None:
+                return -1
 
             # Extract Movies and TV Shows
-            scraped_data = self._scrape_all_services()
+            scrape_state = checkpoint.load("scrape")
+            if "scrape" in phases:
+                with self._profiler.phase("scrape"), trace_span("scrape", "phase"):
+                    scrape_state = self._run_scrape_phase(checkpoint, scrape_state)
+            if scrape_state is None:
+                logging.error(f"No scraped data in checkpoint {checkpoint.run_id}, run the scrape phase first")
+                return -1
+            scraped_data = scrape_state["data"]
+            self._failed_services = set(scrape_state["failed"])
+            if "scrape" in phases and self.config.RECORD_RANKINGS:
+                self._record_rankings(scraped_data)
+            if "scrape" in phases:
+                self._publish_changes(scraped_data)
+                self._record_run(complete=False)
 
             if self.config.PRINT_LISTS:
                 self._print_scraped_data(scraped_data)
 
-            # Check Trakt token and lists
-            if not self._validate_trakt_setup():
-                return -1
-
-            # Update all lists
-            self._update_all_lists(scraped_data)
+            if "resolve" in phases or "sync" in phases:
+                # Predict the Trakt requests before making any, deferring what would not fit
+                payloads = checkpoint.load("resolve") or {}
+                if self.config.PLAN_REQUESTS:
+                    partial = set(checkpoint.load("partial") or [])
+                    complete = {slug: payload for slug, payload in payloads.items() if slug not in partial}
+                    self._plan = self._plan_requests(scraped_data, complete, checkpoint.load("sync") or {})
+
+                # Check Trakt token and lists
+                with self._profiler.phase("validate"), trace_span("validate", "phase"):
+                    valid = self._validate_trakt_setup()
+                if not valid:
+                    return -1
+                if self._prefetcher and "resolve" in phases and not (self._plan and self._plan.deferred):
+                    self._start_prefetch(scraped_data)
+
+                # Resolve titles into Trakt payloads and update all lists
+                if "resolve" in phases:
+                    with self._profiler.phase("resolve"), trace_span("resolve", "phase"):
+                        payloads = self._run_resolve_phase(checkpoint, scraped_data, payloads)
+                if "sync" in phases:
+                    with self._profiler.phase("sync"), trace_span("sync", "phase"):
+                        statuses = self._run_sync_phase(checkpoint, payloads)
+                    if not self._failed_services and all(statuses.get(job[1]) == "ok" for job in self.list_jobs):
+                        self._record_run(complete=True)
+
+            if self._prefetcher:
+                self._prefetcher.finish(self.config.PREFETCH_WAIT)
 
             # Report execution summary
             self._report_execution_summary(scraped_data)
@@ -863,19 +4552,92 @@ class StreamingServiceTracker:
         except Exception as e:
             logging.error(f"Error in main execution: {e}")
             return -1
+        finally:
+            if self._prefetcher:
+                self._prefetcher.stop()
+            for account in self.accounts.values():
+                account.close()
+            self._save_state()
+
+    def _save_state(self) -> None:
+        """Persist the tracker cache and export the state bundle, so the next runner starts warm."""
+        cache = get_tracker_cache()
+        if cache:
+            cache.save()
+        if self.config.STATE_BUNDLE:
+            try:
+                export_bundle(self.config, self.config.STATE_BUNDLE)
+            except (OSError, sqlite3.Error) as e:
+                logging.error(f"Could not export state bundle {self.config.STATE_BUNDLE}: {e}")
+
+    def _open_checkpoint(self, phases: Tuple[str, ...], resume: bool) -> Optional[RunCheckpoint]:
+        """Start a new checkpoint, or reopen the latest one when resuming or running later phases alone."""
+        if not resume and "scrape" in phases:
+            return RunCheckpoint(self.config.CHECKPOINT_DIR, self.run_id)
+
+        checkpoint = RunCheckpoint.latest(self.config.CHECKPOINT_DIR)
+        if checkpoint is None:
+            logging.error(f"No checkpoint found in {self.config.CHECKPOINT_DIR}")
+            return None
+        logging.info(f"Resuming run {checkpoint.run_id}")
+        self.run_id = checkpoint.run_id
+        return checkpoint
+
+    def _run_scrape_phase(self, checkpoint: RunCheckpoint, state: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Scrape all services, or only the ones that failed in the checkpointed run."""
+        if state is None:
+            if self._prescraped is not None:
+                state, self._prescraped = self._prescraped, None
+                checkpoint.save("scrape", state)
+                return state
+            self._failed_services = set()
+            scraped_data = self._scrape_all_services()
+            state = {"data": scraped_data, "failed": sorted(self._failed_services)}
+            checkpoint.save("scrape", state)
+            return state
+
+        retry = set(state["failed"])
+        if not retry:
+            logging.info("All services already scraped in checkpoint")
+            return state
+
+        logging.info(f"Retrying failed scrapes: {', '.join(sorted(retry))}")
+        self._failed_services = set()
+        state["data"].update(self._scrape_all_services(retry))
+        state["failed"] = sorted(self._failed_services)
+        checkpoint.save("scrape", state)
+
+        # Lists built from re-scraped data have to be resolved and synced again
+        stale_slugs = [slug for key, slug, _, _ in self.list_jobs if key in retry]
+        for phase in ("resolve", "sync"):
+            artifact = checkpoint.load(phase)
+            if artifact:
+                checkpoint.save(phase, {slug: v for slug, v in artifact.items() if slug not in stale_slugs})
+        return state
+
+    def _scraping_tasks(self, only: Optional[Set[str]] = None) -> List[Tuple[str, str, str]]:
+        """Return the (data key, service, section) scraping tasks, optionally limited to some data keys."""
+        return [task for task in self.config.scraping_tasks if only is None or task[0] in only]
+
+    def _scrape_all_services(self, only: Optional[Set[str]] = None) -> Dict[str, Any]:
+        """Scrape data from all streaming services with improved error handling.
+
+        Args:
+            only: Restrict scraping to these data keys (e.g. the ones that failed in a previous run)
+        """
+        if self.work_queue is not None:
+            return self._scrape_all_services_queued(only)
+        if self.config.STREAMING_PARSER:
+            return self._scrape_all_services_streaming(only)
+        if self.config.PARSE_PROCESSES > 0:
+            return self._scrape_all_services_parallel(only)
 
-    def _scrape_all_services(self) -> Dict[str, Any]:
-        """Scrape data from all streaming services with improved error handling."""
         scraped_data = {}
 
         # Define scraping tasks
         scraping_tasks = [
-            ("netflix_movies", self.config.urls["netflix"], self.config.sections["movies"]),
-            ("netflix_shows", self.config.urls["netflix"], self.config.sections["shows"]),
-            ("zee5_overall", self.config.urls["zee5"], self.config.sections["overall"]),
-            ("jiohotstar_overall", self.config.urls["jiohotstar"], self.config.sections["overall_jiohotstar"]),
-            ("prime_movies", self.config.urls["prime"], self.config.sections["movies"]),
-            ("prime_shows", self.config.urls["prime"], self.config.sections["shows"]),
+            (task_name, self.config.urls[service], self.config.sections[section])
+            for task_name, service, section in self._scraping_tasks(only)
         ]
 
         # Execute scraping tasks with error handling
@@ -895,6 +4657,169 @@ class StreamingServiceTracker:
 
         return scraped_data
 
+    def _scrape_all_services_queued(self, only: Optional[Set[str]] = None) -> Dict[str, Any]:
+        """Scrape all services by enqueueing one task per (service, section) and waiting for the workers."""
+        tasks = self._scraping_tasks(only)
+        for task_name, service, section in tasks:
+            payload = {
+                "url": self.config.urls[service],
+                "section": self.config.sections[section],
+                "deadline": self._task_deadline(),
+            }
+            self.work_queue.enqueue(self.run_id, "scrape", task_name, payload)
+        logging.info(f"Enqueued {len(tasks)} scrape tasks for run {self.run_id}")
+        self.work_queue.wait(self.run_id, "scrape", self.config.WORK_POLL_INTERVAL)
+
+        results = self.work_queue.results(self.run_id, "scrape")
+        scraped_data = {}
+        for task_name, _, _ in tasks:
+            state, result = results[task_name]
+            scraped_data[task_name] = result if state == "done" else []
+            if state != "done":
+                logging.warning(f"Failed to scrape {task_name}")
+                self._failed_services.add(task_name)
+        return scraped_data
+
+    def _task_deadline(self) -> Optional[float]:
+        """Wall-clock time at which the run deadline passes, sent with each queued task (None: no deadline)."""
+        return time.time() + self._budget.remaining() if self._budget.seconds else None
+
+    def _run_task(self, task: Dict[str, Any], validated: Set[str]) -> Any:
+        """Run a task claimed from the work queue, returning its JSON result or None if it failed."""
+        payload = task["payload"]
+        if task["kind"] == "scrape":
+            rows = scrape_top10(payload["url"], payload["section"])
+            return [list(row) for row in rows] if rows is not None else None
+
+        account = payload["account"]
+        if account not in validated:
+            # The coordinator validated the tokens, but this process may not have seen a refresh
+            if not self.accounts[account].validate():
+                return None
+            validated.add(account)
+        return self.accounts[account].submit(self._sync_list, task["name"], payload["payload"], account).result()
+
+    def _scrape_all_services_streaming(self, only: Optional[Set[str]] = None) -> Dict[str, Any]:
+        """Scrape all services with one streamed request per page, reading only the needed sections."""
+        scraped_data = {}
+
+        # Group tasks by page so that pages with several sections are only requested once
+        tasks_by_url: Dict[str, List[Tuple[str, str]]] = {}
+        for task_name, service, section in self._scraping_tasks(only):
+            tasks_by_url.setdefault(self.config.urls[service], []).append((task_name, self.config.sections[section]))
+
+        for url, tasks in tasks_by_url.items():
+            result = scrape_top10_streaming(url, [section for _, section in tasks])
+            for task_name, section in tasks:
+                scraped_data[task_name] = result[section] if result else []
+                if result is None:
+                    logging.warning(f"Failed to scrape {task_name}")
+                    self._failed_services.add(task_name)
+                else:
+                    logging.debug(f"Successfully scraped {task_name}: {len(result[section])} items")
+
+        return scraped_data
+
+    def _scrape_all_services_parallel(self, only: Optional[Set[str]] = None) -> Dict[str, Any]:
+        """Scrape all services with network threads that only fetch pages and a process pool that parses them."""
+        scraped_data = {}
+
+        tasks_by_url: Dict[str, List[Tuple[str, str]]] = {}
+        for task_name, service, section in self._scraping_tasks(only):
+            tasks_by_url.setdefault(self.config.urls[service], []).append((task_name, self.config.sections[section]))
+
+        sections_by_url = {url: [section for _, section in tasks] for url, tasks in tasks_by_url.items()}
+        results: Dict[str, Any] = {}
+        cache = get_tracker_cache()
+        conditional = (
+            {url: cache.conditional_headers(url, sections_by_url[url]) for url in tasks_by_url} if cache else {}
+        )
+        responses = fetch_pages(list(tasks_by_url), self.config.FETCH_WORKERS, conditional)
+        for url, response in responses.items():
+            if response is not None and response.status_code == 304 and cache:
+                cached = cache.page_sections(url, None, sections_by_url[url])
+                if cached is not None:
+                    logging.debug(f"Page {url} not modified, reusing parsed rows")
+                    results[url] = cached
+        pages = {url: r.content for url, r in responses.items() if r is not None and r.status_code == 200}
+        fetched = list(pages)
+        prefetcher = get_title_prefetcher()
+        if prefetcher:
+            for url in fetched:
+                prefetcher.harvest(url, pages[url])
+        digests = {url: hashlib.sha256(pages[url]).hexdigest() for url in fetched} if cache else {}
+        if cache:
+            for url in fetched:
+                cached = cache.page_sections(
+                    url, digests[url], sections_by_url[url], response_validators(responses[url])
+                )
+                if cached is not None:
+                    logging.debug(f"Page {url} unchanged, reusing parsed rows")
+                    results[url] = cached
+        to_parse = [url for url in fetched if url not in results]
+        parser = PageParser.from_config(self.config)
+        try:
+            jobs = [(pages[url], sections_by_url[url], url) for url in to_parse]
+            results.update(zip(to_parse, parser.parse_many(jobs)))
+        finally:
+            parser.close()
+        if cache:
+            for url in to_parse:
+                if results[url] and all(results[url].values()):
+                    cache.record_page(url, digests[url], results[url], response_validators(responses[url]))
+
+        for url, tasks in tasks_by_url.items():
+            result = results.get(url)
+            for task_name, section in tasks:
+                scraped_data[task_name] = result[section] if result else []
+                if result is None:
+                    logging.warning(f"Failed to scrape {task_name}")
+                    self._failed_services.add(task_name)
+                else:
+                    logging.debug(f"Successfully scraped {task_name}: {len(result[section])} items")
+
+        return scraped_data
+
+    def _record_rankings(self, data: Dict[str, Any]) -> None:
+        """Store the scraped charts in the ranking history and rebuild the query service views."""
+        charts = [
+            (self.config.chart_service(service), section, chart_date_of(self.config.urls[service]), data[key])
+            for key, service, section in self.config.scraping_tasks
+            if data.get(key) and key not in self._failed_services
+        ]
+        if not charts:
+            return
+        store = RankingStore(self.config.RANKINGS_DB)
+        try:
+            for service, section, chart_date, rows in charts:
+                store.write_chart(service, section, chart_date, rows)
+            materialize_views(store)
+        except sqlite3.Error as e:
+            logging.error(f"Could not record rankings in {self.config.RANKINGS_DB}: {e}")
+        finally:
+            store.close()
+
+    def _record_run(self, complete: bool) -> None:
+        """Remember whether the latest run synced every list, for `check` and `run --if-changed`."""
+        cache = get_tracker_cache()
+        if cache:
+            cache.put("runs", "last", run_id=self.run_id, complete=complete)
+
+    def _publish_changes(self, data: Dict[str, Any]) -> None:
+        """Remember the scraped charts and append what entered, exited or moved on them to the change feed."""
+        events = chart_changes(self.run_id, data, self._failed_services)
+        if not self.config.CHANGE_FEED:
+            return
+        if not events:
+            logging.info("No chart changes since the previous run")
+            return
+        try:
+            offset = ChangeFeed(self.config.CHANGE_FEED).append(events)
+        except OSError as e:
+            logging.error(f"Could not append to change feed {self.config.CHANGE_FEED}: {e}")
+            return
+        logging.info(f"Appended {len(events)} chart changes to {self.config.CHANGE_FEED} (offset {offset})")
+
     def _print_scraped_data(self, data: Dict[str, Any]) -> None:
         """Print all scraped data for debugging."""
         print_top_list("TOP Netflix Movies", data["netflix_movies"])
@@ -903,120 +4828,206 @@ class StreamingServiceTracker:
         print_top_list("TOP jiohotstar Overall", data["jiohotstar_overall"])
         print_top_list("TOP Amazon Prime Video Movies", data["prime_movies"])
         print_top_list("TOP Amazon Prime Video Shows", data["prime_shows"])
+        if "netflix_kids_movies" in data:
+            print_top_list("TOP Netflix Kids Movies", data["netflix_kids_movies"])
+            print_top_list("TOP Netflix Kids Shows", data["netflix_kids_shows"])
 
     def _validate_trakt_setup(self) -> bool:
         """Validate Trakt tokens and create necessary lists for all accounts."""
-        # Check Netflix account
-        netflix_result = check_token(
-            self.config.NETFLIX_CLIENT_ID,
-            self.config.NETFLIX_CLIENT_SECRET,
-            self.config.NETFLIX_ACCESS_TOKEN,
-            self.config.NETFLIX_REFRESH_TOKEN,
-        )
-        if netflix_result is True:
-            logging.info("Netflix Trakt token is valid")
-        elif isinstance(netflix_result, tuple):
-            new_access, new_refresh = netflix_result
-            if new_access and new_refresh:
-                logging.info("Netflix Trakt token refreshed successfully")
-                self.config.NETFLIX_ACCESS_TOKEN = new_access
-                self.config.NETFLIX_REFRESH_TOKEN = new_refresh
-            else:
-                logging.error("Failed to refresh Netflix Trakt token")
-                return False
-        else:
-            logging.error("Failed to validate Netflix Trakt token")
-            return False
-
-        # Check Prime Video account
-        prime_result = check_token(
-            self.config.PRIME_CLIENT_ID,
-            self.config.PRIME_CLIENT_SECRET,
-            self.config.PRIME_ACCESS_TOKEN,
-            self.config.PRIME_REFRESH_TOKEN,
-        )
-        if prime_result is True:
-            logging.info("Prime Video Trakt token is valid")
-        elif isinstance(prime_result, tuple):
-            new_access, new_refresh = prime_result
-            if new_access and new_refresh:
-                logging.info("Prime Video Trakt token refreshed successfully")
-                self.config.PRIME_ACCESS_TOKEN = new_access
-                self.config.PRIME_REFRESH_TOKEN = new_refresh
-            else:
-                logging.error("Failed to refresh Prime Video Trakt token")
-                return False
-        else:
-            logging.error("Failed to validate Prime Video Trakt token")
-            return False
-
-        # Check jiohotstar & Zee5 account
-        others_result = check_token(
-            self.config.OTHERS_CLIENT_ID,
-            self.config.OTHERS_CLIENT_SECRET,
-            self.config.OTHERS_ACCESS_TOKEN,
-            self.config.OTHERS_REFRESH_TOKEN,
-        )
-        if others_result is True:
-            logging.info("Others Trakt token is valid")
-        elif isinstance(others_result, tuple):
-            new_access, new_refresh = others_result
-            if new_access and new_refresh:
-                logging.info("Others Trakt token refreshed successfully")
-                self.config.OTHERS_ACCESS_TOKEN = new_access
-                self.config.OTHERS_REFRESH_TOKEN = new_refresh
-            else:
-                logging.error("Failed to refresh Others Trakt token")
+        # Check the tokens of all accounts in parallel
+        futures = {name: account.submit(account.validate) for name, account in self.accounts.items()}
+        for name, future in futures.items():
+            if not future.result():
                 return False
-        else:
-            logging.error("Failed to validate Others Trakt token")
-            return False
+            # Keep refreshed tokens in the configuration too
+            setattr(self.config, f"{name}_ACCESS_TOKEN", self.accounts[name].access_token)
+            setattr(self.config, f"{name}_REFRESH_TOKEN", self.accounts[name].refresh_token)
 
         # Check and create necessary lists for all accounts
-        if check_lists(self.config) is True:
+        if check_lists(self.config, self.accounts) is True:
             logging.error("Failed to create necessary lists")
             return False
 
         return True
 
-    def _update_all_lists(self, data: Dict[str, Any]) -> None:
-        """Update all Trakt lists with scraped data."""
-        # Update Netflix lists using Netflix account
-        logging.info("Updating Netflix lists...")
-        movies_update = create_type_trakt_list_payload(data["netflix_movies"], "movie")
-        shows_update = create_type_trakt_list_payload(data["netflix_shows"], "show")
-        update_list(
-            trakt_netflix_movies_list_slug,
-            movies_update,
-            self.config.NETFLIX_CLIENT_ID,
-            self.config.NETFLIX_ACCESS_TOKEN,
-        )
-        update_list(
-            trakt_netflix_shows_list_slug, shows_update, self.config.NETFLIX_CLIENT_ID, self.config.NETFLIX_ACCESS_TOKEN
-        )
-
-        # Update Prime Video lists using Prime account
-        logging.info("Updating Prime Video lists...")
-        prime_movies_update = create_type_trakt_list_payload(data["prime_movies"], "movie")
-        prime_shows_update = create_type_trakt_list_payload(data["prime_shows"], "show")
-        update_list(
-            trakt_prime_movies_list_slug,
-            prime_movies_update,
-            self.config.PRIME_CLIENT_ID,
-            self.config.PRIME_ACCESS_TOKEN,
-        )
-        update_list(
-            trakt_prime_shows_list_slug, prime_shows_update, self.config.PRIME_CLIENT_ID, self.config.PRIME_ACCESS_TOKEN
-        )
-
-        # Update jiohotstar and Zee5 lists using Others account
-        logging.info("Updating jiohotstar and Zee5 lists...")
-        zee5_update = create_mixed_trakt_list_payload(data["zee5_overall"])
-        jiohotstar_update = create_mixed_trakt_list_payload(data["jiohotstar_overall"])
-        update_list(trakt_zee5_list_slug, zee5_update, self.config.OTHERS_CLIENT_ID, self.config.OTHERS_ACCESS_TOKEN)
-        update_list(
-            trakt_jiohotstar_list_slug, jiohotstar_update, self.config.OTHERS_CLIENT_ID, self.config.OTHERS_ACCESS_TOKEN
-        )
+    def plan(self) -> int:
+        """Dry run: scrape the charts and print the Trakt requests a run would make, without calling Trakt.
+
+        The scrape works on copies of the caches, so page digests, publish times and parse strategies seen
+        by the plan are not saved, and neither the cache nor the state bundle is written.
+
+        Returns 1 when the plan defers lists because they would not fit the run deadline, 0 otherwise.
+        """
+        with scratch_state():
+            self._budget = start_run_budget(self.config)
+            plan = self._plan_requests(self._scrape_all_services(), {}, {}, apply=False)
+        for line in plan.summary():
+            print(line)
+        return 1 if plan.deferred else 0
+
+    def _plan_requests(
+        self, data: Dict[str, Any], payloads: Dict[str, Any], statuses: Dict[str, str], apply: bool = True
+    ) -> RequestPlan:
+        """Plan the Trakt requests of the run in the time left, pacing the accounts that need it when applied."""
+        available = self._budget.remaining() - self._budget.reserve if self._budget.seconds else float("inf")
+        plan = plan_requests(self.config, self.accounts, self.list_jobs, data, payloads, statuses, max(0.0, available))
+        total = sum(sum(counts.values()) for counts in plan.requests.values())
+        log_event("plan.built", requests=total, lists=len(plan.lists), deferred=len(plan.deferred))
+        for line in plan.summary():
+            logging.debug(f"Plan: {line}")
+        if not apply:
+            return plan
+        for name, interval in plan.pacing.items():
+            limiter = self.accounts[name].limiter
+            logging.info(f"{name} would exceed its Trakt GET quota, pacing it at {interval:.2f}s per request")
+            limiter.min_interval = max(limiter.min_interval, interval)
+        if plan.deferred:
+            logging.warning(f"Not enough time for every list, deferring: {', '.join(plan.deferred)}")
+        return plan
+
+    def _list_jobs(self) -> List[Tuple[str, str, Optional[str], str]]:
+        """The Trakt list jobs of the run, in planned order and without the deferred lists."""
+        return self._plan.order(self.list_jobs) if self._plan else self.list_jobs
+
+    def _start_prefetch(self, data: Dict[str, Any]) -> None:
+        """Prefetch the titles harvested while scraping as the account with the fewest lists to sync."""
+        synced = {row[2] for rows in data.values() for row in rows}
+        account = min(self.accounts.values(), key=lambda account: len(account.list_slugs))
+        self._prefetcher.start(account, synced)
+
+    def _account_credentials(self, account: str) -> Tuple[str, str]:
+        """Return the (client ID, access token) of an account such as "NETFLIX"."""
+        return self.accounts[account].credentials
+
+    def _resolve_list(
+        self, top_list: List[RankingRecord], media_type: Optional[str], account: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Resolve a scraped top list into a Trakt payload, searching with the credentials of the owning account.
+
+        Returns the payload and whether it has every rank, the last ones being left out when the deadline is close.
+        """
+        client_id, access_token = self._account_credentials(account) if account else (None, None)
+        rows = prioritized_titles(top_list)
+        if media_type is None:
+            payload = create_mixed_trakt_list_payload(rows, client_id=client_id, access_token=access_token)
+        else:
+            payload = create_type_trakt_list_payload(rows, media_type, client_id=client_id, access_token=access_token)
+        return payload, len(rows) == len(top_list)
+
+    def _run_resolve_phase(
+        self, checkpoint: RunCheckpoint, data: Dict[str, Any], payloads: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Resolve every list that has no complete payload in the checkpoint yet, all accounts in parallel."""
+        partial = set(checkpoint.load("partial") or [])
+        futures = {}
+        for key, slug, media_type, account in self._list_jobs():
+            if slug in payloads and slug not in partial:
+                continue
+            logging.info(f"Resolving titles for {slug}...")
+            futures[self.accounts[account].submit(self._resolve_list, data[key], media_type, account)] = slug
+
+        for future in as_completed(futures):
+            slug = futures[future]
+            try:
+                payloads[slug], complete = future.result()
+            except DeadlineExceeded:
+                logging.warning(f"Run deadline reached while resolving {slug}, leaving it for the next run")
+                continue
+            except requests.exceptions.RequestException as e:
+                logging.error(f"Failed to resolve titles for {slug}: {e}. Run 'resume' to retry it.")
+                continue
+            if complete:
+                partial.discard(slug)
+            else:
+                logging.warning(f"Some ranks of {slug} were not resolved in time. Run 'resume' to complete it.")
+                partial.add(slug)
+            checkpoint.save("partial", sorted(partial))
+            checkpoint.save("resolve", payloads)
+        return payloads
+
+    def _sync_list(self, slug: str, payload: Dict[str, Any], account: str) -> Optional[str]:
+        """Update one list, returning its sync status or None if the run deadline left no time for it."""
+        if self._budget.expired():
+            logging.warning(f"Run deadline reached, not updating {slug}")
+            return None
+        cache = get_tracker_cache() if self.config.SYNC_ONLY_CHANGED else None
+        digest = payload_digest(payload)
+        if cache and (cache.get("synced", slug) or {}).get("sha256") == digest:
+            logging.info(f"{slug} unchanged since its last sync, not updating it")
+            return "ok"
+        client_id, access_token = self._account_credentials(account)
+        response = update_list(slug, payload, client_id, access_token)
+        if response is None:
+            return "failed"
+        if cache:
+            cache.put("synced", slug, sha256=digest)
+        return "ok"
+
+    def _run_sync_phase(self, checkpoint: RunCheckpoint, payloads: Dict[str, Any]) -> Dict[str, str]:
+        """Update every list that was not synced successfully in the checkpointed run, all accounts in parallel.
+
+        A list synced from a partial payload gets the "partial" status, so that `resume` syncs it again.
+        """
+        statuses = checkpoint.load("sync") or {}
+        partial = set(checkpoint.load("partial") or [])
+        jobs = []
+        for _, slug, _, account in self._list_jobs():
+            if statuses.get(slug) == "ok":
+                continue
+            if slug not in payloads:
+                logging.warning(f"No resolved payload for {slug}, skipping")
+                continue
+            jobs.append((slug, account))
+
+        if self.work_queue is not None:
+            self._run_sync_queued(checkpoint, payloads, jobs, statuses)
+        else:
+            futures = {
+                self.accounts[account].submit(self._sync_list, slug, payloads[slug], account): slug
+                for slug, account in jobs
+            }
+            for future in as_completed(futures):
+                try:
+                    status = future.result()
+                except requests.exceptions.RequestException as e:
+                    logging.error(f"Failed to update {futures[future]}: {e}")
+                    status = "failed"
+                if status is not None:
+                    statuses[futures[future]] = status
+                    checkpoint.save("sync", statuses)
+
+        for slug, _ in jobs:
+            if slug in partial and statuses.get(slug) == "ok":
+                statuses[slug] = "partial"
+        checkpoint.save("sync", statuses)
+        self._sync_statuses = statuses
+        failed = [slug for slug, status in statuses.items() if status != "ok"]
+        if failed:
+            logging.warning(f"Failed to update lists: {', '.join(failed)}. Run 'resume' to retry them.")
+        return statuses
+
+    def _run_sync_queued(
+        self,
+        checkpoint: RunCheckpoint,
+        payloads: Dict[str, Any],
+        jobs: List[Tuple[str, str]],
+        statuses: Dict[str, str],
+    ) -> None:
+        """Enqueue one sync task per list and collect the statuses reported by the workers."""
+        for slug, account in jobs:
+            payload = {"account": account, "payload": payloads[slug], "deadline": self._task_deadline()}
+            self.work_queue.enqueue(self.run_id, "sync", slug, payload)
+        logging.info(f"Enqueued {len(jobs)} sync tasks for run {self.run_id}")
+        self.work_queue.wait(self.run_id, "sync", self.config.WORK_POLL_INTERVAL)
+
+        results = self.work_queue.results(self.run_id, "sync")
+        for slug, _ in jobs:
+            state, result = results[slug]
+            if state == "done":
+                statuses[slug] = result
+            elif state == "failed":
+                statuses[slug] = "failed"
+        checkpoint.save("sync", statuses)
 
     def _report_execution_summary(self, data: Dict[str, Any]) -> None:
         """Report summary of execution including successes and failures."""
@@ -1035,19 +5046,201 @@ class StreamingServiceTracker:
         success_rate = (successful_services / total_services) * 100 if total_services > 0 else 0
         logging.info(f"  Success rate: {success_rate:.1f}%")
 
+        if self.config.HEDGE_REQUESTS:
+            for line in get_hedged_fetcher().summary():
+                logging.info(f"  Hedging {line}")
+
+        if self._budget.seconds:
+            logging.info(f"  Run time: {self._budget.elapsed():.0f}s of {self._budget.seconds:.0f}s deadline")
+            if self._budget.dropped:
+                dropped = ", ".join(f"{count} {kind}" for kind, count in sorted(self._budget.dropped.items()))
+                logging.warning(f"  Low priority work dropped near the deadline: {dropped}")
+        if self._plan and self._plan.deferred:
+            logging.warning(f"  Lists deferred by the request plan: {', '.join(self._plan.deferred)}")
+        if self._sync_statuses:
+            not_updated = [slug for _, slug, _, _ in self.list_jobs if self._sync_statuses.get(slug) != "ok"]
+            updated = len(self.list_jobs) - len(not_updated)
+            logging.info(f"  Lists updated: {updated}/{len(self.list_jobs)}")
+            if not_updated:
+                logging.warning(f"  Lists not updated: {', '.join(not_updated)}. Run 'resume' to retry them.")
+
 
 # ============================
 # MAIN METHOD (backward compatibility)
 # ============================
 
 
-def main() -> int:
+# Re-parse every archived snapshot of the configured pages, as a parser regression check
+def replay_snapshots(archive: SnapshotArchive, config: Config) -> int:
+    """Parse all archived snapshots of the scraped pages and report sections that yield no rows.
+
+    Returns:
+        int: 0 if every section of every snapshot produced rows, 1 otherwise
+    """
+    sections_by_url: Dict[str, List[str]] = {}
+    for _, service, section in config.scraping_tasks:
+        sections_by_url.setdefault(config.urls[service], []).append(config.sections[section])
+
+    empty = 0
+    snapshots = 0
+    start = time.perf_counter()
+    for url, sections in sections_by_url.items():
+        for entry, content in archive.iter_snapshots(url):
+            snapshots += 1
+            soup = BeautifulSoup(content, "html.parser")
+            for section in sections:
+                if not parse_top10_soup(soup, section, url):
+                    empty += 1
+                    logging.warning(f"No rows for '{section}' in snapshot {entry['sha256']} ({entry['fetched_at']})")
+    elapsed = time.perf_counter() - start
+    logging.info(f"Replayed {snapshots} snapshots in {elapsed:.2f}s, {empty} empty sections")
+    return 1 if empty else 0
+
+
+# Print the change feed events after an offset as JSON lines, each with the offset to resume after it
+def print_changes(feed: ChangeFeed, offset: int) -> int:
+    try:
+        for next_offset, event in feed.read(offset):
+            print(json.dumps({"next_offset": next_offset, **event}, ensure_ascii=False))
+    except ValueError as e:
+        logging.error(str(e))
+        return -1
+    return 0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Update Trakt lists with the top streaming content in India.")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        default="run",
+        choices=("run", "resume")
+        + RunCheckpoint.PHASES
+        + ("replay", "backfill", "serve", "coordinate", "work", "changes", "schedule", "check", "plan"),
+        help=(
+            "run: full run (default); scrape/resolve/sync: run a single phase, later phases continue the "
+            "latest checkpoint; resume: continue the latest checkpoint, redoing only what failed; "
+            "replay: re-parse every archived page snapshot; backfill: store dated charts from --start to --end; "
+            "serve: serve the ranking history over HTTP; coordinate: full run whose scrapes and list updates are "
+            "done by `work` processes sharing WORK_QUEUE; changes: print the change feed from --offset; "
+            "schedule: print the learned chart publish windows as a cron schedule; check: exit 0 if a chart "
+            "changed since the last run, 1 otherwise; plan: print the Trakt requests a run would make per "
+            "account and endpoint, exit 1 if lists would be deferred"
+        ),
+    )
+    parser.add_argument("--profile", action="store_true", help="profile each phase of the run with cProfile")
+    parser.add_argument("--profile-memory", action="store_true", help="also report top allocations per phase")
+    parser.add_argument("--profile-dir", help="directory where per-run profiling reports are written")
+    parser.add_argument("--archive", help="snapshot archive directory (overrides SNAPSHOT_ARCHIVE)")
+    parser.add_argument("--replay", action="store_true", help="read FlixPatrol pages from the snapshot archive")
+    parser.add_argument("--start", help="backfill: first chart date (YYYY-MM-DD)")
+    parser.add_argument("--end", help="backfill: last chart date (YYYY-MM-DD, default: yesterday)")
+    parser.add_argument(
+        "--charts", nargs="+", metavar="SERVICE:SECTION", help="backfill: charts to fetch (default: all, with kids)"
+    )
+    parser.add_argument("--concurrency", type=int, help="backfill: pages fetched in parallel")
+    parser.add_argument("--host", help="serve: address to listen on (SERVE_HOST)")
+    parser.add_argument("--port", type=int, help="serve: port to listen on (SERVE_PORT)")
+    parser.add_argument("--worker-id", help="work: name of this worker in the queue (default: host:pid)")
+    parser.add_argument("--if-changed", action="store_true", help="run: stop early if no chart changed")
+    parser.add_argument("--offset", type=int, default=0, help="changes: byte offset to read the change feed from")
+    parser.add_argument("--trace", metavar="FILE", help="write a Chrome trace-event file of the run (TRACE_FILE)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
     """Main function for backward compatibility. Uses the StreamingServiceTracker class."""
+    args = parse_args(argv)
+    if args.profile or args.profile_memory:
+        config.PROFILE = True
+        config.PROFILE_MEMORY = config.PROFILE_MEMORY or args.profile_memory
+    if args.profile_dir:
+        config.PROFILE_DIR = args.profile_dir
+    if args.archive:
+        config.SNAPSHOT_ARCHIVE = args.archive
+    if config.EVENT_LOG:
+        configure_event_log(config.EVENT_LOG, config.EVENT_SAMPLE_RATES)
+    if args.replay:
+        config.SNAPSHOT_REPLAY = True
+    if args.trace:
+        config.TRACE_FILE = args.trace
+
+    if config.TRACE_FILE:
+        start_trace(config.TRACE_FILE)
+    try:
+        with trace_span(args.command, "command"):
+            return run_command(args)
+    finally:
+        stop_trace()
+
+
+def run_command(args: argparse.Namespace) -> int:
+    """Run the command selected on the command line."""
+    if args.command == "replay":
+        archive = get_snapshot_archive()
+        if archive is None:
+            logging.error("No snapshot archive configured, set SNAPSHOT_ARCHIVE or --archive")
+            return -1
+        return replay_snapshots(archive, config)
+
+    if args.command == "backfill":
+        if not args.start:
+            logging.error("backfill needs --start")
+            return -1
+        if args.concurrency:
+            config.BACKFILL_CONCURRENCY = args.concurrency
+        charts = [tuple(chart.split(":", 1)) for chart in args.charts] if args.charts else None
+        store = RankingStore(config.RANKINGS_DB)
+        try:
+            counts = backfill(store, config, args.start, args.end, charts)
+            if counts["charts"]:
+                materialize_views(store)
+        finally:
+            store.close()
+        return 1 if counts["failed"] else 0
+
+    if args.command == "serve":
+        config.SERVE_HOST = args.host or config.SERVE_HOST
+        config.SERVE_PORT = args.port if args.port is not None else config.SERVE_PORT
+        return serve_rankings(config)
+
+    if args.command == "changes":
+        return print_changes(ChangeFeed(config.CHANGE_FEED), args.offset)
+
+    if args.command == "schedule":
+        return print_schedule(get_tracker_cache())
+
+    if args.command == "work":
+        return run_worker(config, args.worker_id)
+
     tracker = StreamingServiceTracker()
-    return tracker.run()
+    if args.command in ("check", "plan") or args.if_changed:
+        if config.STATE_BUNDLE and os.path.exists(config.STATE_BUNDLE):
+            import_bundle(config, config.STATE_BUNDLE)
+    if args.command == "plan":
+        return tracker.plan()
+    if args.command == "check" or args.if_changed:
+        try:
+            changed = charts_changed(tracker)
+        finally:
+            tracker._save_state()
+        if args.command == "check":
+            return 0 if changed else 1
+        if not changed:
+            return 0
+    if args.command == "coordinate":
+        tracker.work_queue = WorkQueue.from_config(config)
+        try:
+            return tracker.run()
+        finally:
+            tracker.work_queue.close()
+    if args.command == "run":
+        return tracker.run()
+    if args.command == "resume":
+        return tracker.run(resume=True)
+    return tracker.run(phases=(args.command,))
 
 
 if __name__ == "__main__":
-    import sys
-
     sys.exit(main())